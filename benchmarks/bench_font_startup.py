@@ -0,0 +1,139 @@
+"""
+Start-up cost of typst with the whole template font directory versus the
+staging font directories of font_index.py.
+
+Run from the repository root with the real typst on PATH. For every distinct
+staging directory of the discovered documents, `typst fonts` (which only
+searches and parses the font paths, like the start of a compilation) is timed
+against the full `--font-path`; `--compile N` also times full compilations of
+N documents both ways. The saving per compile is weighted by how many
+documents use each staging directory.
+
+Usage:
+    python benchmarks/bench_font_startup.py [--repeat 20] [--compile 5] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from corpus import REPO_ROOT
+
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import docs_lib  # noqa: E402
+import build_docs  # noqa: E402
+import font_index  # noqa: E402
+
+
+def best_time(command: List[str], repeat: int) -> float:
+    """Returns the fastest of `repeat` runs of `command`, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def dir_mib(path: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    ) / (1 << 20)
+
+
+def fonts_command(font_path: str) -> List[str]:
+    return ["typst", "fonts", "--ignore-system-fonts", f"--font-path={font_path}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark typst font start-up.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--compile",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Also time full compilations of the first N documents.",
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    version = subprocess.run(
+        ["typst", "--version"], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    documents = docs_lib.discover_documents()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stager = font_index.FontStager(cache_dir, [docs_lib.FONT_PATH])
+        stager.load()
+        staged = {doc.source: stager.font_path(doc) for doc in documents}
+        uses = Counter(staged.values())
+        total_files = len(stager.index.files)
+
+        full_ms = best_time(fonts_command(docs_lib.FONT_PATH), args.repeat)
+        print(f"{version}, {len(documents)} documents, best of {args.repeat}")
+        full_mib = dir_mib(docs_lib.FONT_PATH)
+        print(
+            f"  full font path      {total_files:3d} files {full_mib:5.1f} MiB  "
+            f"{full_ms:8.1f} ms"
+        )
+        dirs: Dict[str, Dict] = {}
+        for path, count in uses.most_common():
+            files = sum(len(names) for _, _, names in os.walk(path))
+            mib = dir_mib(path)
+            ms = best_time(fonts_command(path), args.repeat)
+            dirs[Path(path).name] = {
+                "documents": count, "files": files, "mib": mib, "ms": ms
+            }
+            print(
+                f"  {Path(path).name}  {files:3d} files {mib:5.1f} MiB  "
+                f"{ms:8.1f} ms  ({count} documents)"
+            )
+        staged_ms = sum(d["ms"] * d["documents"] for d in dirs.values()) / len(staged)
+        print(f"Start-up saved per compile: {full_ms - staged_ms:.1f} ms")
+
+        compiles = []
+        with tempfile.TemporaryDirectory() as outdir:
+            for doc in documents[: args.compile]:
+                pdf = os.path.join(outdir, "out.pdf")
+                full = best_time(
+                    build_docs.typst_command("compile", doc, pdf), args.repeat
+                )
+                fast = best_time(
+                    build_docs.typst_command("compile", doc, pdf, staged[doc.source]),
+                    args.repeat,
+                )
+                compiles.append({"source": doc.source, "full_ms": full, "staged_ms": fast})
+                print(f"  compile {doc.source}: {full:.1f} ms -> {fast:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "typst": version,
+                    "documents": len(documents),
+                    "font_files": total_files,
+                    "font_mib": full_mib,
+                    "full_ms": full_ms,
+                    "staged_ms": staged_ms,
+                    "staging_dirs": dirs,
+                    "compiles": compiles,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results written to '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Peak memory benchmark of document discovery and site generation.
+
+Generates a synthetic tree (50k documents by default, see corpus.py) and runs
+`discover_documents` and `generate_site.py` each in a fresh interpreter, so
+that the reported peak RSS belongs to that stage alone. With `--baseline REV`
+the same stages are also run with the `scripts/` of that git revision, e.g.
+the commit before a memory optimization, and the two are compared.
+
+Usage:
+    python benchmarks/bench_memory.py --baseline HEAD~1 --json memory.json
+    python benchmarks/bench_memory.py --documents 5000
+"""
+
+import sys
+import json
+import math
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+from corpus import REPO_ROOT, CorpusSpec, generate_corpus
+
+# Runs one stage with the scripts in argv[1] and prints its peak RSS as JSON.
+DRIVER = r"""
+import os, sys, json, time, logging, resource
+scripts, stage, outdir = sys.argv[1:4]
+sys.path.insert(0, scripts)
+logging.basicConfig(level=logging.WARNING)
+start = time.perf_counter()
+if stage == "discover_documents":
+    import docs_lib
+    count = len(docs_lib.discover_documents())
+else:
+    import generate_site
+    sys.argv = [
+        "generate_site.py", "--outdir", outdir, "--no-site-manifest",
+        "--no-discovery-cache", "--search-cache", os.path.join(outdir, "search.json"),
+    ]
+    generate_site.main()
+    count = None
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "documents": count,
+}))
+"""
+
+STAGES = ("discover_documents", "generate_site")
+
+
+def export_scripts(revision: str, destination: Path) -> Path:
+    """Extracts `scripts/` as of `revision` into `destination`."""
+    destination.mkdir(parents=True, exist_ok=True)
+    archive = subprocess.run(
+        ["git", "archive", revision, "scripts"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        check=True,
+    )
+    subprocess.run(
+        ["tar", "-x", "-C", str(destination)], input=archive.stdout, check=True
+    )
+    return destination / "scripts"
+
+
+def run_stage(scripts: Path, stage: str, root: Path, outdir: Path) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", DRIVER, str(scripts), stage, str(outdir)],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{stage} failed with '{scripts}':\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(scripts: Path, root: Path, work: Path, label: str) -> Dict[str, Dict]:
+    results = {}
+    for stage in STAGES:
+        outdir = work / f"{label}-{stage}"
+        results[stage] = run_stage(scripts, stage, root, outdir)
+        mib = results[stage]["peak_rss_kib"] / 1024
+        print(f"  {label:9} {stage:20} {mib:9.1f} MiB  {results[stage]['seconds']:7.1f}s")
+    return results
+
+
+def corpus_spec(documents: int, changelog_length: int) -> CorpusSpec:
+    """Spreads `documents` over 4 groups of 3 subgroups."""
+    per_subgroup = math.ceil(documents / 12)
+    return CorpusSpec(
+        groups=4, docs_per_subgroup=per_subgroup, changelog_length=changelog_length
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory (RSS).")
+    parser.add_argument("--documents", type=int, default=50_000)
+    parser.add_argument(
+        "--changelog-length", type=int, default=CorpusSpec.changelog_length
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="GIT_REV",
+        help="Also measure the scripts of this revision, e.g. HEAD~1.",
+    )
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    spec = corpus_spec(args.documents, args.changelog_length)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        print(f"Generating {spec.document_count} documents...")
+        root = generate_corpus(tmp_path / "repo", spec)
+
+        results: Dict[str, Optional[Dict]] = {"baseline": None}
+        if args.baseline:
+            baseline_scripts = export_scripts(args.baseline, tmp_path / "baseline")
+            results["baseline"] = measure(baseline_scripts, root, tmp_path, "baseline")
+        results["current"] = measure(REPO_ROOT / "scripts", root, tmp_path, "current")
+
+    if results["baseline"]:
+        print(f"Peak RSS, {args.baseline} -> working tree:")
+        for stage in STAGES:
+            before = results["baseline"][stage]["peak_rss_kib"]
+            after = results["current"][stage]["peak_rss_kib"]
+            print(
+                f"  {stage:20} {before / 1024:9.1f} MiB -> {after / 1024:9.1f} MiB "
+                f"({(after - before) / before:+.0%})"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "documents": spec.document_count,
+                    "changelog_length": spec.changelog_length,
+                    "baseline_revision": args.baseline,
+                    "stages": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results written to '{args.json}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of the metadata loaders in docs_lib.
+
+Generates a synthetic tree of `.meta.yaml` files and reports the per-file
+parse cost of the pure-Python SafeLoader, libyaml's CSafeLoader and the
+JSON sidecar path.
+
+Usage: python benchmarks/bench_yaml_loader.py [--files 3000] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+from corpus import REPO_ROOT, meta_yaml
+
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import docs_lib  # noqa: E402
+
+
+def write_meta_tree(root: Path, count: int, changelog_length: int) -> list:
+    """Writes `count` metadata files below `root` and returns their paths."""
+    rng = random.Random(42)
+    paths = []
+    for i in range(count):
+        doc_dir = root / "docs" / "11-bench" / "interno" / f"verbint_{i:05d}"
+        doc_dir.mkdir(parents=True, exist_ok=True)
+        path = doc_dir / f"verbint_{i:05d}.meta.yaml"
+        path.write_text(
+            meta_yaml(f"Verbale Interno {i:05d}", changelog_length, rng),
+            encoding="utf-8",
+        )
+        paths.append(str(path))
+    return paths
+
+
+def time_loader(loader: docs_lib.MetadataLoader, paths: list, repeat: int) -> float:
+    """Returns the best per-file load time, in microseconds, over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            loader.load(path)
+        best = min(best, time.perf_counter() - start)
+    return best / len(paths) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metadata loaders.")
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--changelog-length", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = write_meta_tree(root, args.files, args.changelog_length)
+
+        loaders = {
+            "SafeLoader (pure Python)": docs_lib.YamlMetadataLoader(use_libyaml=False)
+        }
+        if docs_lib.YAML_C_LOADER is not None:
+            loaders["CSafeLoader (libyaml)"] = docs_lib.YamlMetadataLoader()
+        else:
+            print("PyYAML is not built with libyaml: skipping CSafeLoader.")
+
+        sidecar = docs_lib.JsonSidecarMetadataLoader(
+            os.path.join(tmp, "sidecars"), docs_lib.YamlMetadataLoader()
+        )
+        for path in paths:  # warm up: write every sidecar once
+            sidecar.load(path)
+        loaders["JSON sidecar (warm)"] = sidecar
+
+        results = {
+            name: time_loader(loader, paths, args.repeat)
+            for name, loader in loaders.items()
+        }
+
+    baseline = results["SafeLoader (pure Python)"]
+    print(f"{args.files} files, {args.changelog_length} changelog entries each:")
+    for name, per_file in results.items():
+        print(f"  {name:28} {per_file:9.1f} us/file  ({baseline / per_file:5.1f}x)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"files": args.files, "us_per_file": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
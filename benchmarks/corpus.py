@@ -0,0 +1,182 @@
+"""
+Synthetic corpus generator for the docs pipeline benchmarks.
+
+Builds a repository-shaped tree (`docs/`, `.schemas/`, `site/`) with groups
+matching `GROUP_DIR_REGEX`, the three `VALID_SUBGROUPS`, documents with long
+changelogs, nested `.typ` subfiles and assets, plus a stub `typst`
+executable so that compilation can be benchmarked offline.
+
+Usage: python benchmarks/corpus.py OUTDIR [--groups 4] [--docs-per-subgroup 250]
+"""
+
+import sys
+import shutil
+import random
+import argparse
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import docs_lib  # noqa: E402
+
+SUBGROUP_PREFIXES = {"interno": "verbint", "esterno": "verbest", "slides": "ddb"}
+SUBGROUP_TEMPLATES = {
+    "interno": "base_verbale.typ",
+    "esterno": "base_verbale.typ",
+    "slides": "base_ddb.typ",
+}
+PEOPLE = [
+    "Francesco Marcon",
+    "Leonardo Preo",
+    "Matteo Mantoan",
+    "Mario de Pasquale",
+    "Valerio Solito",
+    "Alessandro Contarini",
+]
+GROUP_NAMES = ["candidatura", "rtb", "pb", "extra", "archivio", "altro"]
+
+STUB_TYPST = '''#!{python}
+"""Stub of the typst CLI used by the benchmarks: writes a tiny PDF or PNG."""
+import os
+import sys
+import time
+
+args = sys.argv[1:]
+if args and args[0] == "--version":
+    print("typst 0.0.0 (benchmark stub)")
+    sys.exit(0)
+if args and args[0] == "fonts":
+    sys.exit(0)
+
+positional, skip = [], False
+for arg in args[1:]:
+    if skip:
+        skip = False
+    elif arg in ("--input", "--root", "--format", "--pages", "--ppi", "--font-path"):
+        skip = True
+    elif not arg.startswith("--"):
+        positional.append(arg)
+
+time.sleep(float(os.environ.get("STUB_TYPST_DELAY", "0")))
+output = positional[1]
+with open(output, "wb") as f:
+    if output.endswith(".png"):
+        f.write(b"\\x89PNG\\r\\n\\x1a\\n")
+    else:
+        f.write(b"%PDF-1.7\\n1 0 obj << /Type /Pages /Count 1 >> endobj\\n%%EOF\\n")
+'''
+
+
+@dataclass
+class CorpusSpec:
+    groups: int = 4
+    docs_per_subgroup: int = 250
+    changelog_length: int = 12
+    subfiles_per_doc: int = 2
+    seed: int = 42
+
+    @property
+    def document_count(self) -> int:
+        return self.groups * len(docs_lib.VALID_SUBGROUPS) * self.docs_per_subgroup
+
+
+def meta_yaml(title: str, changelog_length: int, rng: random.Random) -> str:
+    """Renders a valid `.meta.yaml` with a changelog of `changelog_length` entries."""
+    lines = [f"title: {title}", "changelog:"]
+    for version in range(changelog_length, 0, -1):
+        authors = rng.sample(PEOPLE, 2)
+        verifier = rng.choice([p for p in PEOPLE if p not in authors])
+        lines += [
+            f"  - version: {version}",
+            f'    date: "2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"',
+            "    authors:",
+            *(f"      - {a}" for a in authors),
+            "    verifiers:",
+            f'      - "{verifier}"',
+            "    description: >",
+            f"      Revisione {version}: aggiornamento delle sezioni, correzione dei",
+            "      refusi e integrazione delle osservazioni emerse in riunione.",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def _write_document(doc_dir: Path, template: str, spec: CorpusSpec, rng: random.Random):
+    name = doc_dir.name
+    (doc_dir / "sections").mkdir(parents=True, exist_ok=True)
+    (doc_dir / "assets").mkdir(exist_ok=True)
+    (doc_dir / "assets" / "sign.png").write_bytes(rng.randbytes(2048))
+
+    includes = []
+    for i in range(spec.subfiles_per_doc):
+        section = doc_dir / "sections" / f"part_{i}.typ"
+        nested = doc_dir / "sections" / f"part_{i}_detail.typ"
+        section.write_text(
+            f'= Parte {i}\n#include "part_{i}_detail.typ"\n', encoding="utf-8"
+        )
+        nested.write_text(f"Dettagli della parte {i}.\n" * 20, encoding="utf-8")
+        includes.append(f'#include "sections/part_{i}.typ"')
+
+    source = [
+        f'#import "../../../00-templates/{template}" as base',
+        "",
+        "#let metadata = yaml(sys.inputs.meta-path)",
+        "",
+        *includes,
+        '#image("./assets/sign.png", width: 30%)',
+    ]
+    (doc_dir / f"{name}.typ").write_text("\n".join(source) + "\n", encoding="utf-8")
+    (doc_dir / f"{name}.meta.yaml").write_text(
+        meta_yaml(f"Documento {name}", spec.changelog_length, rng), encoding="utf-8"
+    )
+
+
+def generate_corpus(root: Path, spec: CorpusSpec) -> Path:
+    """Writes a synthetic repository under `root` and returns it."""
+    rng = random.Random(spec.seed)
+    root.mkdir(parents=True, exist_ok=True)
+
+    shutil.copytree(REPO_ROOT / "docs" / "00-templates", root / "docs" / "00-templates")
+    shutil.copytree(REPO_ROOT / ".schemas", root / ".schemas")
+    shutil.copytree(REPO_ROOT / "site", root / "site")
+
+    for g in range(spec.groups):
+        group_name = GROUP_NAMES[g % len(GROUP_NAMES)]
+        if g >= len(GROUP_NAMES):
+            group_name = f"{group_name}_{g}"
+        group_dir = root / "docs" / f"{11 + g}-{group_name}"
+        for subgroup in sorted(docs_lib.VALID_SUBGROUPS):
+            for i in range(spec.docs_per_subgroup):
+                name = f"{SUBGROUP_PREFIXES[subgroup]}_{g:02d}_{i:05d}"
+                _write_document(
+                    group_dir / subgroup / name, SUBGROUP_TEMPLATES[subgroup], spec, rng
+                )
+    return root
+
+
+def install_stub_typst(bin_dir: Path) -> Path:
+    """Writes the stub `typst` executable into `bin_dir` and returns its path."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    stub = bin_dir / "typst"
+    stub.write_text(STUB_TYPST.format(python=sys.executable), encoding="utf-8")
+    stub.chmod(0o755)
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic docs corpus.")
+    parser.add_argument("outdir", help="Directory to create the corpus in.")
+    for field, default in asdict(CorpusSpec()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=default)
+    args = parser.parse_args()
+
+    spec = CorpusSpec(**{k: getattr(args, k) for k in asdict(CorpusSpec())})
+    root = generate_corpus(Path(args.outdir), spec)
+    install_stub_typst(root / "bin")
+    print(f"Generated {spec.document_count} documents in '{root}'.")
+    print(f"Prepend '{root / 'bin'}' to PATH to use the stub typst.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmark suite for the docs pipeline.
+
+Generates a synthetic corpus (see corpus.py) in a temporary directory and
+times each stage of the pipeline against it, with a stub `typst` so it runs
+offline. Every stage is run `--repeat` times and reported as min / median /
+mean wall time; results are written as JSON so runs can be compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json --fail-on-regression
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from corpus import REPO_ROOT, CorpusSpec, generate_corpus, install_stub_typst
+
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import docs_lib  # noqa: E402
+import build_docs  # noqa: E402
+import generate_site  # noqa: E402
+import search_index  # noqa: E402
+import validate_pr_changes  # noqa: E402
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Runs `fn` `repeat` times and returns wall-time statistics in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "repeat": repeat,
+    }
+
+
+def run_stages(root: Path, repeat: int, compile_sample: int) -> Dict[str, Dict]:
+    """Times every pipeline stage inside the corpus at `root`."""
+    os.chdir(root)
+    results = {}
+
+    def stage(name: str, fn: Callable[[], object], times: int = repeat):
+        results[name] = measure(fn, times)
+        print(f"  {name:40} median {results[name]['median'] * 1000:10.1f} ms")
+
+    stage("discover_documents", lambda: docs_lib.discover_documents())
+    model = docs_lib.discover_documents()
+
+    cache_path = str(root / ".build-cache" / "discovery.json")
+    warm_cache = docs_lib.DiscoveryCache(cache_path)
+    docs_lib.discover_documents(cache=warm_cache)
+    warm_cache.save()
+
+    def discover_with_warm_cache():
+        cache = docs_lib.DiscoveryCache(cache_path)
+        cache.load()
+        docs_lib.discover_documents(cache=cache)
+
+    stage("discover_documents (warm cache)", discover_with_warm_cache)
+
+    sample = model[:compile_sample]
+    outdir = str(root / "dist" / "docs")
+    stage("compile_document", lambda: build_docs.compile_document(model[0], outdir))
+    stage(
+        f"compile_all ({len(sample)} docs)",
+        lambda: build_docs.compile_all(sample, outdir, os.cpu_count() or 1),
+        times=1,
+    )
+
+    stage(
+        "html_table_rows_from_docmodel",
+        lambda: generate_site.html_table_rows_from_docmodel(model, "docs"),
+    )
+    stage(
+        "generate_group_cards",
+        lambda: generate_site.generate_group_cards(
+            model,
+            template_path="site/index.template.html",
+            output_path=str(root / "dist" / "index.html"),
+        ),
+    )
+
+    stage(
+        "search_index (cold)",
+        lambda: search_index.SearchIndexBuilder("docs", cache_path=None).build(
+            model, {}
+        ),
+    )
+
+    docs_lib.save_model(model, "model.json")
+    Path("no_changes.txt").write_text("", encoding="utf-8")
+    stage(
+        "compare_models",
+        lambda: validate_pr_changes.compare_models(
+            "model.json", "model.json", "no_changes.txt"
+        ),
+    )
+
+    # A PR editing 50 documents, each with its version bumped, so that the
+    # change attribution runs and the validation still passes.
+    changed = model[:50]
+    Path("changed_files.txt").write_text(
+        "\n".join(doc.source for doc in changed) + "\n", encoding="utf-8"
+    )
+    with open("model.json", "r", encoding="utf-8") as f:
+        pr_model = json.load(f)
+    bumped = {doc.source for doc in changed}
+    for entry in pr_model:
+        if entry["source"] in bumped:
+            entry["latest_version"] += 1
+    with open("pr_model.json", "w", encoding="utf-8") as f:
+        json.dump(pr_model, f)
+    stage(
+        f"compare_models ({len(changed)} changed)",
+        lambda: validate_pr_changes.compare_models(
+            "model.json", "pr_model.json", "changed_files.txt"
+        ),
+    )
+    return results
+
+
+def git_revision() -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return proc.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(previous: Dict, current: Dict, threshold: float) -> List[str]:
+    """Prints median ratios against a previous run; returns the regressed stages."""
+    regressions = []
+    print(f"Comparison with {previous['meta'].get('revision', '?')}:")
+    for name, stats in current["stages"].items():
+        old = previous["stages"].get(name)
+        if not old:
+            print(f"  {name:40} (new)")
+            continue
+        ratio = stats["median"] / old["median"] if old["median"] else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"  {name:40} {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the docs pipeline.")
+    parser.add_argument("--groups", type=int, default=CorpusSpec.groups)
+    parser.add_argument(
+        "--docs-per-subgroup", type=int, default=CorpusSpec.docs_per_subgroup
+    )
+    parser.add_argument(
+        "--changelog-length", type=int, default=CorpusSpec.changelog_length
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--compile-sample",
+        type=int,
+        default=100,
+        help="Number of documents compiled by the compile_all stage.",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Previous results JSON to compare with.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Median ratio above which a stage counts as a regression.",
+    )
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    spec = CorpusSpec(
+        groups=args.groups,
+        docs_per_subgroup=args.docs_per_subgroup,
+        changelog_length=args.changelog_length,
+    )
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = generate_corpus(Path(tmp) / "repo", spec)
+        stub_dir = root / "bin"
+        install_stub_typst(stub_dir)
+        os.environ["PATH"] = f"{stub_dir}{os.pathsep}{os.environ['PATH']}"
+        print(f"Benchmarking {spec.document_count} documents...")
+        try:
+            stages = run_stages(root, args.repeat, args.compile_sample)
+        finally:
+            os.chdir(cwd)
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": asdict(spec),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "stages": stages,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = compare(previous, results, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
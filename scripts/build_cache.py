@@ -0,0 +1,209 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import docs_lib
+
+CACHE_DIR = ".build-cache"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def typst_version() -> str:
+    """Returns the version string of the installed Typst compiler."""
+    try:
+        proc = subprocess.run(
+            ["typst", "--version"],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            check=True,
+        )
+        return proc.stdout.strip()
+    except FileNotFoundError:
+        logging.critical("Typst command not found. Is it installed and in your PATH?")
+        sys.exit(1)
+    except subprocess.CalledProcessError as e:
+        logging.critical(f"Could not determine Typst version: {e.stderr.strip()}")
+        sys.exit(1)
+
+
+def _list_files(directory: str) -> List[str]:
+    """Lists every file below `directory` as sorted, '/'-separated paths."""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            files.append(os.path.join(root, name).replace(os.path.sep, "/"))
+    return sorted(files)
+
+
+class BuildCache:
+    """
+    Content-addressed store of compiled PDFs.
+
+    Each document is keyed by a hash over every input that can affect its
+    output (its resolved dependency graph, the fonts and the compiler);
+    `manifest.json` maps output paths to their last key and the PDFs
+    themselves live under `pdf/<key>.pdf`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        compiler_version: str,
+        extra_inputs: Iterable[str] = (),
+        shared_files: Iterable[str] = (),
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "pdf"
+        self.manifest_path = self.cache_dir / MANIFEST_NAME
+        self.compiler_version = compiler_version
+        self.extra_inputs = list(extra_inputs)
+        self.shared_files = sorted(shared_files)
+        self.entries: Dict[str, Dict] = {}
+        self._file_hashes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._shared_digest: Optional[str] = None
+
+    def load(self):
+        """Reads the manifest left by a previous build, if any."""
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logging.debug(f"No build cache manifest at '{self.manifest_path}'.")
+            return
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt build cache manifest: {e}")
+            return
+
+        if manifest.get("version") != MANIFEST_VERSION:
+            logging.info("Build cache manifest has an old format, starting fresh.")
+            return
+        self.entries = manifest.get("entries", {})
+        logging.debug(f"Loaded {len(self.entries)} build cache entries.")
+
+    def save(self):
+        """Writes the manifest and drops PDFs no longer referenced by it."""
+        manifest = {"version": MANIFEST_VERSION, "entries": self.entries}
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+        live = {entry["key"] for entry in self.entries.values()}
+        for obj in self.objects_dir.glob("*.pdf"):
+            if obj.stem not in live:
+                logging.debug(f"Pruning stale cache object '{obj}'")
+                obj.unlink()
+
+    def retain(self, outputs: Iterable[str]):
+        """Forgets entries of documents that no longer exist."""
+        keep = set(outputs)
+        self.entries = {k: v for k, v in self.entries.items() if k in keep}
+
+    def hash_file(self, path: str) -> str:
+        """Hashes a file's content, memoized for the lifetime of the cache."""
+        with self._lock:
+            cached = self._file_hashes.get(path)
+        if cached is not None:
+            return cached
+
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            digest.update(b"<missing>")
+        value = digest.hexdigest()
+
+        with self._lock:
+            self._file_hashes[path] = value
+        return value
+
+    def _shared_inputs_digest(self) -> str:
+        """Hashes the inputs shared by every document (fonts, compiler, flags)."""
+        with self._lock:
+            if self._shared_digest is not None:
+                return self._shared_digest
+
+        digest = hashlib.sha256()
+        digest.update(self.compiler_version.encode("utf-8"))
+        for item in self.extra_inputs:
+            digest.update(b"\0arg\0" + item.encode("utf-8"))
+        for path in self.shared_files:
+            digest.update(f"\0{path}\0{self.hash_file(path)}".encode("utf-8"))
+        value = digest.hexdigest()
+
+        with self._lock:
+            self._shared_digest = value
+        return value
+
+    def document_inputs(self, doc: docs_lib.Document) -> List[str]:
+        """
+        Lists the document-specific files that feed into its compilation: its
+        resolved dependencies plus anything in its own directory, which also
+        covers references the dependency graph cannot resolve statically.
+        """
+        doc_dir = os.path.dirname(doc.source) or "."
+        inputs = {doc.source, doc.meta_path, *doc.subfiles}
+        inputs.update(_list_files(doc_dir))
+        return sorted(inputs)
+
+    def key_for(self, doc: docs_lib.Document) -> str:
+        """Computes the content-addressed cache key of a document."""
+        digest = hashlib.sha256()
+        digest.update(self._shared_inputs_digest().encode("utf-8"))
+        digest.update(f"\0output\0{doc.output}".encode("utf-8"))
+        for path in self.document_inputs(doc):
+            digest.update(f"\0{path}\0{self.hash_file(path)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _object_path(self, key: str) -> Path:
+        return self.objects_dir / f"{key}.pdf"
+
+    def restore(self, doc: docs_lib.Document, key: str, output_path: str) -> bool:
+        """Places the cached PDF for `key` at `output_path`; returns False on a miss."""
+        with self._lock:
+            entry = self.entries.get(doc.output)
+        if not entry or entry.get("key") != key:
+            return False
+        obj = self._object_path(key)
+        if not obj.is_file():
+            return False
+
+        remove_output(output_path)
+        try:
+            os.link(obj, output_path)
+        except OSError:
+            shutil.copy2(obj, output_path)
+        return True
+
+    def store(self, doc: docs_lib.Document, key: str, output_path: str):
+        """Copies a freshly compiled PDF into the cache and records its key."""
+        obj = self._object_path(key)
+        tmp_obj = obj.with_name(f"{obj.name}.{threading.get_ident()}.tmp")
+        shutil.copy2(output_path, tmp_obj)
+        os.replace(tmp_obj, obj)
+        with self._lock:
+            self.entries[doc.output] = {"key": key, "source": doc.source}
+
+
+def remove_output(output_path: str):
+    """
+    Unlinks a previous output before it is rewritten, so that a hardlink
+    restored from the cache is never modified in place.
+    """
+    try:
+        os.unlink(output_path)
+    except FileNotFoundError:
+        pass
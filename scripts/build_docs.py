@@ -3,10 +3,21 @@ import os
 import sys
 import logging
 import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set
 
 import docs_lib
+import build_cache
+import build_shards
+import font_index
+import precompress
+import pdf_postprocess
+import thumbnails
+from typst_deps import DependencyGraph
 
-FONT_PATH = "docs/00-templates/assets/fonts"
+FONT_PATH = docs_lib.FONT_PATH
 
 
 def setup_logging():
@@ -19,52 +30,506 @@ def setup_logging():
     )
 
 
-def compile_document(doc: docs_lib.Document, output_dir: str):
-    """Compiles a single, validated Document object."""
+@dataclass
+class CompileResult:
+    """Outcome of a single Typst compilation, buffered for per-document reporting."""
 
-    source_dir = os.path.dirname(doc.source) or "."
-    meta_path_relative = os.path.relpath(doc.meta_path, start=source_dir)
-    complete_output_path = os.path.join(output_dir, doc.output)
-    output_dir = os.path.dirname(complete_output_path)
-    if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
+    doc: docs_lib.Document
+    output_path: str
+    success: bool
+    duration: float
+    stderr: str
+    cached: bool = False
+    postprocess: Optional[pdf_postprocess.PostprocessResult] = None
+    key: Optional[str] = None
+    preview: Optional[thumbnails.DocumentPreview] = None
 
-    logging.info(
-        f"Compiling '{doc.metadata["title"]}': {doc.source} -> {complete_output_path}"
-    )
 
-    command = [
+def typst_command(
+    subcommand: str,
+    doc: docs_lib.Document,
+    output_path: str,
+    font_path: str = FONT_PATH,
+) -> List[str]:
+    """Builds the typst command line (`compile` or `watch`) for a document."""
+    inputs = docs_lib.typst_inputs(doc.source, doc.meta_path)
+    return [
         "typst",
-        "compile",
+        subcommand,
         doc.source,
-        complete_output_path,
+        output_path,
         "--input",
-        f"meta-path={meta_path_relative}",
+        f"meta-path={inputs['meta-path']}",
         "--root",
         ".",
         "--ignore-system-fonts",
-        f"--font-path={FONT_PATH}",
+        f"--font-path={font_path}",
     ]
+
+
+def compile_document(
+    doc: docs_lib.Document,
+    output_dir: str,
+    fonts: Optional[font_index.FontStager] = None,
+) -> CompileResult:
+    """Compiles a single, validated Document object."""
+
+    complete_output_path = os.path.join(output_dir, doc.output)
+    output_dir = os.path.dirname(complete_output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    font_path = fonts.font_path(doc) if fonts is not None else FONT_PATH
+    command = typst_command("compile", doc, complete_output_path, font_path)
     logging.debug(f"Executing: {' '.join(command)}")
 
+    start = time.perf_counter()
     try:
-        proc = subprocess.run(
-            command, capture_output=True, text=True, encoding="utf-8", check=True
+        with docs_lib.profiler.span("typst_compile", "build", doc=doc.source):
+            proc = subprocess.run(
+                command, capture_output=True, text=True, encoding="utf-8", check=True
+            )
+        success, stderr = True, proc.stderr
+    except subprocess.CalledProcessError as e:
+        success, stderr = False, e.stderr
+    except FileNotFoundError:
+        logging.critical("Typst command not found. Is it installed and in your PATH?")
+        sys.exit(1)
+
+    return CompileResult(
+        doc=doc,
+        output_path=complete_output_path,
+        success=success,
+        duration=time.perf_counter() - start,
+        stderr=stderr,
+    )
+
+
+def build_document(
+    doc: docs_lib.Document,
+    output_dir: str,
+    cache: Optional[build_cache.BuildCache],
+    postprocessor: Optional[pdf_postprocess.PdfPostprocessor] = None,
+    thumbnailer: Optional[thumbnails.Thumbnailer] = None,
+    fonts: Optional[font_index.FontStager] = None,
+) -> CompileResult:
+    """
+    Builds a document and, if enabled, renders its thumbnail and post-processes
+    the PDF in the same worker.
+    """
+    result = _build_or_restore(doc, output_dir, cache, fonts)
+    if not result.success:
+        return result
+    if thumbnailer is not None:
+        # Before post-processing, which may hide the page tree in object streams.
+        with docs_lib.profiler.span("thumbnail", "build", doc=doc.source):
+            result.preview = thumbnailer.process(
+                doc, output_dir, result.output_path, result.key
+            )
+    if postprocessor is not None:
+        with docs_lib.profiler.span("pdf_postprocess", "build", doc=doc.source):
+            result.postprocess = postprocessor.process(doc.output, result.output_path)
+        if result.preview is not None:
+            result.preview.size = result.postprocess.size_after
+    return result
+
+
+def _build_or_restore(
+    doc: docs_lib.Document,
+    output_dir: str,
+    cache: Optional[build_cache.BuildCache],
+    fonts: Optional[font_index.FontStager] = None,
+) -> CompileResult:
+    """Restores a document from the build cache or compiles it and stores the result."""
+    if cache is None:
+        return compile_document(doc, output_dir, fonts)
+
+    start = time.perf_counter()
+    output_path = os.path.join(output_dir, doc.output)
+    with docs_lib.profiler.span("cache_key", "build", doc=doc.source):
+        key = cache.key_for(doc)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with docs_lib.profiler.span("cache_restore", "build", doc=doc.source):
+        restored = cache.restore(doc, key, output_path)
+    if restored:
+        return CompileResult(
+            doc=doc,
+            output_path=output_path,
+            success=True,
+            duration=time.perf_counter() - start,
+            stderr="",
+            cached=True,
+            key=key,
         )
 
-        if proc.stderr != "":
-            logging.info(f"WARNINGS: {proc.stderr}")
+    build_cache.remove_output(output_path)
+    result = compile_document(doc, output_dir, fonts)
+    if result.success:
+        cache.store(doc, key, output_path)
+        result.key = key
+    return result
 
-        logging.info(f"SUCCESS: '{doc.metadata["title"]}' compiled.")
-        return True
-    except subprocess.CalledProcessError as e:
+
+def report_result(result: CompileResult):
+    """Logs the buffered output of a compilation as one contiguous block."""
+    title = result.doc.title
+    if result.cached:
+        logging.info(f"CACHED: '{title}' restored to {result.output_path}.")
+        report_postprocess(result)
+        return
+
+    logging.info(
+        f"Compiling '{title}': {result.doc.source} -> {result.output_path}"
+    )
+    if not result.success:
         logging.error(
-            f"FAILURE: Compiling '{doc.metadata["title"]}' failed.\n--- START typst ERROR ---\n{e.stderr.strip()}\n--- END typst ERROR ---"
+            f"FAILURE: Compiling '{title}' failed after {result.duration:.2f}s.\n"
+            f"--- START typst ERROR ---\n{result.stderr.strip()}\n--- END typst ERROR ---"
         )
-        return False
-    except FileNotFoundError:
-        logging.critical("Typst command not found. Is it installed and in your PATH?")
-        sys.exit(1)
+        return
+
+    if result.stderr != "":
+        logging.info(f"WARNINGS: {result.stderr}")
+    logging.info(f"SUCCESS: '{title}' compiled in {result.duration:.2f}s.")
+    report_postprocess(result)
+
+
+def report_postprocess(result: CompileResult):
+    post = result.postprocess
+    if post is None:
+        return
+    for warning in post.font_warnings:
+        logging.warning(f"FONTS: {result.output_path}: {warning}")
+    steps = ", ".join(post.steps) or "no changes"
+    logging.info(
+        f"POSTPROCESS: {result.output_path}: {post.size_before / 1024:.1f} KiB -> "
+        f"{post.size_after / 1024:.1f} KiB ({steps}{', cached' if post.cached else ''})"
+    )
+
+
+def compile_all(
+    documents: Iterable[docs_lib.Document],
+    output_dir: str,
+    jobs: int,
+    cache: Optional[build_cache.BuildCache] = None,
+    postprocessor: Optional[pdf_postprocess.PdfPostprocessor] = None,
+    thumbnailer: Optional[thumbnails.Thumbnailer] = None,
+    fonts: Optional[font_index.FontStager] = None,
+) -> List[CompileResult]:
+    """Compiles documents through a bounded worker pool, reporting each as it finishes."""
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                build_document,
+                doc,
+                output_dir,
+                cache,
+                postprocessor,
+                thumbnailer,
+                fonts,
+            )
+            for doc in documents
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            report_result(result)
+            results.append(result)
+    return results
+
+
+def stream_documents(
+    args: argparse.Namespace,
+    graph: DependencyGraph,
+    discovered: List[docs_lib.Document],
+    errors: List[docs_lib.DiscoveryError],
+) -> Iterator[docs_lib.Document]:
+    """
+    Yields documents as discovery produces them, collecting them in `discovered`
+    and any `DiscoveryError` in `errors` instead of interrupting the build.
+    """
+    cache = docs_lib.prepare_discovery(args)
+    try:
+        for doc in docs_lib.iter_documents(
+            graph=graph,
+            cache=cache,
+            jobs=args.discovery_jobs,
+            processes=args.discovery_processes,
+        ):
+            discovered.append(doc)
+            yield doc
+    except docs_lib.DiscoveryError as e:
+        errors.append(e)
+    if cache:
+        cache.save()
+
+
+def select_affected_documents(
+    documents: List[docs_lib.Document],
+    graph: DependencyGraph,
+    changed_files: Set[str],
+) -> List[docs_lib.Document]:
+    """
+    Selects the documents affected by `changed_files` through the reverse
+    dependency index, logging why each one was selected.
+    """
+    reverse_index = graph.reverse_index()
+    fonts = graph.fonts()
+    reasons: Dict[str, List[str]] = {}
+    for path in sorted(changed_files):
+        for source in reverse_index.get(path, ()):
+            if path == source:
+                reason = f"source '{path}' changed"
+            elif path.endswith(".meta.yaml"):
+                reason = f"metadata '{path}' changed"
+            elif path in fonts:
+                reason = f"font '{path}' changed"
+            else:
+                reason = f"dependency '{path}' changed"
+            reasons.setdefault(source, []).append(reason)
+
+    selected = [doc for doc in documents if doc.source in reasons]
+    for doc in selected:
+        logging.info(f"Selected '{doc.title}' ({doc.source}):")
+        for reason in reasons[doc.source]:
+            logging.info(f"  - {reason}")
+    logging.info(
+        f"{len(selected)} of {len(documents)} documents affected by {len(changed_files)} changed files."
+    )
+    return selected
+
+
+def changed_files_from_args(args: argparse.Namespace) -> Set[str]:
+    """Reads `--changed-files` or lists the changes since the `--since` ref."""
+    if args.changed_files:
+        try:
+            return docs_lib.read_changed_files(args.changed_files)
+        except FileNotFoundError:
+            logging.critical(f"Changed files list not found: '{args.changed_files}'")
+            sys.exit(1)
+    return docs_lib.changed_files_since(args.since)
+
+
+def positive_int(value: str) -> int:
+    """argparse type for strictly positive integers."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def add_build_arguments(parser: argparse.ArgumentParser):
+    """Adds the compilation options shared with pipeline.py."""
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=positive_int,
+        default=os.cpu_count() or 1,
+        help="Number of documents compiled concurrently (default: CPU count).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=build_cache.CACHE_DIR,
+        help="Directory of the persistent build cache.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always invoke typst, ignoring and not updating the build cache.",
+    )
+    parser.add_argument(
+        "--postprocess",
+        action="store_true",
+        help="Post-process compiled PDFs: downsample images (gs), linearize for "
+        "fast web view (qpdf) and check that fonts are subset (pdffonts).",
+    )
+    parser.add_argument(
+        "--downsample-dpi",
+        type=int,
+        default=pdf_postprocess.DEFAULT_DOWNSAMPLE_DPI,
+        help="Raster images above this resolution are downsampled; 0 disables it.",
+    )
+    parser.add_argument(
+        "--no-linearize",
+        action="store_true",
+        help="Do not linearize PDFs when post-processing.",
+    )
+    parser.add_argument(
+        "--thumbnails",
+        action="store_true",
+        help="Render a first-page thumbnail of each document and record its page "
+        f"count and size in '{thumbnails.PREVIEWS_NAME}' for the site tables.",
+    )
+    parser.add_argument(
+        "--thumbnail-ppi",
+        type=positive_int,
+        default=thumbnails.DEFAULT_THUMBNAIL_PPI,
+        help="Resolution of the thumbnails, in pixels per inch.",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="TIMINGS_JSON",
+        help="Database of compile durations used to balance '--shard' "
+        f"(default: '<cache-dir>/{build_shards.TIMINGS_NAME}').",
+    )
+    parser.add_argument(
+        "--font-staging",
+        action="store_true",
+        help=f"Give typst a directory with only the fonts of '{FONT_PATH}' each "
+        "document can select, instead of the whole directory.",
+    )
+
+
+def create_build_cache(args: argparse.Namespace) -> Optional[build_cache.BuildCache]:
+    """Loads the persistent build cache unless `--no-cache` was given."""
+    if args.no_cache:
+        return None
+    extra_inputs = ["--ignore-system-fonts", f"--font-path={FONT_PATH}"]
+    if args.font_staging:
+        extra_inputs.append(f"font-staging={font_index.STAGING_VERSION}")
+    cache = build_cache.BuildCache(
+        args.cache_dir,
+        build_cache.typst_version(),
+        extra_inputs=extra_inputs,
+        shared_files=docs_lib.new_dependency_graph().fonts(),
+    )
+    cache.load()
+    return cache
+
+
+def create_postprocessor(
+    args: argparse.Namespace,
+) -> Optional[pdf_postprocess.PdfPostprocessor]:
+    """Returns the PDF post-processor for `--postprocess`, if any tool is available."""
+    if not args.postprocess:
+        return None
+    postprocessor = pdf_postprocess.PdfPostprocessor(
+        args.cache_dir,
+        linearize=not args.no_linearize,
+        downsample_dpi=args.downsample_dpi or None,
+    )
+    if not postprocessor.enabled:
+        return None
+    postprocessor.load()
+    return postprocessor
+
+
+def create_font_stager(args: argparse.Namespace) -> Optional[font_index.FontStager]:
+    """
+    Returns the per-document font directories if `--font-staging` was given;
+    the index is loaded by `FontStager.load`.
+    """
+    if not args.font_staging:
+        return None
+    return font_index.FontStager(args.cache_dir, [FONT_PATH])
+
+
+def create_timings(args: argparse.Namespace) -> build_shards.TimingDatabase:
+    """Loads the compile durations of previous builds."""
+    timings = build_shards.TimingDatabase(
+        args.timings or os.path.join(args.cache_dir, build_shards.TIMINGS_NAME)
+    )
+    timings.load()
+    return timings
+
+
+def create_thumbnailer(
+    args: argparse.Namespace, fonts: Optional[font_index.FontStager] = None
+) -> Optional[thumbnails.Thumbnailer]:
+    """Returns the thumbnail renderer for `--thumbnails`."""
+    if not args.thumbnails:
+        return None
+
+    def compile_command(doc: docs_lib.Document, path: str) -> List[str]:
+        font_path = fonts.font_path(doc) if fonts is not None else FONT_PATH
+        return typst_command("compile", doc, path, font_path)
+
+    thumbnailer = thumbnails.Thumbnailer(
+        args.cache_dir, compile_command=compile_command, ppi=args.thumbnail_ppi
+    )
+    thumbnailer.load()
+    return thumbnailer
+
+
+def save_build_state(
+    documents: Iterable[docs_lib.Document],
+    cache: Optional[build_cache.BuildCache],
+    postprocessor: Optional[pdf_postprocess.PdfPostprocessor],
+    thumbnailer: Optional[thumbnails.Thumbnailer] = None,
+    results: Iterable[CompileResult] = (),
+    output_dir: Optional[str] = None,
+    fonts: Optional[font_index.FontStager] = None,
+    timings: Optional[build_shards.TimingDatabase] = None,
+):
+    """
+    Saves the caches, forgetting outputs of documents not in the model, and
+    updates the `previews.json` of `output_dir` with the built thumbnails.
+    """
+    documents = list(documents)
+    results = list(results)
+    outputs = [doc.output for doc in documents]
+    if timings is not None:
+        timings.record_results(results)
+        timings.retain(doc.source for doc in documents)
+        timings.save()
+    if cache is not None:
+        cache.retain(outputs)
+        cache.save()
+    if fonts is not None:
+        fonts.save()
+    if postprocessor is not None:
+        postprocessor.retain(outputs)
+        postprocessor.save()
+    if thumbnailer is not None:
+        thumbnailer.retain(outputs)
+        thumbnailer.save()
+        previews = {r.doc.output: r.preview for r in results if r.preview is not None}
+        thumbnails.write_previews(output_dir, previews, outputs)
+    elif output_dir is not None:
+        # Sizes would go stale once PDFs are rebuilt without thumbnails.
+        build_cache.remove_output(os.path.join(output_dir, thumbnails.PREVIEWS_NAME))
+
+
+def log_build_summary(
+    results: List[CompileResult],
+    elapsed: float,
+    cache_enabled: bool,
+    fonts: Optional[font_index.FontStager] = None,
+) -> int:
+    """Logs the build summary; returns the number of failed documents."""
+    failure_count = sum(1 for r in results if not r.success)
+    cached_count = sum(1 for r in results if r.cached)
+    compile_time = sum(r.duration for r in results)
+    logging.info("--------------------")
+    logging.info(
+        f"Build Finished. Summary: {len(results) - failure_count} succeeded, {failure_count} failed."
+    )
+    if cache_enabled:
+        logging.info(
+            f"Build cache: {cached_count} restored, {len(results) - cached_count} compiled."
+        )
+    logging.info(
+        f"Total time: {elapsed:.2f}s wall, {compile_time:.2f}s cumulative compile time."
+    )
+    postprocessed = [r.postprocess for r in results if r.postprocess is not None]
+    if postprocessed:
+        before = sum(p.size_before for p in postprocessed)
+        after = sum(p.size_after for p in postprocessed)
+        font_issues = sum(1 for p in postprocessed if p.font_warnings)
+        logging.info(
+            f"PDF post-processing: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB "
+            f"({(after - before) / before if before else 0:+.1%}) over "
+            f"{len(postprocessed)} documents, "
+            f"{sum(p.cached for p in postprocessed)} from cache, "
+            f"{font_issues} with font warnings."
+        )
+    if fonts is not None:
+        fonts.log_summary()
+    for result in sorted(results, key=lambda r: r.duration, reverse=True):
+        status = "cached" if result.cached else "ok" if result.success else "FAILED"
+        logging.info(f"  {result.duration:7.2f}s  {status:6}  {result.doc.source}")
+    logging.info("--------------------")
+    return failure_count
 
 
 def main():
@@ -72,31 +537,167 @@ def main():
     setup_logging()
 
     parser = argparse.ArgumentParser(description="Build Typst documents.")
+    subparsers = parser.add_subparsers(dest="command")
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help="Keep running and recompile documents and site pages as files change.",
+    )
+    watch_parser.add_argument(
+        "open",
+        nargs="*",
+        help="Document sources (.typ) to open immediately.",
+    )
+    watch_parser.add_argument(
+        "--outdir",
+        default="dist/docs",
+        help="Output directory for compiled documents.",
+    )
+    watch_parser.add_argument(
+        "--site-dir", default="site", help="Directory of the site templates."
+    )
+    watch_parser.add_argument(
+        "--site-outdir", default="dist", help="Output directory of the site."
+    )
+    watch_parser.add_argument(
+        "--max-open",
+        type=positive_int,
+        default=8,
+        help="Maximum number of documents kept open by 'typst watch' processes.",
+    )
+    watch_parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll for changes even if native file system events are available.",
+    )
+    watch_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=0.5,
+        help="Seconds between polls when polling for changes.",
+    )
+    merge_parser = subparsers.add_parser(
+        "merge",
+        help="Merge the output directories of '--shard' builds into one tree.",
+    )
+    build_shards.add_merge_arguments(merge_parser)
+
     parser.add_argument(
         "--outdir",
         default="dist/docs",
         help="Output directory for compiled documents.",
     )
+    add_build_arguments(parser)
+    docs_lib.add_discovery_arguments(parser)
+    docs_lib.add_profile_argument(parser)
+    precompress.add_precompress_arguments(parser)
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--changed-files",
+        help="Only build documents affected by the files listed in this file "
+        "(one path per line, as written by 'git diff --name-only').",
+    )
+    selection.add_argument(
+        "--since",
+        metavar="GIT_REF",
+        help="Only build documents affected by changes since the merge base with GIT_REF.",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="K/N",
+        type=build_shards.shard_spec,
+        help="Only build the K-th of N parts of the documents, balanced by the "
+        f"'--timings' of previous builds, and write '{build_shards.SHARD_SUMMARY_NAME}' "
+        "in the output directory for 'merge'.",
+    )
     args = parser.parse_args()
+    if args.command == "watch":
+        import watch_docs
+
+        watch_docs.run(args)
+        return
+    if args.command == "merge":
+        sys.exit(build_shards.merge(args))
+
+    docs_lib.setup_profiling(args)
     output_dir = args.outdir
 
     logging.debug(f"Ensuring output directory '{output_dir}' exists...")
     os.makedirs(output_dir, exist_ok=True)
 
-    document_model = docs_lib.discover_documents()
-    if not document_model:
-        return
+    graph = docs_lib.new_dependency_graph()
+    discovery_errors: List[docs_lib.DiscoveryError] = []
+    if args.model or args.changed_files or args.since or args.shard:
+        document_model = docs_lib.load_document_model(args, graph)
+        if not document_model:
+            return
+        to_build = document_model
+    else:
+        # Compile the first documents while the rest are still being discovered.
+        document_model = []
+        to_build = stream_documents(args, graph, document_model, discovery_errors)
 
-    logging.info(f"Starting compilation of {len(document_model)} documents...")
+    if args.changed_files or args.since:
+        changed_files = changed_files_from_args(args)
+        to_build = select_affected_documents(document_model, graph, changed_files)
+        # A shard still reports its (empty) part to 'merge'.
+        if not to_build and not args.shard:
+            logging.info("No documents affected by the changes, nothing to build.")
+            return
 
-    results = [compile_document(doc, output_dir) for doc in document_model]
+    timings = create_timings(args)
+    plan = None
+    if args.shard:
+        plan = build_shards.partition(to_build, args.shard[1], timings)
+        build_shards.log_plan(plan, args.shard[0], len(to_build))
+        to_build = plan.shards[args.shard[0] - 1]
 
-    failure_count = results.count(False)
-    logging.info("--------------------")
-    logging.info(
-        f"Build Finished. Summary: {len(results) - failure_count} succeeded, {failure_count} failed."
-    )
-    logging.info("--------------------")
+    cache = create_build_cache(args)
+    postprocessor = create_postprocessor(args)
+    fonts = create_font_stager(args)
+    if fonts is not None:
+        with docs_lib.profiler.span("font_index", "build"):
+            fonts.load()
+    thumbnailer = create_thumbnailer(args, fonts)
+
+    logging.info(f"Starting compilation with {args.jobs} jobs...")
+    start = time.perf_counter()
+    with docs_lib.profiler.span("compile_all", "build"):
+        results = compile_all(
+            to_build, output_dir, args.jobs, cache, postprocessor, thumbnailer, fonts
+        )
+    elapsed = time.perf_counter() - start
+
+    if discovery_errors:
+        logging.error(f"Discovery failed: {discovery_errors[0]}")
+        sys.exit(1)
+    if results:
+        save_build_state(
+            document_model,
+            cache,
+            postprocessor,
+            thumbnailer,
+            results,
+            output_dir,
+            fonts,
+            timings,
+        )
+    if plan is not None:
+        build_shards.write_shard_summary(
+            output_dir, args.shard, plan, results, timings, elapsed
+        )
+    if not results:
+        return
+
+    failure_count = log_build_summary(results, elapsed, cache is not None, fonts)
+
+    if args.precompress:
+        with docs_lib.profiler.span("precompress", "build"):
+            precompress.precompress_tree(
+                output_dir,
+                precompress.PDF_EXTENSIONS,
+                args.precompress_jobs,
+                args.precompress_report,
+            )
 
     if failure_count > 0:
         sys.exit(1)
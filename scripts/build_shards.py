@@ -0,0 +1,389 @@
+"""
+Splits the document build across CI jobs and merges their outputs.
+
+`build_docs.py --shard K/N` builds the K-th of N parts of the documents. The
+parts are balanced with longest-processing-time-first bin packing over the
+compile durations of previous builds (`TimingDatabase`); documents never
+built before are estimated from the size of their sources. Every job must see
+the same timing database to compute the same partition, which `merge` checks
+through the partition digest each shard records in its `shard.json`.
+
+Usage:
+    python scripts/build_docs.py --shard 1/4 --outdir shard
+    python scripts/build_docs.py merge shards/shard-* --outdir dist/docs
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import docs_lib
+import build_cache
+import thumbnails
+
+TIMINGS_NAME = "timings.json"
+TIMINGS_VERSION = 1
+SHARD_SUMMARY_NAME = "shard.json"
+SHARD_SUMMARY_VERSION = 1
+# Weight of the latest duration in the smoothed compile time of a document.
+SMOOTHING = 0.5
+# Rough guess used until the database has any timing; it only has to rank.
+DEFAULT_SECONDS_PER_BYTE = 1.0 / (1 << 20)
+
+
+def shard_spec(value: str) -> Tuple[int, int]:
+    """argparse type for `K/N`, the K-th (1-based) of N shards."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected K/N, got '{value}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} is not in 1..{count}")
+    return index, count
+
+
+def source_size(doc: docs_lib.Document, sizes: Dict[str, int]) -> int:
+    """Bytes of the files a document is compiled from; `sizes` memoizes shared files."""
+    total = 0
+    for path in (doc.source, doc.meta_path, *doc.subfiles):
+        size = sizes.get(path)
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            sizes[path] = size
+        total += size
+    return total
+
+
+class TimingDatabase:
+    """
+    Smoothed compile duration and source size of each document, updated by
+    every build that compiles it (restores from the build cache do not count).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logging.debug(f"No timing database at '{self.path}'.")
+            return
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt timing database: {e}")
+            return
+        if data.get("version") == TIMINGS_VERSION:
+            self.entries = data.get("documents", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": TIMINGS_VERSION, "documents": self.entries},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.path)
+
+    def retain(self, sources: Iterable[str]):
+        """Forgets documents that no longer exist."""
+        keep = set(sources)
+        self.entries = {k: v for k, v in self.entries.items() if k in keep}
+
+    def record(self, doc: docs_lib.Document, seconds: float, size: int):
+        entry = self.entries.get(doc.source)
+        if entry is not None:
+            seconds = SMOOTHING * seconds + (1 - SMOOTHING) * entry["seconds"]
+        self.entries[doc.source] = {
+            "seconds": round(seconds, 4),
+            "size": size,
+            "builds": (entry["builds"] if entry else 0) + 1,
+        }
+
+    def record_results(self, results: Iterable):
+        """Records the `CompileResult`s of documents that were actually compiled."""
+        sizes: Dict[str, int] = {}
+        for result in results:
+            if result.success and not result.cached:
+                self.record(result.doc, result.duration, source_size(result.doc, sizes))
+
+    def seconds_per_byte(self) -> float:
+        """Average compile time per source byte of the known documents."""
+        seconds = sum(entry["seconds"] for entry in self.entries.values())
+        size = sum(entry["size"] for entry in self.entries.values())
+        return seconds / size if size else DEFAULT_SECONDS_PER_BYTE
+
+    def estimates(self, documents: Iterable[docs_lib.Document]) -> Dict[str, float]:
+        """Expected compile seconds of each document, by source."""
+        rate = self.seconds_per_byte()
+        sizes: Dict[str, int] = {}
+        estimates = {}
+        for doc in documents:
+            entry = self.entries.get(doc.source)
+            if entry is not None:
+                estimates[doc.source] = entry["seconds"]
+            else:
+                estimates[doc.source] = source_size(doc, sizes) * rate
+        return estimates
+
+
+@dataclass
+class ShardPlan:
+    """Documents of each shard, longest first, with their expected compile time."""
+
+    shards: List[List[docs_lib.Document]]
+    loads: List[float]
+    digest: str
+
+
+def partition(
+    documents: Iterable[docs_lib.Document], count: int, timings: TimingDatabase
+) -> ShardPlan:
+    """
+    Longest-processing-time-first: documents are taken by decreasing estimate
+    and each goes to the least loaded shard. Ties are broken by source and by
+    shard number, so every job computes the same plan from the same inputs.
+    """
+    documents = list(documents)
+    estimates = timings.estimates(documents)
+    shards: List[List[docs_lib.Document]] = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for doc in sorted(documents, key=lambda d: (-estimates[d.source], d.source)):
+        target = min(range(count), key=lambda i: (loads[i], i))
+        shards[target].append(doc)
+        loads[target] += estimates[doc.source]
+
+    digest = hashlib.sha256()
+    for index, shard in enumerate(shards, start=1):
+        for doc in shard:
+            digest.update(f"{index}\t{doc.source}\n".encode("utf-8"))
+    return ShardPlan(shards, loads, digest.hexdigest())
+
+
+def log_plan(plan: ShardPlan, index: int, total: int):
+    count = len(plan.shards)
+    logging.info(
+        f"Shard {index}/{count}: {len(plan.shards[index - 1])} of {total} documents, "
+        f"{plan.loads[index - 1]:.1f}s expected (shards: "
+        + ", ".join(f"{load:.1f}s" for load in plan.loads)
+        + ")."
+    )
+
+
+def write_shard_summary(
+    output_dir: str,
+    shard: Tuple[int, int],
+    plan: ShardPlan,
+    results: Iterable,
+    timings: TimingDatabase,
+    elapsed: float,
+):
+    """Writes `shard.json` next to the PDFs of a shard, for `merge`."""
+    index, count = shard
+    assigned = [doc.source for doc in plan.shards[index - 1]]
+    summary = {
+        "version": SHARD_SUMMARY_VERSION,
+        "shard": index,
+        "shards": count,
+        "partition": plan.digest,
+        "documents": assigned,
+        "elapsed": round(elapsed, 3),
+        "results": [
+            {
+                "source": r.doc.source,
+                "output": r.doc.output,
+                "success": r.success,
+                "cached": r.cached,
+                "duration": round(r.duration, 3),
+            }
+            for r in sorted(results, key=lambda r: r.doc.source)
+        ],
+        "timings": {s: timings.entries[s] for s in assigned if s in timings.entries},
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, SHARD_SUMMARY_NAME), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+
+def _read_summaries(shard_dirs: List[str], errors: List[str]) -> List[Dict]:
+    summaries = []
+    for shard_dir in shard_dirs:
+        path = os.path.join(shard_dir, SHARD_SUMMARY_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            errors.append(f"Cannot read '{path}': {e}")
+            continue
+        if summary.get("version") != SHARD_SUMMARY_VERSION:
+            errors.append(f"'{path}' has an unsupported format.")
+            continue
+        summary["dir"] = shard_dir
+        summaries.append(summary)
+    return summaries
+
+
+def check_shards(summaries: List[Dict], errors: List[str]):
+    """Checks that the shards come from one partition and cover it exactly once."""
+    if not summaries:
+        errors.append("No shard summaries to merge.")
+        return
+    counts = {s["shards"] for s in summaries}
+    digests = {s["partition"] for s in summaries}
+    if len(counts) > 1:
+        errors.append(f"Shards of different splits: {sorted(counts)} shards.")
+    if len(digests) > 1:
+        errors.append(
+            "Shards computed different partitions; every job must use the same "
+            "timing database and document model."
+        )
+    indexes = sorted(s["shard"] for s in summaries)
+    expected = list(range(1, max(counts) + 1))
+    if indexes != expected:
+        errors.append(f"Expected shards {expected}, got {indexes}.")
+
+    owners: Dict[str, int] = {}
+    for summary in summaries:
+        built = {r["source"] for r in summary["results"]}
+        for source in summary["documents"]:
+            if source in owners:
+                errors.append(
+                    f"'{source}' built by shards {owners[source]} and {summary['shard']}."
+                )
+            owners[source] = summary["shard"]
+            if source not in built:
+                errors.append(f"'{source}' has no result in shard {summary['shard']}.")
+
+
+def _merge_tree(
+    shard_dir: str, output_dir: str, sources: Dict[str, str], errors: List[str]
+):
+    """Links the files of a shard into `output_dir`, refusing conflicting copies."""
+    skip = {SHARD_SUMMARY_NAME, thumbnails.PREVIEWS_NAME}
+    for root, dirs, names in os.walk(shard_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, shard_dir)
+            if rel_path in skip:
+                continue
+            target = os.path.join(output_dir, rel_path)
+            if rel_path in sources:
+                if _hash_file(target) != _hash_file(path):
+                    errors.append(
+                        f"'{rel_path}' differs between '{sources[rel_path]}' and '{shard_dir}'."
+                    )
+                continue
+            sources[rel_path] = shard_dir
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            build_cache.remove_output(target)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merge(args: argparse.Namespace) -> int:
+    """
+    Combines the output directories of the shards into `args.outdir`, merges
+    their `previews.json` and timings, and returns one exit code for the build.
+    """
+    errors: List[str] = []
+    summaries = sorted(_read_summaries(args.shards, errors), key=lambda s: s["shard"])
+    check_shards(summaries, errors)
+    complete = not errors
+
+    os.makedirs(args.outdir, exist_ok=True)
+    sources: Dict[str, str] = {}
+    previews: Dict[str, thumbnails.DocumentPreview] = {}
+    for summary in summaries:
+        _merge_tree(summary["dir"], args.outdir, sources, errors)
+        previews.update(thumbnails.load_previews(summary["dir"]))
+    if previews:
+        outputs = [r["output"] for s in summaries for r in s["results"]]
+        thumbnails.write_previews(args.outdir, previews, outputs)
+
+    if args.timings:
+        timings = TimingDatabase(args.timings)
+        timings.load()
+        for summary in summaries:
+            timings.entries.update(summary["timings"])
+        # Only a complete set of shards lists every document of the build.
+        if complete:
+            timings.retain(s for summary in summaries for s in summary["documents"])
+        timings.save()
+
+    results = [r for s in summaries for r in s["results"]]
+    failed = [r for r in results if not r["success"]]
+    logging.info("--------------------")
+    logging.info(
+        f"Merged {len(summaries)} shards into '{args.outdir}': "
+        f"{len(results) - len(failed)} succeeded, {len(failed)} failed, "
+        f"{sum(r['cached'] for r in results)} restored from the build cache."
+    )
+    for summary in summaries:
+        compile_time = sum(r["duration"] for r in summary["results"])
+        logging.info(
+            f"  shard {summary['shard']}: {len(summary['results'])} documents, "
+            f"{summary['elapsed']:.1f}s wall, {compile_time:.1f}s compile time"
+        )
+    for result in failed:
+        logging.error(f"FAILED: {result['source']}")
+    for error in errors:
+        logging.error(error)
+    logging.info("--------------------")
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "success": not failed and not errors,
+                    "shards": [
+                        {k: v for k, v in s.items() if k not in ("dir", "timings")}
+                        for s in summaries
+                    ],
+                    "failed": [r["source"] for r in failed],
+                    "errors": errors,
+                },
+                f,
+                indent=2,
+            )
+    return 1 if failed or errors else 0
+
+
+def add_merge_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "shards",
+        nargs="+",
+        help=f"Shard output directories, each with a '{SHARD_SUMMARY_NAME}'.",
+    )
+    parser.add_argument(
+        "--outdir", default="dist/docs", help="Directory the shards are merged into."
+    )
+    parser.add_argument(
+        "--timings",
+        help="Timing database to update with the durations measured by the shards.",
+    )
+    parser.add_argument(
+        "--summary", help="Write the merged build summary to this JSON file."
+    )
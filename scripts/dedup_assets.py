@@ -0,0 +1,172 @@
+"""
+Finds identical files (template logos, signatures, fonts, PDFs...) by content
+hash and reports how many bytes they waste. With `--link`, duplicates inside a
+staging tree such as `dist/` are replaced by hardlinks to one canonical copy,
+so the Pages artifact (a tar archive, which stores hardlinks once) and any
+local server only carry each asset once.
+
+Usage:
+    python scripts/dedup_assets.py docs              # report only
+    python scripts/dedup_assets.py --link dist       # deduplicate the site
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass
+class DuplicateGroup:
+    """Files sharing one content hash; `paths[0]` is the canonical copy."""
+
+    digest: str
+    size: int
+    paths: List[str]
+    inodes: int
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Bytes stored more than once, counting hardlinked copies once."""
+        return (self.inodes - 1) * self.size
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_duplicates(root: str, min_size: int = 1) -> List[DuplicateGroup]:
+    """
+    Groups the files below `root` by content. Only files sharing their size
+    with another file are hashed, which keeps the scan cheap.
+    """
+    by_size: Dict[int, List[str]] = defaultdict(list)
+    for dirpath, dirs, names in os.walk(root):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                continue
+            size = os.path.getsize(path)
+            if size >= min_size:
+                by_size[size].append(path)
+
+    groups = []
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        by_digest: Dict[str, List[str]] = defaultdict(list)
+        for path in paths:
+            by_digest[_hash_file(path)].append(path)
+        for digest, same in by_digest.items():
+            if len(same) < 2:
+                continue
+            inodes = {(os.stat(p).st_dev, os.stat(p).st_ino) for p in same}
+            groups.append(DuplicateGroup(digest, size, sorted(same), len(inodes)))
+    return sorted(groups, key=lambda g: g.wasted_bytes, reverse=True)
+
+
+def link_duplicates(groups: List[DuplicateGroup]) -> int:
+    """Replaces every duplicate with a hardlink to its canonical copy; returns bytes saved."""
+    saved = 0
+    for group in groups:
+        canonical = group.paths[0]
+        canonical_stat = os.stat(canonical)
+        for path in group.paths[1:]:
+            st = os.stat(path)
+            if (st.st_dev, st.st_ino) == (canonical_stat.st_dev, canonical_stat.st_ino):
+                continue
+            # Link next to the duplicate, then rename over it atomically.
+            tmp_path = f"{path}.dedup.tmp"
+            try:
+                os.link(canonical, tmp_path)
+            except OSError as e:
+                logging.warning(f"Cannot hardlink '{path}' to '{canonical}': {e}")
+                continue
+            os.replace(tmp_path, path)
+        inodes = {(os.stat(p).st_dev, os.stat(p).st_ino) for p in group.paths}
+        saved += (group.inodes - len(inodes)) * group.size
+        group.inodes = len(inodes)
+    return saved
+
+
+def log_report(root: str, groups: List[DuplicateGroup], top: int):
+    wasted = sum(g.wasted_bytes for g in groups)
+    copies = sum(len(g.paths) - 1 for g in groups)
+    logging.info(
+        f"'{root}': {len(groups)} duplicated files, {copies} extra copies, "
+        f"{wasted / 1024:.1f} KiB stored more than once."
+    )
+    for group in groups[:top]:
+        logging.info(
+            f"  {group.wasted_bytes / 1024:9.1f} KiB  {len(group.paths)}x "
+            f"{group.size / 1024:.1f} KiB  {group.paths[0]}"
+        )
+        for path in group.paths[1:]:
+            logging.debug(f"      = {path}")
+
+
+def main():
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    parser = argparse.ArgumentParser(
+        description="Report duplicated files and optionally hardlink them."
+    )
+    parser.add_argument(
+        "roots", nargs="*", default=["docs"], help="Directories to scan (default: docs)."
+    )
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="Hardlink duplicates to a canonical copy. Meant for build output "
+        "trees such as 'dist/', not for the git checkout.",
+    )
+    parser.add_argument(
+        "--min-size", type=int, default=1, help="Ignore files smaller than this."
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of duplicate groups listed."
+    )
+    parser.add_argument("--report", metavar="REPORT_JSON", help="Write a JSON report.")
+    args = parser.parse_args()
+
+    report = {}
+    for root in args.roots:
+        if not os.path.isdir(root):
+            logging.critical(f"Directory '{root}' not found.")
+            sys.exit(1)
+        groups = find_duplicates(root, args.min_size)
+        log_report(root, groups, args.top)
+        wasted = sum(g.wasted_bytes for g in groups)
+        saved: Optional[int] = None
+        if args.link:
+            saved = link_duplicates(groups)
+            logging.info(f"'{root}': hardlinked duplicates, {saved / 1024:.1f} KiB saved.")
+        report[root] = {
+            "wasted_bytes": wasted,
+            "saved_bytes": saved,
+            "duplicates": [
+                {"sha256": g.digest, "size": g.size, "paths": g.paths} for g in groups
+            ],
+        }
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Report written to '{args.report}'.")
+
+
+if __name__ == "__main__":
+    main()
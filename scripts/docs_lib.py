@@ -4,27 +4,480 @@ import sys
 import logging
 import json
 import re
+import hashlib
+import argparse
+import subprocess
+import functools
+import threading
+import time
+import atexit
+from contextlib import contextmanager
 from pathlib import Path
-from jsonschema import validate, ValidationError
-from dataclasses import dataclass
-from typing import List, Dict, Set, Optional
+from jsonschema import Draft202012Validator, FormatChecker, validators
+from jsonschema.exceptions import SchemaError
+from dataclasses import asdict, is_dataclass
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, List, Dict, Iterable, Iterator, Set, Optional, Tuple
+
+from typst_deps import DependencyGraph
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 META_SCHEMA_PATH = ".schemas/meta.schema.json"
+TEMPLATES_DIR = "docs/00-templates"
+FONT_PATH = "docs/00-templates/assets/fonts"
 GROUP_DIR_REGEX = re.compile(r"^(01-|[1-9][0-9]-)")
 VALID_SUBGROUPS = {"interno", "esterno", "slides"}
+DISCOVERY_CACHE_PATH = ".build-cache/discovery.json"
+DISCOVERY_CACHE_VERSION = 2
+METADATA_SIDECAR_DIR = ".build-cache/meta-json"
+YAML_C_LOADER = getattr(yaml, "CSafeLoader", None)
+PROFILE_ENV_VAR = "DOCS_PROFILE"
+PROFILE_METRICS = ("cpu_ms", "children_cpu_ms", "peak_rss_mb", "children_peak_rss_mb")
+
+
+def _peak_rss_mb(children: bool = False) -> float:
+    """Peak resident set size of this process (or its largest reaped child), in MiB."""
+    if resource is None:
+        return 0.0
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _children_cpu_seconds() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """
+    Records timed spans (wall time, CPU time of the calling thread, CPU time
+    of reaped child processes and peak RSS) and writes them as a Chrome
+    trace-event JSON file, loadable in chrome://tracing or Perfetto.
+
+    Child CPU time comes from process-wide counters, so it is only exact for
+    spans that do not overlap with other subprocesses.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_path: Optional[str] = None
+        self.events: List[Dict] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self, output_path: str):
+        self.enabled = True
+        self.output_path = output_path
+        atexit.register(self.write)
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        """Times the enclosed block when profiling is enabled."""
+        if not self.enabled:
+            yield
+            return
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        children_start = _children_cpu_seconds()
+        try:
+            yield
+        finally:
+            wall_end = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (wall_start - self._origin) * 1e6,
+                "dur": (wall_end - wall_start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {
+                    **{k: str(v) for k, v in args.items()},
+                    "cpu_ms": round((time.thread_time() - cpu_start) * 1000, 3),
+                    "children_cpu_ms": round(
+                        (_children_cpu_seconds() - children_start) * 1000, 3
+                    ),
+                    "peak_rss_mb": round(_peak_rss_mb(), 1),
+                    "children_peak_rss_mb": round(_peak_rss_mb(children=True), 1),
+                },
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def profiled(self, name: Optional[str] = None, category: str = "stage"):
+        """Decorator variant of `span`."""
+
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, category):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self, top: int = 10) -> List[str]:
+        """Formats per-stage totals and the slowest individual spans."""
+        with self._lock:
+            events = list(self.events)
+        totals: Dict[str, Dict] = {}
+        for e in events:
+            t = totals.setdefault(
+                e["name"],
+                {"count": 0, "wall": 0.0, "cpu": 0.0, "child": 0.0, "max": 0.0},
+            )
+            t["count"] += 1
+            t["wall"] += e["dur"] / 1e6
+            t["cpu"] += e["args"]["cpu_ms"] / 1000
+            t["child"] += e["args"]["children_cpu_ms"] / 1000
+            t["max"] = max(t["max"], e["dur"] / 1e6)
+
+        lines = [
+            f"{'stage':28} {'count':>6} {'wall s':>9} {'cpu s':>8} "
+            f"{'child s':>8} {'max s':>8}"
+        ]
+        by_wall = sorted(totals.items(), key=lambda kv: kv[1]["wall"], reverse=True)
+        for name, t in by_wall:
+            lines.append(
+                f"{name:28} {t['count']:6} {t['wall']:9.3f} {t['cpu']:8.3f} "
+                f"{t['child']:8.3f} {t['max']:8.3f}"
+            )
+        if resource:
+            lines.append(
+                f"peak RSS: {_peak_rss_mb():.1f} MiB (self), "
+                f"{_peak_rss_mb(children=True):.1f} MiB (largest child)"
+            )
+
+        slowest = sorted(events, key=lambda e: e["dur"], reverse=True)[:top]
+        if slowest:
+            lines.append(f"slowest {len(slowest)} spans:")
+        for e in slowest:
+            detail = ", ".join(
+                f"{k}={v}" for k, v in e["args"].items() if k not in PROFILE_METRICS
+            )
+            lines.append(f"  {e['dur'] / 1e6:8.3f}s  {e['name']}  {detail}")
+        return lines
+
+    def write(self):
+        """Writes the trace file and logs the summary table."""
+        if not self.enabled or not self.output_path:
+            return
+        with self._lock:
+            trace = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        for line in self.summary():
+            logging.info(line)
+        logging.info(f"Profile trace written to '{self.output_path}'.")
+        self.enabled = False
+
+
+profiler = Profiler()
+
+
+def add_profile_argument(parser: argparse.ArgumentParser):
+    """Adds the `--profile` option shared by every script."""
+    parser.add_argument(
+        "--profile",
+        metavar="TRACE_JSON",
+        default=os.environ.get(PROFILE_ENV_VAR),
+        help="Record stage timings and write a Chrome trace-event JSON file "
+        f"(also enabled by the {PROFILE_ENV_VAR} environment variable).",
+    )
+
+
+def setup_profiling(args: argparse.Namespace):
+    """Enables the profiler if `--profile` (or the environment variable) was given."""
+    if args.profile:
+        profiler.enable(args.profile)
+
+
+def hash_metadata(metadata: Dict) -> str:
+    """Content hash of parsed metadata, e.g. to tell whether derived data is stale."""
+    encoded = json.dumps(metadata, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
 
 
-@dataclass
 class Document:
-    source: str
-    output: str
-    group: str
-    subgroup: str
-    meta_path: str
-    metadata: Dict
-    subfiles: Set[str]
-    latest_version: int
-    last_modified_date: str
+    """
+    A discovered document, kept compact so that large trees fit in memory:
+    slotted, with interned strings (groups, dates and the template paths
+    shared as subfiles by many documents) and subfiles as a sorted tuple.
+
+    Only the title and the head changelog entry are kept from the metadata;
+    the full `metadata` (every changelog entry with authors, verifiers and
+    descriptions) is parsed from `meta_path` on first access. Documents read
+    from a model file or another snapshot pass `keep_metadata=True` instead,
+    so their metadata never comes from the working tree.
+    """
+
+    __slots__ = (
+        "source",
+        "output",
+        "group",
+        "subgroup",
+        "meta_path",
+        "title",
+        "subfiles",
+        "latest_version",
+        "last_modified_date",
+        "metadata_hash",
+        "_metadata",
+        "_snapshot",
+    )
+
+    def __init__(
+        self,
+        source: str,
+        output: str,
+        group: str,
+        subgroup: str,
+        meta_path: str,
+        metadata: Optional[Dict] = None,
+        subfiles: Iterable[str] = (),
+        latest_version: int = 0,
+        last_modified_date: str = "",
+        title: Optional[str] = None,
+        metadata_hash: Optional[str] = None,
+        keep_metadata: bool = False,
+    ):
+        intern = sys.intern
+        self.source = intern(source)
+        self.output = intern(output)
+        self.group = intern(group)
+        self.subgroup = intern(subgroup)
+        self.meta_path = intern(meta_path)
+        self.subfiles: Tuple[str, ...] = tuple(sorted(map(intern, subfiles)))
+        self.latest_version = latest_version
+        self.last_modified_date = intern(last_modified_date)
+        if metadata is not None:
+            title = metadata.get("title", "Untitled")
+            metadata_hash = hash_metadata(metadata)
+        self.title = title if title is not None else "Untitled"
+        self.metadata_hash = metadata_hash or ""
+        # Unless kept, parsed again from `meta_path` if ever needed.
+        self._snapshot = keep_metadata and metadata is not None
+        self._metadata: Optional[Dict] = metadata if self._snapshot else None
+
+    def read_metadata(self) -> Dict:
+        """
+        Returns the snapshot metadata, or parses `meta_path` without keeping
+        the result on the document.
+        """
+        if self._snapshot:
+            return self._metadata
+        try:
+            data = _metadata_loader.load(self.meta_path)
+        except (OSError, yaml.YAMLError) as e:
+            logging.error(f"Could not parse '{self.meta_path}': {e}")
+            data = None
+        if not data:
+            logging.warning(
+                f"Could not reload '{self.meta_path}', using its cached summary."
+            )
+            return {
+                "title": self.title,
+                "changelog": [
+                    {"version": self.latest_version, "date": self.last_modified_date}
+                ],
+            }
+        return data
+
+    @property
+    def metadata(self) -> Dict:
+        """The full parsed metadata, loaded on first access."""
+        if self._metadata is None:
+            self._metadata = self.read_metadata()
+        return self._metadata
+
+    def to_dict(self, with_metadata: bool = False) -> Dict:
+        data = {
+            "source": self.source,
+            "output": self.output,
+            "group": self.group,
+            "subgroup": self.subgroup,
+            "meta_path": self.meta_path,
+            "title": self.title,
+            "metadata_hash": self.metadata_hash,
+            "subfiles": list(self.subfiles),
+            "latest_version": self.latest_version,
+            "last_modified_date": self.last_modified_date,
+        }
+        if with_metadata:
+            data["metadata"] = self.read_metadata()
+        return data
+
+    def __reduce__(self):
+        # Rebuilt through __init__ so strings are interned in the receiving process.
+        return document_from_dict, (self.to_dict(with_metadata=self._snapshot),)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Document):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Document(source={self.source!r}, version={self.latest_version})"
+
+
+class DocumentEncoder(json.JSONEncoder):
+    """Custom JSON encoder to handle documents, dataclasses and sets."""
+
+    # Documents are written compact (title and metadata hash only) unless set.
+    with_metadata = False
+
+    def default(self, obj):
+        if isinstance(obj, Document):
+            return obj.to_dict(self.with_metadata)
+        if is_dataclass(obj):
+            return asdict(obj)
+        if isinstance(obj, Set):
+            return sorted(list(obj))
+        return super().default(obj)
+
+
+class ModelEncoder(DocumentEncoder):
+    """Writes documents with their full metadata, as in `save_model` files."""
+
+    with_metadata = True
+
+
+def document_from_dict(data: Dict) -> Document:
+    """
+    Rebuilds a Document from its `DocumentEncoder` JSON representation, with
+    or without the full `metadata`; metadata given here is kept as a snapshot.
+    """
+    return Document(
+        source=data["source"],
+        output=data["output"],
+        group=data["group"],
+        subgroup=data["subgroup"],
+        meta_path=data["meta_path"],
+        metadata=data.get("metadata"),
+        subfiles=data["subfiles"],
+        latest_version=data["latest_version"],
+        last_modified_date=data["last_modified_date"],
+        title=data.get("title"),
+        metadata_hash=data.get("metadata_hash"),
+        keep_metadata=True,
+    )
+
+
+def save_model(documents: List[Document], output_path: str):
+    """Writes a document model as JSON."""
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(documents, f, cls=ModelEncoder, indent=2)
+
+
+def load_model(model_path: str) -> List[Document]:
+    """Reads a document model written by `save_model`."""
+    try:
+        with open(model_path, "r", encoding="utf-8") as f:
+            return [document_from_dict(d) for d in json.load(f)]
+    except FileNotFoundError:
+        logging.critical(f"Document model not found: '{model_path}'")
+        sys.exit(1)
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logging.critical(f"Invalid document model '{model_path}': {e}")
+        sys.exit(1)
+
+
+class DiscoveryCache:
+    """
+    On-disk cache of discovered documents. An entry is reused as long as the
+    fingerprint of every file the document was built from (source, metadata
+    and dependencies) still matches: (mtime, size) by default, or the content
+    hash in `hash_mode`.
+    """
+
+    def __init__(self, cache_path: str, hash_mode: bool = False):
+        self.cache_path = cache_path
+        self.hash_mode = hash_mode
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _header(self) -> Dict:
+        return {
+            "version": DISCOVERY_CACHE_VERSION,
+            "hash_mode": self.hash_mode,
+            "schema": self._fingerprint(META_SCHEMA_PATH),
+        }
+
+    def _fingerprint(self, path: str):
+        try:
+            if self.hash_mode:
+                with open(path, "rb") as f:
+                    return hashlib.sha256(f.read()).hexdigest()
+            st = os.stat(path)
+            return [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt discovery cache '{self.cache_path}': {e}")
+            return
+        if data.get("header") != self._header():
+            logging.debug("Discovery cache is stale (schema or format changed).")
+            return
+        self.entries = data.get("documents", {})
+
+    def save(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"header": self._header(), "documents": self.entries},
+                f,
+                cls=DocumentEncoder,
+            )
+        os.replace(tmp_path, self.cache_path)
+
+    def lookup(self, doc_dir: str) -> Optional[Document]:
+        """Returns the cached document of `doc_dir` if none of its inputs changed."""
+        entry = self.entries.get(doc_dir)
+        if entry is not None and all(
+            self._fingerprint(path) == fingerprint
+            for path, fingerprint in entry["files"].items()
+        ):
+            self.hits += 1
+            return document_from_dict(entry["document"])
+        self.misses += 1
+        return None
+
+    def store(self, doc_dir: str, doc: Document):
+        files = {doc.source, doc.meta_path, *doc.subfiles}
+        self.entries[doc_dir] = {
+            "files": {path: self._fingerprint(path) for path in sorted(files)},
+            "document": doc,
+        }
+
+    def retain(self, doc_dirs: Set[str]):
+        """Drops entries of directories that were not seen in the last scan."""
+        self.entries = {k: v for k, v in self.entries.items() if k in doc_dirs}
 
 
 class FileLoader:
@@ -47,82 +500,490 @@ class LocalFileLoader(FileLoader):
             return None
 
 
-def discover_documents(scan_root: str = "docs") -> List[Document]:
+class GitFileLoader(FileLoader):
     """
-    Scans the filesystem from `scan_root` and creates the document model based on conventions.
+    Loads file content as of a git revision, through one long-lived
+    `git cat-file --batch` process, without checking the revision out.
     """
-    logging.debug(f"Starting document discovery in '{scan_root}'...")
-    document_model = []
-    scan_root_path = Path(scan_root)
 
-    if not scan_root_path.is_dir():
-        logging.critical(f"Scan root directory not found: '{scan_root}'")
-        sys.exit(1)
+    def __init__(self, revision: str):
+        self.revision = revision
+        self._lock = threading.Lock()
+        try:
+            self._proc = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            logging.critical("git command not found. Is it installed and in your PATH?")
+            sys.exit(1)
+
+    def _read_object(self) -> Optional[bytes]:
+        header = self._proc.stdout.readline().decode("utf-8").split()
+        if len(header) != 3:  # "<object> missing" or "ambiguous"
+            return None
+        data = self._proc.stdout.read(int(header[2]))
+        self._proc.stdout.read(1)  # trailing newline
+        return data if header[1] == "blob" else None
+
+    def get_many(self, file_paths: List[str]) -> Dict[str, Optional[str]]:
+        """Fetches several files with a single round trip to git."""
+        with self._lock:
+            requests = "".join(f"{self.revision}:{p}\n" for p in file_paths)
+            self._proc.stdin.write(requests.encode("utf-8"))
+            self._proc.stdin.flush()
+            contents = {}
+            for path in file_paths:
+                data = self._read_object()
+                contents[path] = None if data is None else data.decode("utf-8")
+        return contents
+
+    def get_content(self, file_path: str) -> Optional[str]:
+        logging.debug(f"Loading '{file_path}' at '{self.revision}'")
+        return self.get_many([file_path])[file_path]
+
+    def close(self):
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            self._proc.wait()
+
+
+class MetadataLoader:
+    """Abstract base for metadata loaders."""
+
+    def load(self, meta_path: str) -> Optional[Any]:
+        """Returns the parsed metadata, or None if the file cannot be read."""
+        raise NotImplementedError("Subclasses must implement this method.")
+
+
+class YamlMetadataLoader(MetadataLoader):
+    """
+    Parses `.meta.yaml` files, with libyaml's `CSafeLoader` when PyYAML was
+    built against it and the pure-Python `SafeLoader` otherwise.
+    """
+
+    def __init__(
+        self, file_loader: Optional[FileLoader] = None, use_libyaml: bool = True
+    ):
+        self.file_loader = file_loader or LocalFileLoader()
+        if use_libyaml and YAML_C_LOADER is not None:
+            self.loader_class = YAML_C_LOADER
+        else:
+            self.loader_class = yaml.SafeLoader
 
-    for root, dirs, _ in os.walk(scan_root_path, topdown=True):
-        root_path = Path(root)
+    def parse(self, content: str) -> Any:
+        return yaml.load(content, Loader=self.loader_class)
 
+    def load(self, meta_path: str) -> Optional[Any]:
+        content = self.file_loader.get_content(meta_path)
+        if content is None:
+            return None
+        return self.parse(content)
+
+
+class JsonSidecarMetadataLoader(MetadataLoader):
+    """
+    Reads a precompiled JSON copy of each metadata file from `sidecar_dir`
+    when it is newer than the YAML, and refreshes it from `fallback` otherwise.
+    """
+
+    def __init__(self, sidecar_dir: str, fallback: MetadataLoader):
+        self.sidecar_dir = sidecar_dir
+        self.fallback = fallback
+
+    def sidecar_path(self, meta_path: str) -> Optional[str]:
+        """
+        Mirrors `meta_path` under `sidecar_dir`: relative paths as they are,
+        absolute ones (or ones leaving the working directory) without their
+        anchor. None if the result would still lie outside `sidecar_dir`.
+        """
+        relative = os.path.normpath(meta_path)
+        if os.path.isabs(relative) or relative.split(os.sep)[0] == os.pardir:
+            relative = os.path.splitdrive(os.path.abspath(meta_path))[1].lstrip(os.sep)
+        sidecar = os.path.join(self.sidecar_dir, f"{relative}.json")
+        root = os.path.abspath(self.sidecar_dir)
+        if os.path.commonpath([root, os.path.abspath(sidecar)]) != root:
+            return None
+        return sidecar
+
+    def load(self, meta_path: str) -> Optional[Any]:
+        sidecar = self.sidecar_path(meta_path)
+        if sidecar is None:
+            return self.fallback.load(meta_path)
         try:
-            relative_path = root_path.relative_to(scan_root_path)
-        except ValueError:
-            logging.warning(
-                f"Skipping directory not relative to scan root: {root_path}"
-            )
-            continue
+            if os.stat(sidecar).st_mtime_ns >= os.stat(meta_path).st_mtime_ns:
+                with open(sidecar, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
 
-        path_parts = relative_path.parts
+        data = self.fallback.load(meta_path)
+        if data is not None:
+            self._write(sidecar, data)
+        return data
 
-        if not path_parts:
-            if "00-templates" in dirs:
-                logging.debug("Skipping '00-templates' directory.")
-                dirs.remove("00-templates")
-            continue
+    @staticmethod
+    def _write(sidecar: str, data: Any):
+        try:
+            payload = json.dumps(data, ensure_ascii=False)
+        except TypeError:
+            # e.g. unquoted YAML dates: not representable, keep using the YAML.
+            return
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        tmp_path = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, sidecar)
 
-        if len(path_parts) == 1:
-            group_dir_name = path_parts[0]
-            if not GROUP_DIR_REGEX.match(group_dir_name):
-                logging.error(f"Non-conforming group directory: {root_path}")
-                exit(1)
-            continue
 
-        if len(path_parts) == 2:
-            subgroup_name = path_parts[1]
-            if subgroup_name not in VALID_SUBGROUPS:
-                logging.error(f"Non-conforming subgroup directory: {root_path}")
-                exit(1)
-            continue
+_metadata_loader: MetadataLoader = YamlMetadataLoader()
 
-        if len(path_parts) == 3:
-            group_dir_name = path_parts[0]
-            group = group_dir_name
-            subgroup = path_parts[1]
 
-            doc = _process_document_dir(root_path, group, subgroup)
+def set_metadata_loader(loader: MetadataLoader):
+    """Selects the loader used for every metadata file read by discovery."""
+    global _metadata_loader
+    _metadata_loader = loader
 
-            if not doc:
-                exit(1)
 
-            document_model.append(doc)
+def new_dependency_graph() -> DependencyGraph:
+    """Creates a dependency graph matching the `typst compile` invocation of the build."""
+    return DependencyGraph(root=".", font_dirs=[FONT_PATH])
+
+
+def typst_inputs(source_path: str, meta_path: str) -> Dict[str, str]:
+    """Returns the `--input` values passed to typst when compiling a document."""
+    source_dir = os.path.dirname(source_path) or "."
+    return {"meta-path": os.path.relpath(meta_path, start=source_dir)}
+
+
+def register_documents(graph: DependencyGraph, documents: List[Document]):
+    """Registers already-resolved documents in a graph for reverse lookups."""
+    for doc in documents:
+        graph.add_document(doc.source, set(doc.subfiles) | {doc.meta_path})
+
+
+def read_changed_files(changed_files_path: str) -> Set[str]:
+    """Reads a `git diff --name-only` style list of changed files."""
+    with open(changed_files_path, "r", encoding="utf-8") as f:
+        return set(line.strip() for line in f if line.strip())
+
+
+def _git_lines(*args: str) -> List[str]:
+    proc = subprocess.run(
+        ["git", *args], capture_output=True, text=True, encoding="utf-8", check=True
+    )
+    return [line.strip() for line in proc.stdout.splitlines() if line.strip()]
+
+
+def merge_base(ref: str) -> str:
+    """Returns the commit where HEAD forked from `ref`."""
+    try:
+        return _git_lines("merge-base", ref, "HEAD")[0]
+    except FileNotFoundError:
+        logging.critical("git command not found. Is it installed and in your PATH?")
+        sys.exit(1)
+    except (subprocess.CalledProcessError, IndexError) as e:
+        stderr = getattr(e, "stderr", "") or ""
+        logging.critical(f"Could not find the merge base with '{ref}': {stderr.strip()}")
+        sys.exit(1)
 
-            dirs.clear()
-            continue
 
-        if len(path_parts) > 3:
-            dirs.clear()
+def changed_files_since(ref: str) -> Set[str]:
+    """
+    Lists files changed between the merge base of `ref` and the working tree,
+    including untracked files, as '/'-separated paths relative to the repo root.
+    """
+    git = _git_lines
+    try:
+        base = merge_base(ref)
+        changed = set(git("diff", "--name-only", base))
+        changed.update(git("ls-files", "--others", "--exclude-standard"))
+    except FileNotFoundError:
+        logging.critical("git command not found. Is it installed and in your PATH?")
+        sys.exit(1)
+    except (subprocess.CalledProcessError, IndexError) as e:
+        stderr = getattr(e, "stderr", "") or ""
+        logging.critical(f"Could not list files changed since '{ref}': {stderr.strip()}")
+        sys.exit(1)
+    return changed
+
+
+class DiscoveryError(Exception):
+    """Raised once discovery has finished if any directory was invalid."""
+
+    def __init__(self, invalid_dirs: List[str]):
+        self.invalid_dirs = invalid_dirs
+        super().__init__(f"{len(invalid_dirs)} invalid directories found.")
+
+
+def _sorted_subdirs(path: str) -> List[os.DirEntry]:
+    """Lists the subdirectories of `path` in a stable order."""
+    with os.scandir(path) as entries:
+        return sorted((e for e in entries if e.is_dir()), key=lambda e: e.name)
+
+
+def _enumerate_document_dirs(
+    scan_root: str, invalid_dirs: List[str]
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yields `(doc_dir, group, subgroup)` for every document directory below
+    `scan_root`, in a stable order. Non-conforming group and subgroup
+    directories are logged, appended to `invalid_dirs` and skipped.
+    """
+    for group_entry in _sorted_subdirs(scan_root):
+        if group_entry.name == "00-templates":
+            logging.debug("Skipping '00-templates' directory.")
+            continue
+        group_path = group_entry.path.replace(os.path.sep, "/")
+        if not GROUP_DIR_REGEX.match(group_entry.name):
+            logging.error(f"Non-conforming group directory: {group_path}")
+            invalid_dirs.append(group_path)
             continue
 
-    if not document_model:
+        for subgroup_entry in _sorted_subdirs(group_entry.path):
+            subgroup_path = subgroup_entry.path.replace(os.path.sep, "/")
+            if subgroup_entry.name not in VALID_SUBGROUPS:
+                logging.error(f"Non-conforming subgroup directory: {subgroup_path}")
+                invalid_dirs.append(subgroup_path)
+                continue
+
+            for doc_entry in _sorted_subdirs(subgroup_entry.path):
+                doc_dir = doc_entry.path.replace(os.path.sep, "/")
+                yield doc_dir, group_entry.name, subgroup_entry.name
+
+
+_worker_graph: Optional[DependencyGraph] = None
+
+
+def _process_document_dir_in_worker(
+    doc_dir: str, group: str, subgroup: str, loader: MetadataLoader
+) -> Optional[Document]:
+    """Process pool entry point: processes a directory with a per-process graph."""
+    global _worker_graph
+    set_metadata_loader(loader)
+    if _worker_graph is None:
+        _worker_graph = new_dependency_graph()
+    return _process_document_dir(Path(doc_dir), group, subgroup, _worker_graph)
+
+
+def iter_documents(
+    scan_root: str = "docs",
+    graph: Optional[DependencyGraph] = None,
+    cache: Optional["DiscoveryCache"] = None,
+    jobs: Optional[int] = None,
+    processes: bool = False,
+) -> Iterator[Document]:
+    """
+    Streams the document model: document directories are enumerated with
+    `os.scandir` and processed concurrently by a thread pool (or a process
+    pool with `processes=True`), while documents are yielded in a stable order
+    as soon as they are ready, so consumers can start working on the first
+    ones while the rest is still being discovered.
+
+    Every invalid directory is logged; a `DiscoveryError` listing all of them
+    is raised after the last valid document has been yielded.
+    """
+    logging.debug(f"Starting document discovery in '{scan_root}'...")
+    if graph is None:
+        graph = new_dependency_graph()
+
+    if not os.path.isdir(scan_root):
+        logging.critical(f"Scan root directory not found: '{scan_root}'")
+        sys.exit(1)
+
+    invalid_dirs: List[str] = []
+    seen_dirs: Set[str] = set()
+    count = 0
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    with pool_class(max_workers=jobs) as executor:
+        pending = []
+        for doc_dir, group, subgroup in _enumerate_document_dirs(scan_root, invalid_dirs):
+            seen_dirs.add(doc_dir)
+            doc = cache.lookup(doc_dir) if cache else None
+            if doc is not None:
+                pending.append((doc_dir, None, doc))
+            elif processes:
+                future = executor.submit(
+                    _process_document_dir_in_worker,
+                    doc_dir,
+                    group,
+                    subgroup,
+                    _metadata_loader,
+                )
+                pending.append((doc_dir, future, None))
+            else:
+                future = executor.submit(
+                    _process_document_dir, Path(doc_dir), group, subgroup, graph
+                )
+                pending.append((doc_dir, future, None))
+
+        for doc_dir, future, doc in pending:
+            if future is not None:
+                doc = future.result()
+                if doc is None:
+                    invalid_dirs.append(doc_dir)
+                    continue
+                if cache:
+                    cache.store(doc_dir, doc)
+            register_documents(graph, [doc])
+            count += 1
+            yield doc
+
+    if cache:
+        cache.retain(seen_dirs)
+        logging.info(
+            f"Discovery cache: {cache.hits} documents reused, {cache.misses} reprocessed."
+        )
+
+    if invalid_dirs:
+        raise DiscoveryError(sorted(invalid_dirs))
+
+    if count == 0:
         logging.warning("Discovery finished. No valid documents were found.")
     else:
-        logging.debug(
-            f"Successfully built a model with {len(document_model)} documents."
-        )
+        logging.debug(f"Successfully built a model with {count} documents.")
+
 
-    return document_model
+def discover_documents(
+    scan_root: str = "docs",
+    graph: Optional[DependencyGraph] = None,
+    cache: Optional["DiscoveryCache"] = None,
+    jobs: Optional[int] = None,
+    processes: bool = False,
+) -> List[Document]:
+    """
+    Scans the filesystem from `scan_root` and creates the document model based on conventions.
+    Each document is registered in `graph`, when given, for reverse dependency lookups.
+    Every directory is checked and all errors are reported before exiting.
+    Unchanged document directories are loaded from `cache`, when given.
+    """
+    try:
+        with profiler.span("discover_documents", "discovery"):
+            return list(
+                iter_documents(
+                    scan_root, graph=graph, cache=cache, jobs=jobs, processes=processes
+                )
+            )
+    except DiscoveryError as e:
+        logging.error(f"Discovery failed: {e}")
+        sys.exit(1)
 
 
+def add_discovery_arguments(parser: argparse.ArgumentParser):
+    """Adds the options controlling how the document model is obtained."""
+    parser.add_argument(
+        "--model",
+        help="Read the document model from this JSON file instead of scanning 'docs/' "
+        "(as written by 'validate_pr_changes.py generate').",
+    )
+    parser.add_argument(
+        "--discovery-cache",
+        default=DISCOVERY_CACHE_PATH,
+        help="File caching discovered documents between runs.",
+    )
+    parser.add_argument(
+        "--no-discovery-cache",
+        action="store_true",
+        help="Rescan every document directory, ignoring the discovery cache.",
+    )
+    parser.add_argument(
+        "--discovery-hash",
+        action="store_true",
+        help="Validate discovery cache entries by content hash instead of mtime and size.",
+    )
+    parser.add_argument(
+        "--discovery-jobs",
+        type=int,
+        default=None,
+        help="Number of document directories processed concurrently during discovery.",
+    )
+    parser.add_argument(
+        "--discovery-processes",
+        action="store_true",
+        help="Discover with a process pool instead of a thread pool.",
+    )
+    parser.add_argument(
+        "--metadata-sidecars",
+        action="store_true",
+        help=f"Read metadata from JSON copies under '{METADATA_SIDECAR_DIR}' "
+        "when they are newer than the YAML, refreshing them otherwise.",
+    )
+    parser.add_argument(
+        "--pure-python-yaml",
+        action="store_true",
+        help="Parse YAML with the pure-Python loader even if libyaml is available.",
+    )
+
+
+def prepare_discovery(args: argparse.Namespace) -> Optional[DiscoveryCache]:
+    """
+    Applies the discovery options of the command line: selects the metadata
+    loader and returns the discovery cache, if enabled.
+    """
+    loader: MetadataLoader = YamlMetadataLoader(use_libyaml=not args.pure_python_yaml)
+    if args.metadata_sidecars:
+        loader = JsonSidecarMetadataLoader(METADATA_SIDECAR_DIR, loader)
+    set_metadata_loader(loader)
+
+    if args.no_discovery_cache:
+        return None
+    cache = DiscoveryCache(args.discovery_cache, hash_mode=args.discovery_hash)
+    cache.load()
+    return cache
+
+
+def load_document_model(
+    args: argparse.Namespace, graph: Optional[DependencyGraph] = None
+) -> List[Document]:
+    """Returns the document model from `--model` or from a (cached) discovery."""
+    if args.model:
+        documents = load_model(args.model)
+        logging.info(f"Loaded {len(documents)} documents from '{args.model}'.")
+        if graph is not None:
+            register_documents(graph, documents)
+        return documents
+
+    cache = prepare_discovery(args)
+    documents = discover_documents(
+        graph=graph,
+        cache=cache,
+        jobs=args.discovery_jobs,
+        processes=args.discovery_processes,
+    )
+    if cache:
+        cache.save()
+    return documents
+
+
+def load_document(
+    doc_dir: str, graph: DependencyGraph, scan_root: str = "docs"
+) -> Optional[Document]:
+    """
+    Loads a single document directory (`<scan_root>/<group>/<subgroup>/<name>`),
+    e.g. to refresh one entry of an in-memory model. Returns None if invalid.
+    """
+    doc_dir_path = Path(doc_dir)
+    try:
+        parts = doc_dir_path.relative_to(scan_root).parts
+    except ValueError:
+        logging.error(f"Document directory not inside '{scan_root}': {doc_dir}")
+        return None
+
+    if len(parts) != 3:
+        logging.error(f"Not a document directory: {doc_dir}")
+        return None
+    group, subgroup, _ = parts
+    if not GROUP_DIR_REGEX.match(group) or subgroup not in VALID_SUBGROUPS:
+        logging.error(f"Non-conforming document directory: {doc_dir}")
+        return None
+    return _process_document_dir(doc_dir_path, group, subgroup, graph)
+
+
+@profiler.profiled("process_document", "discovery")
 def _process_document_dir(
-    doc_dir_path: Path, group: str, subgroup: str
+    doc_dir_path: Path, group: str, subgroup: str, graph: DependencyGraph
 ) -> Optional[Document]:
     """
     Given a valid document directory path, validates it and returns a Document object if valid.
@@ -147,14 +1008,7 @@ def _process_document_dir(
         )
         return None
 
-    loader = LocalFileLoader()
-    meta_content = loader.get_content(meta_path_str)
-    if meta_content is None:
-        return None
-
-    meta_data = _parse_and_validate_yaml(
-        meta_content, meta_path_str, META_SCHEMA_PATH, doc_name
-    )
+    meta_data = _load_and_validate_metadata(meta_path_str, META_SCHEMA_PATH, doc_name)
     if not meta_data:
         return None
 
@@ -179,11 +1033,14 @@ def _process_document_dir(
     output_path = relative_parent / output_name
     output_path_str = str(output_path).replace(os.path.sep, "/")
 
-    all_typ_files = _find_associated_typ_files(source_path_str)
-    if source_path_str in all_typ_files:
-        all_typ_files.remove(source_path_str)
+    with profiler.span("dependency_scan", "discovery", doc=doc_name):
+        dependencies = graph.dependencies(
+            source_path_str, typst_inputs(source_path_str, meta_path_str)
+        )
+    graph.add_document(source_path_str, dependencies)
+    subfiles = dependencies - {meta_path_str}
 
-    logging.debug(f"Found {len(all_typ_files)} subfiles for '{doc_name}'")
+    logging.debug(f"Found {len(subfiles)} subfiles for '{doc_name}'")
 
     return Document(
         source=source_path_str,
@@ -192,71 +1049,84 @@ def _process_document_dir(
         subgroup=subgroup,
         meta_path=meta_path_str,
         metadata=meta_data,
-        subfiles=all_typ_files,
+        subfiles=subfiles,
         latest_version=changelog[0]["version"],
         last_modified_date=changelog[0]["date"],
     )
 
 
-def _find_associated_typ_files(source_path: str) -> Set[str]:
-    """Finds all .typ files in a source file's directory and subdirectories."""
-    subfiles = set()
-    source_dir = os.path.dirname(source_path) or "."
-
-    for root, _, files in os.walk(source_dir):
-        for file in files:
-            if file.endswith(".typ"):
-                file_path = os.path.join(root, file)
-                normalized_path = file_path.replace(os.path.sep, "/")
-                subfiles.add(normalized_path)
-    return subfiles
-
-
-def _parse_and_validate_yaml(
-    content: str, file_path: str, schema_path: str, doc_title: str
+def _load_and_validate_metadata(
+    file_path: str, schema_path: str, doc_title: str
 ) -> Optional[Dict]:
-    """Safely parses YAML content from a string and validates it against a schema."""
+    """Loads a metadata file through the active loader and validates it against a schema."""
     try:
-        data = yaml.safe_load(content)
-        if not data:
-            logging.error(
-                f"Validation failed for '{doc_title}': File '{file_path}' is empty."
-            )
-            return None
+        with profiler.span("yaml_parse", "discovery", path=file_path):
+            data = _metadata_loader.load(file_path)
     except yaml.YAMLError as e:
         logging.error(
             f"Validation failed for '{doc_title}': Could not parse YAML in '{file_path}': {e}"
         )
         return None
+    if data is None and not os.path.exists(file_path):
+        return None
+    if not data:
+        logging.error(
+            f"Validation failed for '{doc_title}': File '{file_path}' is empty."
+        )
+        return None
 
-    if not _validate_with_schema(data, schema_path, file_path):
+    with profiler.span("schema_validation", "discovery", path=file_path):
+        valid = _validate_with_schema(data, schema_path, file_path)
+    if not valid:
         return None
 
     return data
 
 
-def _validate_with_schema(data: Dict, schema_path: str, file_path: str) -> bool:
-    """Validates data against a JSON Schema file."""
+@functools.lru_cache(maxsize=None)
+def _get_schema_validator(schema_path: str):
+    """
+    Loads and checks a JSON Schema once per process, returning a reusable
+    validator (with format checking enabled) or None if it cannot be loaded.
+    """
     try:
         with open(schema_path, "r", encoding="utf-8") as f:
             schema = json.load(f)
-        validate(instance=data, schema=schema)
-        logging.debug(
-            f"Schema validation passed for '{file_path}' against '{schema_path}'."
-        )
-        return True
     except FileNotFoundError:
         logging.error(
             f"CRITICAL: Schema file not found at '{schema_path}'. Cannot validate."
         )
+        return None
+
+    validator_class = validators.validator_for(schema, default=Draft202012Validator)
+    try:
+        validator_class.check_schema(schema)
+    except SchemaError as e:
+        logging.error(f"CRITICAL: Invalid schema '{schema_path}': {e.message}")
+        return None
+    return validator_class(schema, format_checker=FormatChecker())
+
+
+def _validate_with_schema(data: Dict, schema_path: str, file_path: str) -> bool:
+    """Validates data against a JSON Schema file, reporting every violation."""
+    validator = _get_schema_validator(schema_path)
+    if validator is None:
         return False
-    except ValidationError as e:
+
+    errors = sorted(validator.iter_errors(data), key=lambda e: list(e.path))
+    if not errors:
+        logging.debug(
+            f"Schema validation passed for '{file_path}' against '{schema_path}'."
+        )
+        return True
+
+    logging.error(f"Schema validation failed for '{file_path}':")
+    for e in errors:
         error_path = "/".join(map(str, e.path))
-        logging.error(f"Schema validation failed for '{file_path}':")
         logging.error(f"  - Error: {e.message}")
         if error_path:
             logging.error(f"  - At path: /{error_path}")
-        return False
+    return False
 
 
 def _validate_version_sequence(versions: List[int], path: str, title: str) -> bool:
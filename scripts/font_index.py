@@ -0,0 +1,451 @@
+"""
+Indexes the fonts of `--font-path` once per build and gives each compilation a
+staging font directory holding only the faces its sources can select.
+
+Every `typst compile` scans and parses each file of its font paths at start-up,
+and the template font directory ships every static Noto Sans/Serif/Mono face.
+The index records the family and style of each font file, cached under
+`.build-cache/fonts/` by content hash; a document then gets the faces of the
+families named in its sources and templates, for the weights they ask for.
+Staging is opt-in (`build_docs.py --font-staging`); a document whose families
+or weights cannot be resolved exactly gets the whole font path.
+
+Usage:
+    python scripts/font_index.py                 # template font usage report
+    python scripts/font_index.py --documents     # staged faces per document
+"""
+
+import os
+import re
+import posixpath
+import sys
+import json
+import struct
+import shutil
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from dataclasses import asdict, dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import docs_lib
+from typst_deps import BLOCK_COMMENT_REGEX, LINE_COMMENT_REGEX, DependencyGraph
+
+FONTS_DIR = "fonts"
+INDEX_VERSION = 1
+# Bump when the selection rules change: it is part of the build cache key.
+STAGING_VERSION = 2
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc", ".otc")
+TEXT_EXTENSIONS = (".typ", ".yaml", ".yml", ".json", ".toml")
+
+WEIGHT_NAMES = {
+    "thin": 100,
+    "extralight": 200,
+    "light": 300,
+    "regular": 400,
+    "medium": 500,
+    "semibold": 600,
+    "bold": 700,
+    "extrabold": 800,
+    "black": 900,
+}
+# Body text and `strong`/headings (regular thickened by typst's default delta).
+DEFAULT_WEIGHTS = frozenset({400, 700})
+STRONG_DELTA = 300
+# `weight: 500`, `weight: "bold"`, `weight: base.heading-weight`
+WEIGHT_REGEX = re.compile(r'\bweight:\s*("[a-z]+"|\d+|[^\s,)\]]+)')
+# A custom `strong(delta: ...)` moves weights in ways the rules cannot follow.
+DELTA_REGEX = re.compile(r"\bdelta:")
+
+
+@dataclass(frozen=True)
+class FontFace:
+    """A face of a font file, as typst selects it."""
+
+    family: str
+    weight: int
+    italic: bool
+
+
+@dataclass(frozen=True)
+class FontUsage:
+    """Families (lowercase) and weights a set of sources can select; None is any weight."""
+
+    families: FrozenSet[str]
+    weights: Optional[FrozenSet[int]]
+
+    def __or__(self, other: "FontUsage") -> "FontUsage":
+        weights = None
+        if self.weights is not None and other.weights is not None:
+            weights = self.weights | other.weights
+        return FontUsage(self.families | other.families, weights)
+
+
+NO_USAGE = FontUsage(frozenset(), frozenset())
+
+
+def _name_records(data: bytes, offset: int) -> Dict[int, str]:
+    """Decodes the Windows (UTF-16) and Mac Roman records of a `name` table."""
+    _, count, string_offset = struct.unpack_from(">HHH", data, offset)
+    names: Dict[int, str] = {}
+    for i in range(count):
+        platform, encoding, _, name_id, length, start = struct.unpack_from(
+            ">HHHHHH", data, offset + 6 + 12 * i
+        )
+        raw = data[offset + string_offset + start :][:length]
+        if platform == 3 and encoding in (0, 1, 10):
+            names[name_id] = raw.decode("utf-16-be", errors="replace")
+        elif platform == 1 and encoding == 0:
+            names.setdefault(name_id, raw.decode("mac_roman", errors="replace"))
+    return names
+
+
+def _parse_sfnt(data: bytes, offset: int) -> FontFace:
+    num_tables = struct.unpack_from(">H", data, offset + 4)[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from(">4sIII", data, offset + 12 + 16 * i)
+        tables[tag] = table_offset
+
+    names = _name_records(data, tables[b"name"])
+    # Typographic family first: "Noto Sans" rather than "Noto Sans Medium".
+    family = names.get(16) or names.get(1) or ""
+    weight, italic = 400, False
+    if b"OS/2" in tables:
+        weight, fs_selection = (
+            struct.unpack_from(">H", data, tables[b"OS/2"] + 4)[0],
+            struct.unpack_from(">H", data, tables[b"OS/2"] + 62)[0],
+        )
+        italic = bool(fs_selection & 0x201)  # ITALIC or OBLIQUE
+    elif b"head" in tables:
+        italic = bool(struct.unpack_from(">H", data, tables[b"head"] + 44)[0] & 0x2)
+    return FontFace(family, weight, italic)
+
+
+def parse_font(data: bytes) -> List[FontFace]:
+    """Reads the faces of a TrueType/OpenType font or collection."""
+    if data[:4] == b"ttcf":
+        count = struct.unpack_from(">I", data, 8)[0]
+        offsets = struct.unpack_from(f">{count}I", data, 12)
+        return [_parse_sfnt(data, offset) for offset in offsets]
+    return [_parse_sfnt(data, 0)]
+
+
+class FontIndex:
+    """
+    Family and style coverage of the files in the font directories, parsed
+    once per distinct file content and kept in `<cache_dir>/fonts/index.json`.
+    """
+
+    def __init__(self, cache_dir: str, font_dirs: Iterable[str]):
+        self.font_dirs = list(font_dirs)
+        self.index_path = Path(cache_dir) / FONTS_DIR / "index.json"
+        self.entries: Dict[str, List[Dict]] = {}
+        # Current files: path -> (sha256, faces)
+        self.files: Dict[str, Tuple[str, List[FontFace]]] = {}
+        self.parsed = 0
+
+    def _read_cache(self) -> Dict[str, List[Dict]]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt font index: {e}")
+            return {}
+        if data.get("version") != INDEX_VERSION:
+            return {}
+        return data.get("fonts", {})
+
+    def load(self):
+        """Hashes the font files and parses those not indexed yet."""
+        cached = self._read_cache()
+        for font_dir in self.font_dirs:
+            for root, dirs, names in os.walk(font_dir):
+                dirs.sort()
+                for name in sorted(names):
+                    if not name.lower().endswith(FONT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, name).replace(os.path.sep, "/")
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    digest = hashlib.sha256(data).hexdigest()
+                    if digest not in cached:
+                        try:
+                            cached[digest] = [asdict(face) for face in parse_font(data)]
+                        except (struct.error, KeyError) as e:
+                            logging.warning(f"Cannot read font '{path}': {e}")
+                            cached[digest] = []
+                        self.parsed += 1
+                    faces = [FontFace(**face) for face in cached[digest]]
+                    self.files[path] = (digest, faces)
+        self.entries = {digest: cached[digest] for digest, _ in self.files.values()}
+        logging.debug(
+            f"Font index: {len(self.files)} files, {self.parsed} parsed, "
+            f"{len(self.families())} families."
+        )
+
+    def save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": INDEX_VERSION, "fonts": self.entries},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def families(self) -> Set[str]:
+        """Lowercase family names, which is how typst matches them."""
+        return {
+            face.family.lower() for _, faces in self.files.values() for face in faces
+        }
+
+    def select(self, usage: FontUsage) -> List[str]:
+        """
+        Returns the font files `usage` can select: per family and style, the
+        faces closest to each requested weight, as typst picks them.
+        """
+        variants: Dict[Tuple[str, bool], List[Tuple[int, str]]] = {}
+        for path, (_, faces) in self.files.items():
+            for face in faces:
+                family = face.family.lower()
+                if family in usage.families:
+                    variants.setdefault((family, face.italic), []).append(
+                        (face.weight, path)
+                    )
+        selected = set()
+        for candidates in variants.values():
+            if usage.weights is None:
+                selected.update(path for _, path in candidates)
+                continue
+            for weight in usage.weights:
+                best = min(abs(w - weight) for w, _ in candidates)
+                selected.update(p for w, p in candidates if abs(w - weight) == best)
+        return sorted(selected)
+
+
+def thickened(weights: Iterable[int]) -> FrozenSet[int]:
+    """Adds the weights `strong` reaches from `weights`, clamped like typst does."""
+    result = set(weights)
+    pending = list(result)
+    while pending:
+        weight = min(pending.pop() + STRONG_DELTA, 900)
+        if weight not in result:
+            result.add(weight)
+            pending.append(weight)
+    return frozenset(result)
+
+
+def scan_usage(path: str, families: Set[str]) -> FontUsage:
+    """
+    Finds the known families named anywhere in a text file and, for Typst
+    sources, the literal weights it sets; any weight that is not a literal
+    makes every weight of the named families selectable.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return NO_USAGE
+    if path.endswith(".typ"):
+        content = BLOCK_COMMENT_REGEX.sub("", content)
+        content = LINE_COMMENT_REGEX.sub("", content)
+    lowered = content.lower()
+    named = frozenset(family for family in families if family in lowered)
+    if not path.endswith(".typ"):
+        return FontUsage(named, frozenset())
+
+    weights: Optional[Set[int]] = set()
+    if DELTA_REGEX.search(content):
+        weights = None
+    for match in WEIGHT_REGEX.finditer(content):
+        value = match.group(1).strip('"')
+        if weights is None:
+            break
+        if value.isdigit():
+            weights.add(int(value))
+        elif value in WEIGHT_NAMES:
+            weights.add(WEIGHT_NAMES[value])
+        else:
+            weights = None
+    return FontUsage(named, None if weights is None else frozenset(weights))
+
+
+class FontStager:
+    """
+    Gives each document a font directory with the files it can select,
+    hardlinked under `<cache_dir>/fonts/staging/<digest>/` and shared by every
+    document with the same selection.
+
+    Families are matched by name in the document's text dependencies (its
+    source, templates and metadata), which over- rather than under-selects;
+    weights are the defaults, the literals of its sources and what `strong`
+    makes of them. Glyph fallback only sees the staged faces.
+
+    A document that names no known family, or sets a weight that is not a
+    literal, compiles with all of `font_dirs` instead.
+    """
+
+    def __init__(self, cache_dir: str, font_dirs: Iterable[str]):
+        font_dirs = list(font_dirs)
+        self.index = FontIndex(cache_dir, font_dirs)
+        self.full_path = os.pathsep.join(font_dirs)
+        self.staging_dir = Path(cache_dir) / FONTS_DIR / "staging"
+        self._usage: Dict[str, FontUsage] = {}
+        self._staged: Dict[Tuple[str, ...], str] = {}
+        self._families: Set[str] = set()
+        self._staged_files = 0
+        self._compiles = 0
+        self._unresolved = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        self.index.load()
+        self._families = self.index.families()
+
+    def save(self):
+        """Writes the index and drops staging directories unused by this run."""
+        self.index.save()
+        live = set(self._staged.values())
+        if self.staging_dir.is_dir():
+            for path in self.staging_dir.iterdir():
+                if str(path) not in live:
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def file_usage(self, path: str) -> FontUsage:
+        """Scans a file once per run; templates are shared by every document."""
+        with self._lock:
+            cached = self._usage.get(path)
+        if cached is None:
+            cached = scan_usage(path, self._families)
+            with self._lock:
+                self._usage[path] = cached
+        return cached
+
+    def usage(self, files: Iterable[str]) -> FontUsage:
+        usage = NO_USAGE
+        for path in files:
+            if path.endswith(TEXT_EXTENSIONS):
+                usage |= self.file_usage(path)
+        weights = None
+        if usage.weights is not None:
+            weights = thickened(usage.weights | DEFAULT_WEIGHTS)
+        return FontUsage(usage.families, weights)
+
+    def document_usage(self, doc: docs_lib.Document) -> FontUsage:
+        return self.usage([doc.source, doc.meta_path, *doc.subfiles])
+
+    def font_path(self, doc: docs_lib.Document) -> str:
+        """Returns the staging font directory to compile `doc` with."""
+        usage = self.document_usage(doc)
+        if not usage.families or usage.weights is None:
+            with self._lock:
+                self._compiles += 1
+                self._unresolved += 1
+                self._staged_files += len(self.index.files)
+            return self.full_path
+        selected = self.index.select(usage)
+        key = tuple(self.index.files[path][0] for path in selected)
+        with self._lock:
+            self._compiles += 1
+            self._staged_files += len(selected)
+            staged = self._staged.get(key)
+            if staged is None:
+                staged = self._stage(selected, key)
+                self._staged[key] = staged
+        return staged
+
+    def _stage(self, selected: List[str], key: Tuple[str, ...]) -> str:
+        """Creates (or reuses) the directory of a selection; called under the lock."""
+        digest = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()[:16]
+        target = self.staging_dir / digest
+        if target.is_dir():
+            return str(target)
+        tmp = self.staging_dir / f"{digest}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for path in selected:
+            link = tmp / f"{self.index.files[path][0][:12]}-{os.path.basename(path)}"
+            try:
+                os.link(path, link)
+            except OSError:
+                shutil.copy2(path, link)
+        os.replace(tmp, target)
+        logging.debug(f"Staged {len(selected)} font files in '{target}'")
+        return str(target)
+
+    def log_summary(self):
+        if not self._compiles:
+            return
+        total = len(self.index.files)
+        logging.info(
+            f"Font staging: {self._staged_files / self._compiles:.1f} of {total} "
+            f"font files per compile on average, {len(self._staged)} font "
+            f"directories, {self.index.parsed} fonts parsed; {self._unresolved} "
+            "compiles used the whole font path."
+        )
+
+
+def template_report(stager: FontStager, graph: DependencyGraph, template_dir: str):
+    """Logs the families and weights each template selects, imports included."""
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith(".typ"):
+            continue
+        path = posixpath.join(template_dir, name)
+        usage = stager.usage([path, *graph.dependencies(path)])
+        files = stager.index.select(usage)
+        weights = "any" if usage.weights is None else sorted(usage.weights)
+        logging.info(
+            f"{path}: {', '.join(sorted(usage.families)) or 'no known family'}; "
+            f"weights {weights}; {len(files)} of {len(stager.index.files)} files"
+        )
+
+
+def main():
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    parser = argparse.ArgumentParser(
+        description="Report the fonts each template and document can select."
+    )
+    parser.add_argument("--cache-dir", default=".build-cache")
+    parser.add_argument("--template-dir", default=docs_lib.TEMPLATES_DIR)
+    parser.add_argument(
+        "--documents",
+        action="store_true",
+        help="Also list the staged font directory of every discovered document.",
+    )
+    args = parser.parse_args()
+    if not os.path.isdir(docs_lib.FONT_PATH):
+        logging.critical(f"Font directory '{docs_lib.FONT_PATH}' not found.")
+        sys.exit(1)
+
+    stager = FontStager(args.cache_dir, [docs_lib.FONT_PATH])
+    stager.load()
+    styles: Dict[str, List[str]] = {}
+    for _, faces in sorted(stager.index.files.values()):
+        for face in faces:
+            style = f"{face.weight}{' italic' if face.italic else ''}"
+            styles.setdefault(face.family, []).append(style)
+    for family, family_styles in sorted(styles.items()):
+        logging.info(f"{family}: {', '.join(sorted(family_styles))}")
+    template_report(stager, docs_lib.new_dependency_graph(), args.template_dir)
+
+    if args.documents:
+        for doc in docs_lib.discover_documents():
+            logging.info(f"{doc.source}: {stager.font_path(doc)}")
+        stager.log_summary()
+    # Staging directories are left to the build, which prunes them.
+    stager.index.save()
+
+
+if __name__ == "__main__":
+    main()
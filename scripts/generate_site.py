@@ -1,13 +1,34 @@
 import os
+import re
 import sys
+import json
+import html
+import hashlib
 import logging
-import shutil
 import argparse
 import posixpath
 from pathlib import Path, PurePosixPath
 from collections import defaultdict
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
 import docs_lib
+import precompress
+import thumbnails
+from site_writer import SITE_MANIFEST_PATH, SiteWriter
+from search_index import (
+    SEARCH_CACHE_PATH,
+    SEARCH_INDEX_NAME,
+    SearchIndexBuilder,
+    serialize_index,
+)
+
+TABLE_SHARDS_DIR = "data"
+MARKER_REGEX = re.compile(r"<!--([A-Z0-9_]+)_LIST_MARKER-->")
+
+# group dir name -> subgroup -> documents, see build_document_index
+DocumentIndex = Dict[str, Dict[str, List[docs_lib.Document]]]
+# Document.output -> thumbnail, page count and size, see thumbnails.py
+Previews = Dict[str, thumbnails.DocumentPreview]
 
 
 def setup_logging():
@@ -20,26 +41,15 @@ def setup_logging():
     )
 
 
-def copy_static_assets(source_dir, dest_dir):
+@docs_lib.profiler.profiled("asset_copy", "site")
+def copy_static_assets(source_dir, writer: SiteWriter):
     """Copies all files from the source site directory to the destination."""
     logging.info(
-        f"Copying static assets from '{source_dir}' to '{dest_dir}'...")
+        f"Copying static assets from '{source_dir}' to '{writer.outdir}'...")
     if not os.path.isdir(source_dir):
         logging.critical(f"Source site directory '{source_dir}' not found.")
         sys.exit(1)
-
-    for item in os.listdir(source_dir):
-        source_item = os.path.join(source_dir, item)
-        dest_item = os.path.join(dest_dir, item)
-
-        if item.endswith(".template.html"):
-            logging.debug(f"Skipping template: {item}")
-            continue
-
-        if os.path.isdir(source_item):
-            shutil.copytree(source_item, dest_item, dirs_exist_ok=True)
-        else:
-            shutil.copy2(source_item, dest_item)
+    writer.copy_assets(source_dir)
 
 
 ''' unused
@@ -72,40 +82,91 @@ def _subgroup_sort_key(subgroup_name: str) -> int:
     return order.get(subgroup_name, 99)  # Fallback
 
 
-def html_table_rows_from_docmodel(
-    document_model: List[docs_lib.Document], docs_folder: str
-) -> str:
-    """Generates HTML table rows for documents contained in document_model."""
+def build_document_index(document_model: List[docs_lib.Document]) -> DocumentIndex:
+    """
+    Groups the model once by `Document.group` and `subgroup`. Groups and
+    subgroups are in display order, documents newest first.
+    """
     grouped_docs = defaultdict(lambda: defaultdict(list))
     for doc in document_model:
-        try:
-            group_dir_name = Path(doc.source).parts[1]
-            grouped_docs[group_dir_name][doc.subgroup].append(doc)
-        except IndexError:
-            logging.warning(
-                f"Could not parse group from doc source: {doc.source}")
-
-    if not grouped_docs:
-        return "<p>No documents found.</p>"
+        grouped_docs[doc.group][doc.subgroup].append(doc)
 
-    html_lines = []
+    index = {}
+    for group_name in sorted(grouped_docs, key=_group_sort_key):
+        subgroups = grouped_docs[group_name]
+        index[group_name] = {
+            subgroup_name: sorted(
+                subgroups[subgroup_name],
+                key=lambda d: d.last_modified_date,
+                reverse=True,
+            )
+            for subgroup_name in sorted(subgroups, key=_subgroup_sort_key)
+        }
+    return index
+
+
+def format_size(size: int) -> str:
+    """1234567 -> '1.2 MB'"""
+    if size < 1000 * 1000:
+        return f"{max(1, round(size / 1000))} KB"
+    return f"{size / (1000 * 1000):.1f} MB"
+
+
+def preview_values(
+    preview: Optional[thumbnails.DocumentPreview], docs_folder: str
+) -> List:
+    """[thumbnail link, 'N pagine · size', width, height] of a row, or []."""
+    if preview is None:
+        return []
+    details = [format_size(preview.size)]
+    if preview.pages:
+        pages_word = "pagina" if preview.pages == 1 else "pagine"
+        details.insert(0, f"{preview.pages} {pages_word}")
+    thumbnail = (
+        posixpath.join(docs_folder, preview.thumbnail) if preview.thumbnail else ""
+    )
+    return [thumbnail, " · ".join(details), preview.width, preview.height]
+
+
+def title_cell_content(title: str, previews: List) -> str:
+    """The title cell, with the lazily loaded thumbnail and details if available."""
+    if not previews:
+        return title
+    thumbnail, details, width, height = previews
+    image = ""
+    if thumbnail:
+        size_attrs = f' width="{width}" height="{height}"' if width and height else ""
+        image = (
+            f'<img class="doc-thumb" src="{html.escape(thumbnail)}" alt="" '
+            f'loading="lazy" decoding="async"{size_attrs}>'
+        )
+    return (
+        f'<div class="doc-title">{image}<div><span>{title}</span>'
+        f'<span class="doc-details">{html.escape(details)}</span></div></div>'
+    )
 
-    sorted_groups = sorted(grouped_docs.keys(), key=_group_sort_key)
 
-    for group_name in sorted_groups:
-        subgroups = grouped_docs[group_name]
-        sorted_subgroups = sorted(subgroups.keys(), key=_subgroup_sort_key)
-        for subgroup_name in sorted_subgroups:
-            docs_list = subgroups[subgroup_name]
-            for doc in sorted(docs_list, key=lambda d: d.last_modified_date, reverse=True):
-                link_path = posixpath.join(docs_folder, doc.output)
-                title = doc.metadata.get("title", "Untitled")
-                version = doc.latest_version
-                doc_type = subgroup_name.capitalize()
-                doc_date = doc.last_modified_date
-
-                # 2° Version
-                row_html = f"""
+def html_table_rows(
+    subgroups: Dict[str, List[docs_lib.Document]],
+    docs_folder: str,
+    previews: Optional[Previews] = None,
+) -> List[str]:
+    """Generates the HTML table rows of one group of the document index."""
+    previews = previews or {}
+    html_lines = []
+    for subgroup_name, docs_list in subgroups.items():
+        doc_type = subgroup_name.capitalize()
+        for doc in docs_list:
+            link_path = posixpath.join(docs_folder, doc.output)
+            title = title_cell_content(
+                doc.title,
+                preview_values(previews.get(doc.output), docs_folder),
+            )
+            version = doc.latest_version
+            doc_date = doc.last_modified_date
+
+            # 2° Version
+            row_html = f"""
                 <tr>
                     <td>{title}</td>
                     <td>v{version}</td>
@@ -121,7 +182,61 @@ def html_table_rows_from_docmodel(
                     </td>
                 </tr>
                 """
-                html_lines.append(row_html)
+            html_lines.append(row_html)
+    return html_lines
+
+
+def table_row_values(
+    subgroups: Dict[str, List[docs_lib.Document]],
+    docs_folder: str,
+    previews: Optional[Previews] = None,
+) -> List[List]:
+    """
+    The rows of one group as [title, version, type, date, link], in table
+    order, followed by the `preview_values` of documents that have a preview.
+    """
+    previews = previews or {}
+    return [
+        [
+            doc.title,
+            doc.latest_version,
+            subgroup_name.capitalize(),
+            doc.last_modified_date,
+            posixpath.join(docs_folder, doc.output),
+            *preview_values(previews.get(doc.output), docs_folder),
+        ]
+        for subgroup_name, docs_list in subgroups.items()
+        for doc in docs_list
+    ]
+
+
+def compact_table_row(values: List) -> str:
+    """Whitespace-free row markup, identical to what lazy_table.js builds."""
+    title, version, doc_type, doc_date, link_path = (
+        html.escape(str(v)) for v in values[:5]
+    )
+    title = title_cell_content(title, values[5:])
+    return (
+        f'<tr><td>{title}</td><td>v{version}</td><td>{doc_type}</td><td>{doc_date}</td>'
+        f'<td id="download-td"><a href="{link_path}" target="_blank" '
+        f'rel="noopener noreferrer" class="preview-link">'
+        f'<span class="icon" data-icon="visibility"></span><span>Preview</span></a>'
+        f'<a href="{link_path}" class="btn-download" download>'
+        f'<span class="icon" data-icon="download"></span>Download</a></td></tr>'
+    )
+
+
+def html_table_rows_from_docmodel(
+    document_model: List[docs_lib.Document], docs_folder: str
+) -> str:
+    """Generates HTML table rows for documents contained in document_model."""
+    index = build_document_index(document_model)
+    if not index:
+        return "<p>No documents found.</p>"
+
+    html_lines = []
+    for subgroups in index.values():
+        html_lines.extend(html_table_rows(subgroups, docs_folder))
     return "\n".join(html_lines)
 
 
@@ -134,122 +249,391 @@ def format_group_name(group_name: str) -> str:
     return mapping.get(group_name.lower(), group_name.capitalize())
 
 
-def generate_group_cards(template_path, output_path, docs_folder="docs"):
+@dataclass
+class GroupSummary:
+    """What a group card shows: document count, latest update and per-subgroup counts."""
+    count: int = 0
+    latest_date: str = ""
+    subgroup_counts: Dict[str, int] = field(default_factory=dict)
+
+
+def group_dirs(scan_root: str = "docs") -> List[str]:
     """
-    This function generates the category cards from folder names inside `docs`,
-    ignoring folders starting with '00-' and linking to `<categoria>.html`.
+    Conforming group directories under `scan_root`, including those without
+    any valid document yet (e.g. a new milestone).
     """
-    docs_path = Path(docs_folder)
-    groups_folders = []
-    # This does not include anything related to the 00 milestone
-    for folder in sorted(docs_path.iterdir()):
-        if folder.is_dir() and "-" in folder.name:
-            if folder.name.startswith("00-"):
-                continue
-            groups_folders.append(folder.name)
+    try:
+        entries = list(os.scandir(scan_root))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        entry.name
+        for entry in entries
+        if entry.is_dir() and docs_lib.GROUP_DIR_REGEX.match(entry.name)
+    )
+
+
+def site_groups(index: DocumentIndex, scan_root: str = "docs") -> List[str]:
+    """Groups that get a card and a page: the model's and the empty group dirs."""
+    groups = set(index) | set(group_dirs(scan_root))
+    # This not take anything related with 00 milestone
+    return sorted(g for g in groups if not g.startswith("00-"))
+
+
+def summarize_groups(
+    document_model: List[docs_lib.Document],
+    groups: Iterable[str] = (),
+) -> Dict[str, GroupSummary]:
+    """
+    Computes the summary of every group in a single pass over the model;
+    `groups` without documents get an empty summary.
+    """
+    summaries: Dict[str, GroupSummary] = defaultdict(GroupSummary)
+    for group in groups:
+        summaries[group] = GroupSummary()
+    for doc in document_model:
+        summary = summaries[doc.group]
+        summary.count += 1
+        summary.latest_date = max(summary.latest_date, doc.last_modified_date)
+        summary.subgroup_counts[doc.subgroup] = (
+            summary.subgroup_counts.get(doc.subgroup, 0) + 1
+        )
+    return dict(summaries)
+
+
+@docs_lib.profiler.profiled("generate_group_cards", "site")
+def generate_group_cards(
+    document_model: List[docs_lib.Document],
+    template_path,
+    output_path,
+    writer: Optional[SiteWriter] = None,
+    search_html: str = "",
+    groups: Iterable[str] = (),
+):
+    """
+    Generates the category cards of the home page from the document model
+    and the empty `groups`, ignoring groups starting with '00-' and linking
+    to `<categoria>.html`.
+    """
+    summaries = summarize_groups(document_model, groups)
 
     html_snippet = ""
-    for single_folder in groups_folders:
+    # This does not include anything related to the 00 milestone
+    for single_folder in sorted(g for g in summaries if not g.startswith("00-")):
+        summary = summaries[single_folder]
         group_name = single_folder.split("-", 1)[1].replace("_", " ")
         display_name = format_group_name(group_name)
         href_name = group_name.lower().replace(
             " ", "_") + ".html"
-        num_docs = len(list((docs_path / single_folder).rglob("*.pdf")))
-        folder_path = docs_path / single_folder
+        num_docs = summary.count
         documents_word = "Documenti" if num_docs != 1 else "Documento"
+        breakdown = " · ".join(
+            f"{subgroup.capitalize()} {summary.subgroup_counts[subgroup]}"
+            for subgroup in sorted(summary.subgroup_counts, key=_subgroup_sort_key)
+        )
+        updated = (
+            f'<p class="doc-updated">Ultimo aggiornamento: {summary.latest_date}</p>'
+            if summary.latest_date
+            else ""
+        )
         html_snippet += f'''
         <a class="group-card" href="{href_name}">
             <h3>{display_name}</h3>
             <p class="doc-count">{num_docs} {documents_word}</p>
+            <p class="doc-breakdown">{breakdown}</p>
+            {updated}
         </a>
         '''
-    template_content = Path(template_path).read_text(encoding="utf-8")
-    populated_content = template_content.replace(
-        "<!--GROUPS_LIST_MARKER-->", html_snippet)
-    Path(output_path).write_text(populated_content, encoding="utf-8")
+    html_blocks = {"GROUPS": html_snippet}
+    if search_html:
+        html_blocks["SEARCH"] = search_html
+    populated_content = PageTemplate.load(template_path).render(html_blocks)
+    if writer is None:
+        Path(output_path).write_text(populated_content, encoding="utf-8")
+    else:
+        writer.write_text(output_path, populated_content)
+
+
+def group_display_names(document_model: List[docs_lib.Document]) -> Dict[str, str]:
+    """Maps each group dir name ('12-rtb') to its display name."""
+    return {
+        doc.group: format_group_name(doc.group.split("-", 1)[-1].replace("_", " "))
+        for doc in document_model
+    }
+
+
+@docs_lib.profiler.profiled("search_index", "site")
+def write_search_index(
+    document_model: List[docs_lib.Document],
+    builder: SearchIndexBuilder,
+    writer: SiteWriter,
+) -> str:
+    """Writes the search index and returns the home page search box pointing at it."""
+    builder.load()
+    index = builder.build(document_model, group_display_names(document_model))
+    content = serialize_index(index)
+    writer.write_text(os.path.join(writer.outdir, SEARCH_INDEX_NAME), content)
+    builder.save()
+
+    # The content hash busts browser caches whenever the index changes.
+    version = hashlib.sha256(content.encode("utf-8")).hexdigest()[:10]
+    return f'''
+      <div class="global-search">
+        <input
+          type="search"
+          id="globalSearchInput"
+          placeholder="Cerca tra tutti i documenti..."
+          autocomplete="off"
+          data-index="{SEARCH_INDEX_NAME}?v={version}"
+        />
+        <div id="globalSearchResults" class="search-results" hidden></div>
+      </div>
+      <script type="module" src="js/search.js"></script>
+      '''
+
+
+class PageTemplate:
+    """A site template read once and pre-split at its `<!--X_LIST_MARKER-->` markers."""
+
+    def __init__(self, text: str, name: str = "template"):
+        self.name = name
+        parts = MARKER_REGEX.split(text)
+        self._literals = parts[0::2]
+        self._markers = parts[1::2]
+
+    @classmethod
+    def load(cls, template_path: str) -> "PageTemplate":
+        try:
+            text = Path(template_path).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            logging.critical(f"Template file not found: '{template_path}'")
+            sys.exit(1)
+        return cls(text, template_path)
+
+    @property
+    def markers(self) -> Set[str]:
+        return set(self._markers)
+
+    def render(self, html_blocks: Dict[str, str]) -> str:
+        """Replaces every marker with its block; markers without a block are kept."""
+        for marker in html_blocks.keys() - self.markers:
+            logging.warning(
+                f"Marker '<!--{marker}_LIST_MARKER-->' not found in '{self.name}'."
+            )
+        chunks = [self._literals[0]]
+        for marker, literal in zip(self._markers, self._literals[1:]):
+            chunks.append(html_blocks.get(marker, f"<!--{marker}_LIST_MARKER-->"))
+            chunks.append(literal)
+        return "".join(chunks)
 
 
 def populate_template(template_path, output_path, html_blocks):
     """Injects generated HTML blocks into the template file based on comment markers."""
     logging.info(f"Populating template '{template_path}'...")
-    try:
-        template_content = Path(template_path).read_text(encoding="utf-8")
-    except FileNotFoundError:
-        logging.critical(f"Template file not found: '{template_path}'")
-        sys.exit(1)
-
-    # Replace each marker like <!--PB_LIST_MARKER-->
-    for marker, html_snippet in html_blocks.items():
-        placeholder = f"<!--{marker}_LIST_MARKER-->"
-        if placeholder in template_content:
-            template_content = template_content.replace(
-                placeholder, html_snippet)
-            logging.info(f"Injected HTML for marker: {marker}")
-        else:
-            logging.warning(f"Marker '{placeholder}' not found in template.")
-
-    Path(output_path).write_text(template_content, encoding="utf-8")
+    content = PageTemplate.load(template_path).render(html_blocks)
+    Path(output_path).write_text(content, encoding="utf-8")
     logging.info(f"Successfully wrote final HTML to '{output_path}'")
 
 
-def main():
-    setup_logging()
-    parser = argparse.ArgumentParser(
-        description="Generate the static site with document links."
+def generate_group_page(
+    index: DocumentIndex,
+    group_dir_name: str,
+    template: PageTemplate,
+    writer: SiteWriter,
+    docs_folder: str,
+    first_screen_rows: Optional[int] = None,
+    previews: Optional[Previews] = None,
+) -> str:
+    """
+    Renders the document table page of a single group; returns its path.
+    With `first_screen_rows`, only that many rows are inlined and the rest
+    go to a `data/<group>.json` shard that lazy_table.js loads on demand.
+    """
+    group_name = group_dir_name.split("-", 1)[1]
+    display_name = format_group_name(group_name)
+    subgroups = index.get(group_dir_name)
+    table_data = ""
+    if not subgroups:
+        html_rows = "<p>No documents found.</p>"
+    elif first_screen_rows is None:
+        html_rows = "\n".join(html_table_rows(subgroups, docs_folder, previews))
+    else:
+        rows = table_row_values(subgroups, docs_folder, previews)
+        html_rows = "".join(map(compact_table_row, rows[:first_screen_rows]))
+        table_data = write_table_shard(
+            writer, group_name.lower(), rows[first_screen_rows:]
+        )
+    output_file = os.path.join(writer.outdir, f"{group_name.lower()}.html")
+    html_blocks = {
+        "GROUP": display_name,
+        "DOCUMENTS": html_rows,
+        "TABLE_DATA": table_data,
+    }
+    if writer.write_text(output_file, template.render(html_blocks)):
+        logging.info(f"{display_name}.html generated in path: {output_file}")
+    else:
+        logging.info(f"{display_name}.html is up to date: {output_file}")
+    return output_file
+
+
+def write_table_shard(writer: SiteWriter, page_name: str, rows: List[List]) -> str:
+    """Writes the rows not inlined in a group page; returns the loader markup."""
+    if not rows:
+        return ""
+    content = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    shard = posixpath.join(TABLE_SHARDS_DIR, f"{page_name}.json")
+    writer.write_text(os.path.join(writer.outdir, shard), content)
+    version = hashlib.sha256(content.encode("utf-8")).hexdigest()[:10]
+    return (
+        f'<div id="lazyTable" data-shard="{shard}?v={version}" '
+        f'data-total="{len(rows)}" hidden></div>'
+        '<script type="module" src="js/lazy_table.js"></script>'
     )
+
+
+@docs_lib.profiler.profiled("template_population", "site")
+def render_group_pages(
+    index: DocumentIndex,
+    group_dir_names: Iterable[str],
+    template: PageTemplate,
+    writer: SiteWriter,
+    docs_folder: str,
+    first_screen_rows: Optional[int] = None,
+    previews: Optional[Previews] = None,
+) -> List[str]:
+    """Writes the page of every given group in one pass; returns their paths."""
+    return [
+        generate_group_page(
+            index,
+            group_dir_name,
+            template,
+            writer,
+            docs_folder,
+            first_screen_rows,
+            previews,
+        )
+        for group_dir_name in group_dir_names
+    ]
+
+
+def add_site_arguments(parser: argparse.ArgumentParser):
+    """Adds the site generation options shared with pipeline.py."""
     parser.add_argument("--site-dir", default="site",
                         help="Directory dei template del sito.")
     parser.add_argument("--outdir", default="dist",
                         help="Directory di output del sito.")
     parser.add_argument("--docs-folder", default="docs",
                         help="Sottocartella dei PDF compilati.")
+    parser.add_argument("--site-manifest", default=SITE_MANIFEST_PATH,
+                        help="Manifest of the previous build, used to skip "
+                        "unchanged files and remove stale ones.")
+    parser.add_argument("--no-site-manifest", action="store_true",
+                        help="Rewrite every file and do not track stale outputs.")
+    parser.add_argument("--fingerprint-assets", action="store_true",
+                        help="Name CSS, JS and images after their content hash "
+                        "(style.<hash>.css) and rewrite the HTML references.")
+    parser.add_argument("--no-search-index", action="store_true",
+                        help="Do not generate the client-side search index.")
+    parser.add_argument("--search-cache", default=SEARCH_CACHE_PATH,
+                        help="Per-document token cache reused between builds.")
+    parser.add_argument("--search-pdf-text", action="store_true",
+                        help="Also index the text of the compiled PDFs "
+                        "(requires pdftotext).")
+    parser.add_argument("--lazy-tables", action="store_true",
+                        help="Inline only the first rows of each group table and "
+                        "load the rest from per-group JSON shards while scrolling.")
+    parser.add_argument("--first-screen-rows", type=int, default=50,
+                        help="Rows inlined in each group page with --lazy-tables.")
+
+
+def create_site_writer(args: argparse.Namespace) -> SiteWriter:
+    """Opens the site output directory with the manifest of the previous build."""
+    os.makedirs(args.outdir, exist_ok=True)
+    writer = SiteWriter(
+        args.outdir,
+        manifest_path=None if args.no_site_manifest else args.site_manifest,
+        fingerprint=args.fingerprint_assets,
+    )
+    writer.load()
+    return writer
+
+
+def create_search_builder(args: argparse.Namespace) -> Optional[SearchIndexBuilder]:
+    """Returns the search index builder, or None with `--no-search-index`."""
+    if args.no_search_index:
+        return None
+    return SearchIndexBuilder(
+        args.docs_folder,
+        cache_path=args.search_cache,
+        pdf_dir=(
+            os.path.join(args.outdir, args.docs_folder)
+            if args.search_pdf_text else None
+        ),
+    )
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Generate the static site with document links."
+    )
+    add_site_arguments(parser)
+    precompress.add_precompress_arguments(parser)
+    docs_lib.add_discovery_arguments(parser)
+    docs_lib.add_profile_argument(parser)
     args = parser.parse_args()
-    document_model = docs_lib.discover_documents("docs")
+    docs_lib.setup_profiling(args)
+    document_model = docs_lib.load_document_model(args)
     logging.info(f"Found {len(document_model)} documents.")
-    os.makedirs(args.outdir, exist_ok=True)
-    copy_static_assets(args.site_dir, args.outdir)
+    writer = create_site_writer(args)
+    copy_static_assets(args.site_dir, writer)
 
-    home_template = os.path.join(args.site_dir, "index.template.html")
-    home_output = os.path.join(args.outdir, "index.html")
+    search_html = ""
+    builder = create_search_builder(args)
+    if builder is not None:
+        search_html = write_search_index(document_model, builder, writer)
 
-    try:
-        Path(home_template).read_text(encoding="utf-8")
-    except FileNotFoundError:
-        logging.critical(f"Home template not found: '{home_template}'")
-        sys.exit(1)
+    index = build_document_index(document_model)
+    group_folders = site_groups(index)
 
+    home_template = os.path.join(args.site_dir, "index.template.html")
+    home_output = os.path.join(args.outdir, "index.html")
     generate_group_cards(
+        document_model,
         template_path=home_template,
         output_path=home_output,
-        docs_folder=os.path.join(args.outdir, "docs")
+        writer=writer,
+        search_html=search_html,
+        groups=group_folders,
     )
 
-    template_file = os.path.join(args.site_dir, "template_document.html")
-
-    docs_path = Path(args.docs_folder)
+    template = PageTemplate.load(
+        os.path.join(args.site_dir, "template_document.html")
+    )
 
-    # This not take anything related with 00 milestone
-    group_folders = [
-        f for f in sorted(docs_path.iterdir())
-        if f.is_dir() and "-" in f.name and not f.name.startswith("00-")
-    ]
-    # For every
-    for folder in group_folders:
-        group_name = folder.name.split("-", 1)[1]
-        display_name = format_group_name(group_name)
-        filtered_docs = [
-            d for d in document_model if group_name.lower() in d.source.lower()
-        ]
-        html_rows = html_table_rows_from_docmodel(
-            filtered_docs, args.docs_folder)
-        output_file = os.path.join(
-            args.outdir, f"{group_name.lower()}.html")
-        html_blocks = {
-            "GROUP": display_name,
-            "DOCUMENTS": html_rows
-        }
-        populate_template(template_file, output_file, html_blocks)
-        logging.info(f"{display_name}.html generated in path: {output_file}")
+    # Written by `build_docs.py --thumbnails`; rows stay unchanged without it.
+    previews = thumbnails.load_previews(os.path.join(args.outdir, args.docs_folder))
+
+    render_group_pages(
+        index,
+        group_folders,
+        template,
+        writer,
+        args.docs_folder,
+        first_screen_rows=args.first_screen_rows if args.lazy_tables else None,
+        previews=previews,
+    )
+    writer.finish()
+
+    if args.precompress:
+        with docs_lib.profiler.span("precompress", "site"):
+            # The PDFs under the docs folder are precompressed by build_docs.py.
+            precompress.precompress_tree(
+                args.outdir,
+                precompress.SITE_EXTENSIONS,
+                args.precompress_jobs,
+                args.precompress_report,
+            )
 
     logging.info("Generation completed.")
 
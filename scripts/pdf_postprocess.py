@@ -0,0 +1,290 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import build_cache
+
+POSTPROCESS_DIR = "postprocess"
+MANIFEST_VERSION = 1
+DEFAULT_DOWNSAMPLE_DPI = 150
+
+
+@dataclass
+class PostprocessResult:
+    """Sizes before/after post-processing one PDF and any font warnings."""
+
+    size_before: int
+    size_after: int
+    steps: List[str] = field(default_factory=list)
+    font_warnings: List[str] = field(default_factory=list)
+    cached: bool = False
+
+
+def _tool_version(command: List[str]) -> Optional[str]:
+    if shutil.which(command[0]) is None:
+        return None
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return (proc.stdout or proc.stderr).strip().splitlines()[0]
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def unsubset_fonts(pdf_path: str) -> List[str]:
+    """
+    Lists the embedded fonts of a PDF that are not subset, using `pdffonts`.
+    Typst subsets every font it embeds, so anything listed is a regression.
+    """
+    proc = subprocess.run(
+        ["pdffonts", pdf_path], capture_output=True, text=True, check=True
+    )
+    warnings = []
+    # name type encoding emb sub uni object ID; the type may contain spaces,
+    # so the yes/no columns are read from the end of the line.
+    for line in proc.stdout.splitlines()[2:]:
+        columns = line.split()
+        if len(columns) < 7:
+            continue
+        name, emb, sub = columns[0], columns[-5], columns[-4]
+        if emb == "yes" and sub != "yes":
+            warnings.append(f"font '{name}' is embedded but not subset")
+        elif emb != "yes":
+            warnings.append(f"font '{name}' is not embedded")
+    return warnings
+
+
+def oversampled_images(pdf_path: str, dpi: int) -> int:
+    """Counts the raster images of a PDF placed above `dpi`, using `pdfimages -list`."""
+    proc = subprocess.run(
+        ["pdfimages", "-list", pdf_path], capture_output=True, text=True, check=True
+    )
+    count = 0
+    # Columns end with "... object ID x-ppi y-ppi size ratio".
+    for line in proc.stdout.splitlines()[2:]:
+        columns = line.split()
+        if len(columns) < 14:
+            continue
+        try:
+            x_ppi, y_ppi = int(columns[-4]), int(columns[-3])
+        except ValueError:
+            continue
+        if max(x_ppi, y_ppi) > dpi:
+            count += 1
+    return count
+
+
+class PdfPostprocessor:
+    """
+    Optional stage run on each compiled PDF, in the compile worker pool:
+    downsamples raster images above `downsample_dpi` with Ghostscript,
+    linearizes for fast web view with qpdf and checks that fonts are subset.
+
+    Ghostscript's pdfwrite re-distils the whole PDF, fonts and text included,
+    so it only runs on PDFs where `pdfimages` finds an image above the
+    threshold, and its output is kept only if smaller.
+
+    Results are cached under `<cache_dir>/postprocess/<key>.pdf`, where the
+    key hashes the compiled PDF, the options and the tool versions; a cache
+    hit costs one hash and one hardlink. Missing tools skip their step.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        linearize: bool = True,
+        downsample_dpi: Optional[int] = DEFAULT_DOWNSAMPLE_DPI,
+        check_fonts: bool = True,
+    ):
+        self.cache_dir = Path(cache_dir) / POSTPROCESS_DIR
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.qpdf = _tool_version(["qpdf", "--version"]) if linearize else None
+        self.gs = _tool_version(["gs", "--version"]) if downsample_dpi else None
+        self.pdfimages = _tool_version(["pdfimages", "-v"]) if self.gs else None
+        self.pdffonts = _tool_version(["pdffonts", "-v"]) if check_fonts else None
+        self.downsample_dpi = downsample_dpi
+        self.entries: Dict[str, Dict] = {}
+        self.outputs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        for enabled, tool, name in (
+            (linearize, self.qpdf, "qpdf"),
+            (downsample_dpi, self.gs, "gs"),
+            (self.gs, self.pdfimages, "pdfimages"),
+            (check_fonts, self.pdffonts, "pdffonts"),
+        ):
+            if enabled and tool is None:
+                logging.warning(f"'{name}' not found: skipping that post-processing step.")
+        if self.pdfimages is None:
+            # Without it, every PDF would be re-distilled.
+            self.gs = None
+
+    @property
+    def enabled(self) -> bool:
+        return any((self.qpdf, self.gs, self.pdffonts))
+
+    def load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt post-processing manifest: {e}")
+            return
+        if manifest.get("version") == MANIFEST_VERSION:
+            self.entries = manifest.get("entries", {})
+            self.outputs = manifest.get("outputs", {})
+
+    def save(self):
+        """Writes the manifest and drops cached PDFs no longer referenced by it."""
+        live = set(self.outputs.values())
+        self.entries = {k: v for k, v in self.entries.items() if k in live}
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "entries": self.entries,
+            "outputs": self.outputs,
+        }
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        for obj in self.cache_dir.glob("*.pdf"):
+            if obj.stem not in live:
+                obj.unlink()
+
+    def retain(self, outputs: Iterable[str]):
+        """Forgets outputs of documents that no longer exist."""
+        keep = set(outputs)
+        self.outputs = {k: v for k, v in self.outputs.items() if k in keep}
+
+    def _key(self, pdf_digest: str) -> str:
+        digest = hashlib.sha256(pdf_digest.encode("utf-8"))
+        for item in (
+            self.qpdf, self.gs, self.pdfimages, self.pdffonts, str(self.downsample_dpi)
+        ):
+            digest.update(f"\0{item}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _downsample(self, source: str, target: str) -> bool:
+        dpi = str(self.downsample_dpi)
+        command = [
+            "gs", "-q", "-dNOPAUSE", "-dBATCH", "-dSAFER",
+            "-sDEVICE=pdfwrite",
+            "-dCompatibilityLevel=1.7",
+            "-dAutoRotatePages=/None",
+            "-dDownsampleColorImages=true", f"-dColorImageResolution={dpi}",
+            "-dDownsampleGrayImages=true", f"-dGrayImageResolution={dpi}",
+            "-dDownsampleMonoImages=true", f"-dMonoImageResolution={dpi}",
+            "-dColorImageDownsampleThreshold=1.0",
+            "-dGrayImageDownsampleThreshold=1.0",
+            f"-sOutputFile={target}",
+            source,
+        ]
+        subprocess.run(command, capture_output=True, check=True)
+        return os.path.getsize(target) < os.path.getsize(source)
+
+    def _run_steps(self, source: str, workdir: str) -> Tuple[str, List[str]]:
+        """Applies every available step to a copy of `source`; returns the final path."""
+        current, steps = source, []
+        if self.gs:
+            target = os.path.join(workdir, "downsampled.pdf")
+            try:
+                if oversampled_images(
+                    current, self.downsample_dpi
+                ) and self._downsample(current, target):
+                    current = target
+                    steps.append("downsample")
+            except (OSError, subprocess.CalledProcessError) as e:
+                stderr = getattr(e, "stderr", e)
+                logging.warning(f"Downsampling failed on '{source}': {stderr!r}")
+        if self.qpdf:
+            target = os.path.join(workdir, "linearized.pdf")
+            # Exit code 3 means success with warnings.
+            proc = subprocess.run(
+                ["qpdf", "--linearize", "--object-streams=generate", current, target],
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode in (0, 3):
+                current = target
+                steps.append("linearize")
+            else:
+                logging.warning(f"qpdf failed on '{source}': {proc.stderr.strip()}")
+        return current, steps
+
+    def process(self, output: str, pdf_path: str) -> PostprocessResult:
+        """Post-processes the compiled PDF at `pdf_path` (the `output` of a document)."""
+        size_before = os.path.getsize(pdf_path)
+        key = self._key(_hash_file(pdf_path))
+        obj = self.cache_dir / f"{key}.pdf"
+        with self._lock:
+            entry = self.entries.get(key)
+            self.outputs[output] = key
+
+        if entry is not None and obj.is_file():
+            self._place(obj, pdf_path)
+            return PostprocessResult(
+                size_before,
+                entry["size_after"],
+                entry["steps"],
+                entry["font_warnings"],
+                cached=True,
+            )
+
+        with tempfile.TemporaryDirectory(dir=self.cache_dir) as workdir:
+            final, steps = self._run_steps(pdf_path, workdir)
+            font_warnings = self._check_fonts(final, pdf_path)
+            tmp_obj = obj.with_name(f"{obj.name}.{threading.get_ident()}.tmp")
+            shutil.copy2(final, tmp_obj)
+            os.replace(tmp_obj, obj)
+        self._place(obj, pdf_path)
+
+        result = PostprocessResult(
+            size_before, os.path.getsize(obj), steps, font_warnings
+        )
+        with self._lock:
+            self.entries[key] = {
+                "size_before": result.size_before,
+                "size_after": result.size_after,
+                "steps": result.steps,
+                "font_warnings": result.font_warnings,
+            }
+        return result
+
+    def _check_fonts(self, final: str, pdf_path: str) -> List[str]:
+        """Runs `unsubset_fonts`; a failing diagnostic only logs a warning."""
+        if not self.pdffonts:
+            return []
+        try:
+            return unsubset_fonts(final)
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, "stderr", e)
+            logging.warning(f"pdffonts failed on '{pdf_path}': {stderr!r}")
+            return []
+
+    @staticmethod
+    def _place(obj: Path, pdf_path: str):
+        # The compiled PDF may be a hardlink into the build cache: replace the
+        # directory entry instead of writing through it.
+        build_cache.remove_output(pdf_path)
+        try:
+            os.link(obj, pdf_path)
+        except OSError:
+            shutil.copy2(obj, pdf_path)
@@ -0,0 +1,430 @@
+"""
+Single entry point for the deploy and PR pipelines. Documents are discovered
+once, then compilation, asset copying, site rendering and validation run as
+a dependency graph of stages: static assets are copied while documents
+compile and each group page is rendered as soon as its documents are built.
+
+Usage:
+    python scripts/pipeline.py --outdir dist --fingerprint-assets
+    python scripts/pipeline.py --only validate build --base origin/main \\
+        --changed-files changed_files.txt
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import docs_lib
+import build_docs
+import generate_site
+import precompress
+import thumbnails
+from validate_pr_changes import check_changes, report_validation
+
+STAGES = ("build", "site", "validate")
+COMPILE_POOL = "compile"
+# SiteWriter is not thread-safe, so every stage writing the site shares one worker.
+SITE_POOL = "site"
+MISC_POOL = "misc"
+
+
+def setup_logging():
+    """Configures logging."""
+    log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], Any]
+    deps: List[str]
+    pool: str
+    result: Any = None
+    error: Optional[BaseException] = None
+    skipped: bool = False
+    dependents: List[str] = field(default_factory=list)
+
+
+class StageGraph:
+    """
+    Runs stages as soon as all their dependencies have completed, each on the
+    worker pool it was assigned to. Dependencies must be added first, so the
+    graph cannot have cycles. A stage that raises is reported and the stages
+    depending on it are skipped; the others still run.
+    """
+
+    def __init__(self, pool_sizes: Dict[str, int]):
+        self.pool_sizes = pool_sizes
+        self.stages: Dict[str, Stage] = {}
+
+    def add(
+        self,
+        name: str,
+        run: Callable[[], Any],
+        deps: Iterable[str] = (),
+        pool: str = MISC_POOL,
+    ) -> str:
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage '{name}'")
+        if pool not in self.pool_sizes:
+            raise ValueError(f"Unknown pool '{pool}' for stage '{name}'")
+        deps = list(dict.fromkeys(deps))
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+            self.stages[dep].dependents.append(name)
+        self.stages[name] = Stage(name, run, deps, pool)
+        return name
+
+    @staticmethod
+    def _run_stage(stage: Stage):
+        kind = stage.name.split(":", 1)[0]
+        try:
+            with docs_lib.profiler.span(kind, "pipeline", stage=stage.name):
+                stage.result = stage.run()
+        except SystemExit as e:
+            # The stage already logged why it gave up.
+            stage.error = e
+        except Exception as e:
+            logging.error(f"Stage '{stage.name}' failed: {e}", exc_info=True)
+            stage.error = e
+
+    def run(self) -> Dict[str, Stage]:
+        pending = {name: len(stage.deps) for name, stage in self.stages.items()}
+        blocked: Set[str] = set()
+        executors = {
+            pool: ThreadPoolExecutor(max_workers=size, thread_name_prefix=pool)
+            for pool, size in self.pool_sizes.items()
+        }
+        running = {}
+
+        def release(name: str):
+            """Marks `name` as done and starts or skips the stages now ready."""
+            finished = [name]
+            while finished:
+                stage = self.stages[finished.pop()]
+                for dependent in stage.dependents:
+                    if stage.error is not None or stage.skipped:
+                        blocked.add(dependent)
+                    pending[dependent] -= 1
+                    if pending[dependent] > 0:
+                        continue
+                    if dependent in blocked:
+                        self.stages[dependent].skipped = True
+                        logging.warning(f"Skipping '{dependent}': a dependency failed.")
+                        finished.append(dependent)
+                    else:
+                        submit(dependent)
+
+        def submit(name: str):
+            stage = self.stages[name]
+            running[executors[stage.pool].submit(self._run_stage, stage)] = name
+
+        try:
+            for name, count in list(pending.items()):
+                if count == 0:
+                    submit(name)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    release(running.pop(future))
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+        return self.stages
+
+
+class Pipeline:
+    """Plans the stages selected with `--only` over one discovered document model."""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        stages: Set[str],
+        documents: List[docs_lib.Document],
+        graph,
+        changed_files: Optional[Set[str]],
+    ):
+        self.args = args
+        self.selected = stages
+        self.documents = documents
+        self.graph = graph
+        self.changed_files = changed_files
+        self.pdf_dir = os.path.join(args.outdir, args.docs_folder)
+        self.results: List[build_docs.CompileResult] = []
+        self.failure_count = 0
+        self.validation_errors: List[str] = []
+        # Filled as documents are built, so each group page shows fresh previews.
+        self.previews = {}
+        if args.thumbnails or "build" not in stages:
+            self.previews = thumbnails.load_previews(self.pdf_dir)
+        self._report_lock = threading.Lock()
+        self._start = 0.0
+        self.dag = StageGraph(
+            {COMPILE_POOL: args.jobs, SITE_POOL: 1, MISC_POOL: 1}
+        )
+
+    def plan(self):
+        compile_stages: Dict[str, str] = {}
+        outputs: List[str] = []
+        if "build" in self.selected:
+            compile_stages, build_done = self._plan_build()
+            outputs += build_done
+        if "site" in self.selected:
+            outputs.append(self._plan_site(compile_stages))
+        if "validate" in self.selected:
+            self.dag.add("validate", self._validate)
+        if self.args.precompress and outputs:
+            self.dag.add("precompress", self._precompress, deps=outputs)
+
+    def _plan_build(self):
+        to_build = self.documents
+        if self.changed_files is not None:
+            to_build = build_docs.select_affected_documents(
+                self.documents, self.graph, self.changed_files
+            )
+            if not to_build:
+                logging.info("No documents affected by the changes, nothing to build.")
+                return {}, []
+
+        os.makedirs(self.pdf_dir, exist_ok=True)
+        self.cache = build_docs.create_build_cache(self.args)
+        self.postprocessor = build_docs.create_postprocessor(self.args)
+        self.fonts = build_docs.create_font_stager(self.args)
+        self.timings = build_docs.create_timings(self.args)
+        self.thumbnailer = build_docs.create_thumbnailer(self.args, self.fonts)
+        compile_deps = []
+        if self.fonts is not None:
+            compile_deps.append(self.dag.add("font_index", self.fonts.load))
+        logging.info(f"Starting compilation with {self.args.jobs} jobs...")
+        compile_stages = {
+            doc.source: self.dag.add(
+                f"compile:{doc.source}",
+                lambda doc=doc: self._compile(doc),
+                deps=compile_deps,
+                pool=COMPILE_POOL,
+            )
+            for doc in to_build
+        }
+        done = self.dag.add(
+            "build_summary", self._build_summary, deps=compile_stages.values()
+        )
+        return compile_stages, [done]
+
+    def _compile(self, doc: docs_lib.Document) -> build_docs.CompileResult:
+        result = build_docs.build_document(
+            doc,
+            self.pdf_dir,
+            self.cache,
+            self.postprocessor,
+            self.thumbnailer,
+            self.fonts,
+        )
+        with self._report_lock:
+            build_docs.report_result(result)
+            self.results.append(result)
+            if result.preview is not None:
+                self.previews[doc.output] = result.preview
+        return result
+
+    def _build_summary(self):
+        elapsed = time.perf_counter() - self._start
+        build_docs.save_build_state(
+            self.documents,
+            self.cache,
+            self.postprocessor,
+            self.thumbnailer,
+            self.results,
+            self.pdf_dir,
+            self.fonts,
+            self.timings,
+        )
+        self.failure_count = build_docs.log_build_summary(
+            self.results, elapsed, self.cache is not None, self.fonts
+        )
+
+    def _plan_site(self, compile_stages: Dict[str, str]) -> str:
+        args = self.args
+        writer = generate_site.create_site_writer(args)
+        index = generate_site.build_document_index(self.documents)
+        groups = generate_site.site_groups(index)
+        template = generate_site.PageTemplate.load(
+            os.path.join(args.site_dir, "template_document.html")
+        )
+        # Pages reference fingerprinted asset names, so they wait for the copy.
+        assets = self.dag.add(
+            "assets",
+            lambda: generate_site.copy_static_assets(args.site_dir, writer),
+            pool=SITE_POOL,
+        )
+        site_stages = [assets]
+
+        home_deps = [assets]
+        builder = generate_site.create_search_builder(args)
+        if builder is not None:
+            # Indexing PDF text needs the compiled PDFs.
+            search_deps = list(compile_stages.values()) if args.search_pdf_text else []
+            home_deps.append(
+                self.dag.add(
+                    "search",
+                    lambda: generate_site.write_search_index(
+                        self.documents, builder, writer
+                    ),
+                    deps=search_deps,
+                    pool=SITE_POOL,
+                )
+            )
+            site_stages.append(home_deps[-1])
+
+        def home_page():
+            search_html = self.dag.stages["search"].result if builder else ""
+            generate_site.generate_group_cards(
+                self.documents,
+                template_path=os.path.join(args.site_dir, "index.template.html"),
+                output_path=os.path.join(args.outdir, "index.html"),
+                writer=writer,
+                search_html=search_html,
+                groups=groups,
+            )
+
+        site_stages.append(
+            self.dag.add("home_page", home_page, deps=home_deps, pool=SITE_POOL)
+        )
+
+        first_screen_rows = args.first_screen_rows if args.lazy_tables else None
+        for group in groups:
+            group_compiles = [
+                compile_stages[doc.source]
+                for docs in index.get(group, {}).values()
+                for doc in docs
+                if doc.source in compile_stages
+            ]
+            site_stages.append(
+                self.dag.add(
+                    f"group_page:{group}",
+                    lambda group=group: generate_site.render_group_pages(
+                        index, [group], template, writer, args.docs_folder,
+                        first_screen_rows, self.previews,
+                    ),
+                    deps=[assets, *group_compiles],
+                    pool=SITE_POOL,
+                )
+            )
+        return self.dag.add(
+            "site_finish", writer.finish, deps=site_stages, pool=SITE_POOL
+        )
+
+    def _validate(self):
+        changed_files = self.changed_files
+        if changed_files is None:
+            changed_files = docs_lib.changed_files_since(self.args.base)
+        self.validation_errors = check_changes(
+            self.documents, self.graph, changed_files, self.args.base
+        )
+
+    def _precompress(self):
+        extensions = set()
+        root = self.args.outdir
+        if "site" in self.selected:
+            extensions |= precompress.SITE_EXTENSIONS
+        if "build" in self.selected:
+            extensions |= precompress.PDF_EXTENSIONS
+            if "site" not in self.selected:
+                root = self.pdf_dir
+        precompress.precompress_tree(
+            root, extensions, self.args.precompress_jobs, self.args.precompress_report
+        )
+
+    def run(self) -> int:
+        """Runs the planned stages; returns the exit code the separate scripts would."""
+        self._start = time.perf_counter()
+        stages = self.dag.run()
+        errors = [s.error for s in stages.values() if s.error is not None]
+        for error in errors:
+            if isinstance(error, SystemExit):
+                raise error
+        if "site" in self.selected and not errors:
+            logging.info("Generation completed.")
+        if "validate" in self.selected and stages["validate"].error is None:
+            report_validation(self.validation_errors)
+        if errors or self.failure_count > 0:
+            return 1
+        return 0
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(
+        description="Discover, build, render the site and validate in one run."
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=STAGES,
+        help="Run only these stages (default: build and site, plus validate "
+        "when --base is given).",
+    )
+    parser.add_argument(
+        "--base",
+        metavar="GIT_REF",
+        help="Check document versioning against the merge base with GIT_REF.",
+    )
+    parser.add_argument(
+        "--model-output",
+        help="Also save the discovered document model to this JSON file.",
+    )
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--changed-files",
+        help="Only build documents affected by the files listed in this file; "
+        "also the change set checked by the validate stage.",
+    )
+    selection.add_argument(
+        "--since",
+        metavar="GIT_REF",
+        help="Only build documents affected by changes since the merge base with GIT_REF.",
+    )
+    build_docs.add_build_arguments(parser)
+    generate_site.add_site_arguments(parser)
+    precompress.add_precompress_arguments(parser)
+    docs_lib.add_discovery_arguments(parser)
+    docs_lib.add_profile_argument(parser)
+    args = parser.parse_args()
+
+    stages = set(args.only or ("build", "site"))
+    if args.base and not args.only:
+        stages.add("validate")
+    if "validate" in stages and not args.base:
+        parser.error("the validate stage needs --base")
+    docs_lib.setup_profiling(args)
+
+    graph = docs_lib.new_dependency_graph()
+    with docs_lib.profiler.span("discover", "pipeline"):
+        documents = docs_lib.load_document_model(args, graph)
+    logging.info(f"Found {len(documents)} documents.")
+    if args.model_output:
+        docs_lib.save_model(documents, args.model_output)
+        logging.info(f"Saved the document model to '{args.model_output}'")
+
+    changed_files = None
+    if args.changed_files or args.since:
+        changed_files = build_docs.changed_files_from_args(args)
+
+    pipeline = Pipeline(args, stages, documents, graph, changed_files)
+    pipeline.plan()
+    sys.exit(pipeline.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import os
+import sys
+import gzip
+import json
+import hashlib
+import logging
+import argparse
+import posixpath
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import brotli
+except ImportError:  # optional dependency, only .gz siblings are written
+    brotli = None
+
+SITE_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg"}
+PDF_EXTENSIONS = {".pdf"}
+COMPRESSED_SUFFIXES = (".gz", ".br")
+PRECOMPRESS_MANIFEST_DIR = ".build-cache/precompress"
+PRECOMPRESS_MANIFEST_VERSION = 1
+
+
+@dataclass
+class CompressedFile:
+    path: str
+    digest: str
+    raw_size: int
+    gzip_size: Optional[int] = None
+    brotli_size: Optional[int] = None
+    skipped: bool = False
+
+
+def _write_sibling(path: str, data: Optional[bytes], raw_size: int) -> Optional[int]:
+    """Writes a compressed sibling if it is smaller than the original."""
+    if data is None or len(data) >= raw_size:
+        if os.path.exists(path):
+            os.unlink(path)
+        return None
+    # Replace rather than overwrite: outputs may be hardlinked by dedup_assets.py.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def compress_file(path: str, previous: Optional[Dict]) -> CompressedFile:
+    """Writes `path`.gz (and `path`.br) unless `previous` shows they are current."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    if (
+        previous is not None
+        and previous["sha256"] == digest
+        and previous.get("with_brotli") == (brotli is not None)
+        and all(
+            size is None or os.path.exists(path + suffix)
+            for suffix, size in ((".gz", previous["gzip"]), (".br", previous["brotli"]))
+        )
+    ):
+        return CompressedFile(
+            path, digest, len(raw), previous["gzip"], previous["brotli"], True
+        )
+
+    # mtime=0 keeps the .gz output identical across builds.
+    gzip_data = gzip.compress(raw, compresslevel=9, mtime=0)
+    brotli_data = brotli.compress(raw, quality=11) if brotli is not None else None
+    return CompressedFile(
+        path,
+        digest,
+        len(raw),
+        _write_sibling(path + ".gz", gzip_data, len(raw)),
+        _write_sibling(path + ".br", brotli_data, len(raw)),
+    )
+
+
+class Precompressor:
+    """
+    Emits precompressed `.gz`/`.br` siblings for the files of a tree, skipping
+    files whose hash matches the previous run (see `manifest_path`).
+    """
+
+    def __init__(
+        self,
+        root: str,
+        extensions: Iterable[str],
+        manifest_path: Optional[str] = None,
+        jobs: Optional[int] = None,
+    ):
+        self.root = root
+        self.extensions = set(extensions)
+        self.manifest_path = manifest_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.results: List[CompressedFile] = []
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if not self.manifest_path:
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if (
+            data.get("version") != PRECOMPRESS_MANIFEST_VERSION
+            or data.get("root") != os.path.abspath(self.root)
+        ):
+            return {}
+        return data.get("files", {})
+
+    def _save_manifest(self):
+        if not self.manifest_path:
+            return
+        files = {
+            self._rel(result.path): {
+                "sha256": result.digest,
+                "gzip": result.gzip_size,
+                "brotli": result.brotli_size,
+                "with_brotli": brotli is not None,
+            }
+            for result in self.results
+        }
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": PRECOMPRESS_MANIFEST_VERSION,
+                    "root": os.path.abspath(self.root),
+                    "files": files,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.path.sep, "/")
+
+    def _scan(self) -> List[str]:
+        """Lists the files to compress."""
+        sources = []
+        for dirpath, dirs, names in os.walk(self.root):
+            dirs.sort()
+            for name in sorted(names):
+                if posixpath.splitext(name)[1].lower() in self.extensions:
+                    sources.append(os.path.join(dirpath, name))
+        return sources
+
+    def _remove_orphans(self, previous: Dict[str, Dict], sources: List[str]):
+        """Deletes the siblings of previously compressed files that are gone."""
+        current = {self._rel(path) for path in sources}
+        for rel_path in previous.keys() - current:
+            for suffix in COMPRESSED_SUFFIXES:
+                sibling = os.path.join(self.root, rel_path + suffix)
+                if os.path.isfile(sibling):
+                    os.unlink(sibling)
+                    logging.debug(f"Removed orphaned '{sibling}'")
+
+    def run(self) -> List[CompressedFile]:
+        if brotli is None:
+            logging.warning("brotli is not installed: writing .gz siblings only.")
+        previous = self._load_manifest()
+        sources = self._scan()
+        self._remove_orphans(previous, sources)
+        # zlib and brotli release the GIL while compressing.
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            self.results = list(
+                executor.map(
+                    lambda path: compress_file(path, previous.get(self._rel(path))),
+                    sources,
+                )
+            )
+        self._save_manifest()
+        skipped = sum(r.skipped for r in self.results)
+        logging.info(
+            f"Precompressed {len(self.results) - skipped} files in '{self.root}' "
+            f"({skipped} unchanged)."
+        )
+        return self.results
+
+    def size_report(self) -> Dict[str, Dict[str, int]]:
+        """Totals per file type; a missing sibling counts as the raw size."""
+        report = defaultdict(lambda: {"files": 0, "raw": 0, "gzip": 0, "brotli": 0})
+        for result in self.results:
+            ext = posixpath.splitext(result.path)[1].lower()
+            row = report[ext]
+            row["files"] += 1
+            row["raw"] += result.raw_size
+            row["gzip"] += result.gzip_size or result.raw_size
+            row["brotli"] += result.brotli_size or result.gzip_size or result.raw_size
+        return dict(sorted(report.items()))
+
+    def log_size_report(self):
+        report = self.size_report()
+        if not report:
+            return
+        logging.info(f"{'type':8} {'files':>6} {'raw KiB':>10} {'gzip KiB':>10} {'br KiB':>10}")
+        totals = {"files": 0, "raw": 0, "gzip": 0, "brotli": 0}
+        for ext, row in report.items():
+            for key in totals:
+                totals[key] += row[key]
+            logging.info(self._report_line(ext, row))
+        logging.info(self._report_line("total", totals))
+
+    @staticmethod
+    def _report_line(label: str, row: Dict[str, int]) -> str:
+        ratio = row["brotli"] / row["raw"] if row["raw"] else 1.0
+        return (
+            f"{label:8} {row['files']:6d} {row['raw'] / 1024:10.1f} "
+            f"{row['gzip'] / 1024:10.1f} {row['brotli'] / 1024:10.1f}  ({ratio:.0%})"
+        )
+
+    def write_report(self, report_path: str):
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "root": self.root,
+                    "brotli": brotli is not None,
+                    "types": self.size_report(),
+                    "files": {
+                        self._rel(r.path): {
+                            "raw": r.raw_size,
+                            "gzip": r.gzip_size,
+                            "brotli": r.brotli_size,
+                        }
+                        for r in self.results
+                    },
+                },
+                f,
+                indent=2,
+            )
+        logging.info(f"Size report written to '{report_path}'.")
+
+
+def manifest_path_for(root: str) -> str:
+    """One manifest per output tree, e.g. `.build-cache/precompress/dist.json`."""
+    name = os.path.normpath(root).replace(os.path.sep, "_").strip("._") or "root"
+    return os.path.join(PRECOMPRESS_MANIFEST_DIR, f"{name}.json")
+
+
+def precompress_tree(
+    root: str,
+    extensions: Iterable[str],
+    jobs: Optional[int] = None,
+    report_path: Optional[str] = None,
+) -> List[CompressedFile]:
+    """Precompresses `root`, logs the size summary and optionally writes it as JSON."""
+    precompressor = Precompressor(root, extensions, manifest_path_for(root), jobs)
+    results = precompressor.run()
+    precompressor.log_size_report()
+    if report_path:
+        precompressor.write_report(report_path)
+    return results
+
+
+def add_precompress_arguments(parser: argparse.ArgumentParser):
+    """Adds the options shared by the scripts that can precompress their output."""
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="Write .gz (and, with the brotli package, .br) siblings of the outputs.",
+    )
+    parser.add_argument(
+        "--precompress-jobs",
+        type=int,
+        default=None,
+        help="Number of files compressed concurrently (default: CPU count).",
+    )
+    parser.add_argument(
+        "--precompress-report",
+        metavar="REPORT_JSON",
+        help="Write the raw vs compressed size summary to this JSON file.",
+    )
+
+
+def main():
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    parser = argparse.ArgumentParser(
+        description="Write precompressed .gz/.br siblings of the files in a directory."
+    )
+    parser.add_argument("root", help="Directory to precompress, e.g. 'dist'.")
+    parser.add_argument(
+        "--extensions",
+        nargs="+",
+        default=sorted(SITE_EXTENSIONS),
+        help="File extensions to compress.",
+    )
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--report", metavar="REPORT_JSON")
+    args = parser.parse_args()
+    if not os.path.isdir(args.root):
+        logging.critical(f"Directory '{args.root}' not found.")
+        sys.exit(1)
+    precompress_tree(args.root, args.extensions, args.jobs, args.report)
+
+
+if __name__ == "__main__":
+    main()
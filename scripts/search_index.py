@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+import posixpath
+import subprocess
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+import docs_lib
+
+SEARCH_INDEX_NAME = "search-index.json"
+SEARCH_CACHE_PATH = ".build-cache/search-entries.json"
+SEARCH_INDEX_VERSION = 1
+MIN_TOKEN_LENGTH = 2
+# Caps the distinct PDF-text tokens of one document, keeping the index small.
+MAX_PDF_TOKENS = 2000
+
+TOKEN_SPLIT_REGEX = re.compile(r"[\W_]+")
+
+# Field weights; a token keeps the highest weight it is found with.
+TITLE_WEIGHT = 8
+PEOPLE_WEIGHT = 4
+DESCRIPTION_WEIGHT = 2
+PDF_TEXT_WEIGHT = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases, strips accents and splits on non-alphanumerics (as search.js does)."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return [t for t in TOKEN_SPLIT_REGEX.split(text) if len(t) >= MIN_TOKEN_LENGTH]
+
+
+def _add_tokens(terms: Dict[str, int], text: str, weight: int):
+    for token in tokenize(text):
+        if terms.get(token, 0) < weight:
+            terms[token] = weight
+
+
+def pdf_text(pdf_path: str) -> str:
+    """Extracts the text of a compiled PDF with `pdftotext`, or '' if unavailable."""
+    try:
+        proc = subprocess.run(
+            ["pdftotext", "-q", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.warning(f"Could not extract text from '{pdf_path}': {e}")
+        return ""
+    return proc.stdout.decode("utf-8", errors="replace")
+
+
+class SearchIndexBuilder:
+    """
+    Builds the client-side search index of the site.
+
+    Every document contributes weighted tokens from its title, authors,
+    verifiers, changelog descriptions and, with `pdf_dir`, the text of its
+    compiled PDF. Token sets are cached per document under a fingerprint of
+    their inputs, so only new or changed documents are re-tokenized.
+    """
+
+    def __init__(
+        self,
+        docs_folder: str,
+        cache_path: Optional[str] = SEARCH_CACHE_PATH,
+        pdf_dir: Optional[str] = None,
+    ):
+        self.docs_folder = docs_folder
+        self.cache_path = cache_path
+        self.pdf_dir = pdf_dir
+        if pdf_dir and shutil.which("pdftotext") is None:
+            logging.warning("pdftotext not found: indexing metadata only.")
+            self.pdf_dir = None
+        self._entries: Dict[str, Dict] = {}
+        self.reused = 0
+        self.rebuilt = 0
+
+    def load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            logging.warning(f"Ignoring corrupt search cache '{self.cache_path}'")
+            return
+        if data.get("version") == SEARCH_INDEX_VERSION:
+            self._entries = data.get("entries", {})
+
+    def save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": SEARCH_INDEX_VERSION, "entries": self._entries},
+                f,
+                separators=(",", ":"),
+            )
+
+    def _pdf_path(self, doc: docs_lib.Document) -> Optional[str]:
+        if not self.pdf_dir:
+            return None
+        path = os.path.join(self.pdf_dir, doc.output)
+        return path if os.path.isfile(path) else None
+
+    def _fingerprint(self, doc: docs_lib.Document) -> str:
+        h = hashlib.sha256()
+        h.update(doc.metadata_hash.encode("utf-8"))
+        pdf_path = self._pdf_path(doc)
+        if pdf_path:
+            st = os.stat(pdf_path)
+            h.update(f"\0{st.st_mtime_ns}:{st.st_size}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _terms(self, doc: docs_lib.Document) -> Dict[str, int]:
+        terms: Dict[str, int] = {}
+        # Parsed only on a cache miss, and not kept on the document.
+        metadata = doc.read_metadata()
+        _add_tokens(terms, metadata.get("title", ""), TITLE_WEIGHT)
+        for entry in metadata.get("changelog", []):
+            for person in entry.get("authors", []) + entry.get("verifiers", []):
+                _add_tokens(terms, person, PEOPLE_WEIGHT)
+            _add_tokens(terms, entry.get("description", ""), DESCRIPTION_WEIGHT)
+        pdf_path = self._pdf_path(doc)
+        if pdf_path:
+            pdf_terms: Dict[str, int] = {}
+            _add_tokens(pdf_terms, pdf_text(pdf_path), PDF_TEXT_WEIGHT)
+            for token in sorted(pdf_terms)[:MAX_PDF_TOKENS]:
+                terms.setdefault(token, PDF_TEXT_WEIGHT)
+        return terms
+
+    def terms_for(self, doc: docs_lib.Document) -> Dict[str, int]:
+        """Returns the weighted tokens of `doc`, reusing the cached ones if current."""
+        fingerprint = self._fingerprint(doc)
+        cached = self._entries.get(doc.source)
+        if cached is not None and cached["fingerprint"] == fingerprint:
+            self.reused += 1
+            return cached["terms"]
+        self.rebuilt += 1
+        terms = self._terms(doc)
+        self._entries[doc.source] = {"fingerprint": fingerprint, "terms": terms}
+        return terms
+
+    def build(
+        self, document_model: Iterable[docs_lib.Document], group_names: Dict[str, str]
+    ) -> Dict:
+        """
+        Returns the index: `docs` rows plus a sorted `terms` list whose
+        `postings` are flat [doc, weight, doc, weight, ...] arrays, so the
+        browser can binary-search token prefixes.
+        """
+        docs = []
+        postings: Dict[str, List[int]] = {}
+        sources = set()
+        for doc in document_model:
+            doc_id = len(docs)
+            sources.add(doc.source)
+            docs.append([
+                doc.title,
+                posixpath.join(self.docs_folder, doc.output),
+                group_names.get(doc.group, doc.group),
+                doc.subgroup.capitalize(),
+                doc.latest_version,
+                doc.last_modified_date,
+            ])
+            for token, weight in self.terms_for(doc).items():
+                postings.setdefault(token, []).extend((doc_id, weight))
+
+        for source in self._entries.keys() - sources:
+            del self._entries[source]
+
+        terms = sorted(postings)
+        logging.info(
+            f"Search index: {len(docs)} documents, {len(terms)} terms "
+            f"({self.reused} reused, {self.rebuilt} re-tokenized)."
+        )
+        return {
+            "version": SEARCH_INDEX_VERSION,
+            "docs": docs,
+            "terms": terms,
+            "postings": [postings[t] for t in terms],
+        }
+
+
+def serialize_index(index: Dict) -> str:
+    """Compact JSON without whitespace; it compresses well with gzip/brotli."""
+    return json.dumps(index, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+import posixpath
+from pathlib import Path
+from typing import Dict, Optional
+
+SITE_MANIFEST_PATH = ".build-cache/site-manifest.json"
+SITE_MANIFEST_VERSION = 1
+
+# Assets that get a content hash in their name with --fingerprint-assets.
+FINGERPRINT_EXTENSIONS = {
+    ".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".woff2"
+}
+# Text outputs whose local references are rewritten to fingerprinted names.
+REWRITE_EXTENSIONS = {".html", ".css"}
+REFERENCE_REGEX = re.compile(
+    r"""(?P<prefix>\b(?:href|src)\s*=\s*["']|url\(\s*["']?)(?P<path>[^"')?#\s]+)"""
+)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprinted_name(rel_path: str, digest: str) -> str:
+    """'style/style.css' -> 'style/style.<hash>.css'"""
+    root, ext = posixpath.splitext(rel_path)
+    return f"{root}.{digest[:10]}{ext}"
+
+
+class SiteWriter:
+    """
+    Writes site outputs below `outdir`, skipping files whose content did not
+    change since the previous build. Files are replaced rather than rewritten
+    in place, as outputs may be hardlinked by `dedup_assets.py --link`.
+
+    The manifest maps every output path (relative to `outdir`) to the hash and
+    size it was written with. At `finish()` the outputs of the previous build
+    that were not produced again are removed; files the writer never wrote
+    (e.g. the PDFs of `build_docs.py`) are left alone.
+    """
+
+    def __init__(
+        self,
+        outdir: str,
+        manifest_path: Optional[str] = SITE_MANIFEST_PATH,
+        fingerprint: bool = False,
+    ):
+        self.outdir = outdir
+        self.manifest_path = manifest_path
+        self.fingerprint = fingerprint
+        self.asset_names: Dict[str, str] = {}
+        self._previous: Dict[str, Dict] = {}
+        self._current: Dict[str, Dict] = {}
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def load(self):
+        if not self.manifest_path:
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError:
+            logging.warning(f"Ignoring corrupt site manifest '{self.manifest_path}'")
+            return
+        if (
+            data.get("version") == SITE_MANIFEST_VERSION
+            and data.get("outdir") == os.path.abspath(self.outdir)
+        ):
+            self._previous = data.get("files", {})
+
+    def _rel(self, path: str) -> str:
+        return os.path.relpath(path, self.outdir).replace(os.path.sep, "/")
+
+    def _is_current(self, rel_path: str, digest: str, size: int) -> bool:
+        """True if the file on disk already has the given content."""
+        dest = os.path.join(self.outdir, rel_path)
+        try:
+            st = os.stat(dest)
+        except FileNotFoundError:
+            return False
+        if st.st_size != size:
+            return False
+        previous = self._previous.get(rel_path)
+        if previous is not None and previous.get("mtime_ns") == st.st_mtime_ns:
+            return previous["sha256"] == digest
+        return _hash_file(dest) == digest
+
+    def _record(self, rel_path: str, digest: str, size: int):
+        st = os.stat(os.path.join(self.outdir, rel_path))
+        self._current[rel_path] = {
+            "sha256": digest, "size": size, "mtime_ns": st.st_mtime_ns
+        }
+
+    def write_bytes(self, path: str, data: bytes) -> bool:
+        """Writes `data` to `path` unless it already holds it; True if written."""
+        rel_path = self._rel(path)
+        digest = _sha256(data)
+        changed = not self._is_current(rel_path, digest, len(data))
+        if changed:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            Path(tmp_path).write_bytes(data)
+            os.replace(tmp_path, path)
+            self.written += 1
+            logging.debug(f"Wrote '{path}'")
+        else:
+            self.unchanged += 1
+        self._record(rel_path, digest, len(data))
+        return changed
+
+    def write_text(self, path: str, content: str) -> bool:
+        """Like `write_bytes`, rewriting asset references in HTML and CSS first."""
+        if self.asset_names and posixpath.splitext(path)[1] in REWRITE_EXTENSIONS:
+            content = self.rewrite_references(content, self._rel(path))
+        return self.write_bytes(path, content.encode("utf-8"))
+
+    def copy_file(self, source: str, path: str):
+        """Copies `source` to `path` unless the destination is already identical."""
+        rel_path = self._rel(path)
+        digest = _hash_file(source)
+        size = os.path.getsize(source)
+        if self._is_current(rel_path, digest, size):
+            self.unchanged += 1
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, path)
+            self.written += 1
+            logging.debug(f"Copied '{source}' -> '{path}'")
+        self._record(rel_path, digest, size)
+
+    def copy_assets(self, source_dir: str):
+        """
+        Mirrors `source_dir` into the output, skipping `*.template.html`.
+        With fingerprinting, binary assets are named after their hash first,
+        then CSS/JS (whose references may point at them), then everything else.
+        """
+        files = []
+        for root, dirs, names in os.walk(source_dir):
+            dirs.sort()
+            for name in sorted(names):
+                if name.endswith(".template.html"):
+                    logging.debug(f"Skipping template: {name}")
+                    continue
+                source = os.path.join(root, name)
+                rel_path = os.path.relpath(source, source_dir)
+                files.append((source, rel_path.replace(os.path.sep, "/")))
+
+        def phase(item):
+            ext = posixpath.splitext(item[1])[1]
+            if ext in FINGERPRINT_EXTENSIONS:
+                return 1 if ext in (".css", ".js") else 0
+            return 2
+
+        for source, rel_path in sorted(files, key=phase):
+            ext = posixpath.splitext(rel_path)[1]
+            if self.fingerprint and ext in FINGERPRINT_EXTENSIONS:
+                if ext in REWRITE_EXTENSIONS:
+                    content = self.rewrite_references(
+                        Path(source).read_text(encoding="utf-8"), rel_path
+                    )
+                    data = content.encode("utf-8")
+                    name = fingerprinted_name(rel_path, _sha256(data))
+                    self.write_bytes(os.path.join(self.outdir, name), data)
+                else:
+                    name = fingerprinted_name(rel_path, _hash_file(source))
+                    self.copy_file(source, os.path.join(self.outdir, name))
+                self.asset_names[rel_path] = name
+            elif ext in REWRITE_EXTENSIONS:
+                self.write_text(
+                    os.path.join(self.outdir, rel_path),
+                    Path(source).read_text(encoding="utf-8"),
+                )
+            else:
+                self.copy_file(source, os.path.join(self.outdir, rel_path))
+
+    def rewrite_references(self, content: str, rel_path: str) -> str:
+        """Points local `href`/`src`/`url()` references at fingerprinted assets."""
+        if not self.asset_names:
+            return content
+        base = posixpath.dirname(rel_path)
+
+        def replace(match):
+            target = match.group("path")
+            if "://" in target or target.startswith(("/", "data:", "mailto:")):
+                return match.group(0)
+            resolved = posixpath.normpath(posixpath.join(base, target))
+            name = self.asset_names.get(resolved)
+            if name is None:
+                return match.group(0)
+            return match.group("prefix") + posixpath.relpath(name, base or ".")
+
+        return REFERENCE_REGEX.sub(replace, content)
+
+    def finish(self):
+        """Removes stale outputs of the previous build and saves the manifest."""
+        for rel_path in sorted(self._previous.keys() - self._current.keys()):
+            path = os.path.join(self.outdir, rel_path)
+            if os.path.isfile(path):
+                os.unlink(path)
+                self.removed += 1
+                logging.info(f"Removed stale site file '{path}'")
+        logging.info(
+            f"Site output: {self.written} written, {self.unchanged} unchanged, "
+            f"{self.removed} removed."
+        )
+        if not self.manifest_path:
+            return
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": SITE_MANIFEST_VERSION,
+                    "outdir": os.path.abspath(self.outdir),
+                    "files": self._current,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import shutil
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import docs_lib
+import build_cache
+
+try:
+    from PIL import Image, features
+except ImportError:  # optional dependency, thumbnails stay PNG
+    Image = features = None
+
+THUMBNAILS_DIR = "thumbnails"
+PREVIEWS_NAME = "previews.json"
+MANIFEST_VERSION = 1
+DEFAULT_THUMBNAIL_PPI = 36
+WEBP_QUALITY = 80
+PAGE_COUNT_REGEX = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)")
+
+
+@dataclass
+class DocumentPreview:
+    """What the document tables show next to a PDF, see `previews.json`."""
+
+    size: int
+    pages: Optional[int] = None
+    thumbnail: Optional[str] = None  # relative to the PDF output directory
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def page_count(pdf_path: str) -> Optional[int]:
+    """
+    Reads the page count of a PDF with `pdfinfo`, or from its page tree when
+    poppler is not installed (which fails on compressed object streams).
+    """
+    if shutil.which("pdfinfo") is not None:
+        proc = subprocess.run(
+            ["pdfinfo", pdf_path], capture_output=True, text=True, encoding="utf-8"
+        )
+        for line in proc.stdout.splitlines():
+            if line.startswith("Pages:"):
+                return int(line.split(":", 1)[1])
+    with open(pdf_path, "rb") as f:
+        counts = [int(n) for n in PAGE_COUNT_REGEX.findall(f.read())]
+    # The root of the page tree counts every page.
+    return max(counts) if counts else None
+
+
+def image_size(path: str) -> Tuple[Optional[int], Optional[int]]:
+    """Width and height of a PNG (read from its header) or, with Pillow, any image."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    if Image is not None:
+        try:
+            with Image.open(path) as image:
+                return image.size
+        except OSError:
+            pass
+    return None, None
+
+
+class Thumbnailer:
+    """
+    Renders the first page of each document as a small image next to its PDF
+    (`typst compile --format png --pages 1`, converted to WebP when Pillow is
+    installed) and reads its page count, in the compile worker pool.
+
+    Thumbnails are cached under `<cache_dir>/thumbnails/` by the build cache
+    key of the document, i.e. the same input hash as the PDF, so a restored
+    PDF gets its thumbnail and page count back without running typst.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        compile_command: Callable[[docs_lib.Document, str], List[str]],
+        ppi: int = DEFAULT_THUMBNAIL_PPI,
+    ):
+        self.compile_command = compile_command
+        self.cache_dir = Path(cache_dir) / THUMBNAILS_DIR
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.ppi = ppi
+        # Pillow can be built without libwebp.
+        webp = Image is not None and features.check("webp")
+        self.extension = ".webp" if webp else ".png"
+        self.entries: Dict[str, Dict] = {}
+        self.outputs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt thumbnail manifest: {e}")
+            return
+        if manifest.get("version") == MANIFEST_VERSION:
+            self.entries = manifest.get("entries", {})
+            self.outputs = manifest.get("outputs", {})
+
+    def save(self):
+        """Writes the manifest and drops thumbnails no longer referenced by it."""
+        live = set(self.outputs.values())
+        self.entries = {k: v for k, v in self.entries.items() if k in live}
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "entries": self.entries,
+            "outputs": self.outputs,
+        }
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        for obj in self.cache_dir.iterdir():
+            if obj.suffix in (".png", ".webp") and obj.stem not in live:
+                obj.unlink()
+
+    def retain(self, outputs: Iterable[str]):
+        """Forgets outputs of documents that no longer exist."""
+        keep = set(outputs)
+        self.outputs = {k: v for k, v in self.outputs.items() if k in keep}
+
+    def _key(self, build_key: str) -> str:
+        digest = hashlib.sha256(build_key.encode("utf-8"))
+        digest.update(f"\0ppi={self.ppi}\0{self.extension}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _render(self, doc: docs_lib.Document, target: str, workdir: str) -> bool:
+        """Renders the first page of `doc` to `target`; False if that failed."""
+        png_path = os.path.join(workdir, "page.png")
+        command = self.compile_command(doc, png_path) + [
+            "--format", "png", "--pages", "1", "--ppi", str(self.ppi)
+        ]
+        proc = subprocess.run(command, capture_output=True, text=True, encoding="utf-8")
+        if proc.returncode != 0 or not os.path.isfile(png_path):
+            logging.warning(
+                f"Could not render the thumbnail of '{doc.source}': {proc.stderr.strip()}"
+            )
+            return False
+        if self.extension == ".webp":
+            try:
+                with Image.open(png_path) as image:
+                    image.save(target, "WEBP", quality=WEBP_QUALITY, method=6)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not encode the thumbnail of '{doc.source}': {e}")
+                return False
+        else:
+            shutil.move(png_path, target)
+        return True
+
+    def thumbnail_name(self, doc: docs_lib.Document) -> str:
+        """'11-candidatura/interno/v.pdf' -> '11-candidatura/interno/v.webp'"""
+        return os.path.splitext(doc.output)[0] + self.extension
+
+    def process(
+        self,
+        doc: docs_lib.Document,
+        output_dir: str,
+        pdf_path: str,
+        build_key: Optional[str],
+    ) -> DocumentPreview:
+        """
+        Places the thumbnail of `doc` in `output_dir` and returns its preview;
+        without a `build_key` (build cache disabled) it is always rendered.
+        """
+        thumbnail_path = os.path.join(output_dir, self.thumbnail_name(doc))
+        key = self._key(build_key) if build_key else None
+        obj = self.cache_dir / f"{key}{self.extension}" if key else None
+        with self._lock:
+            entry = self.entries.get(key) if key else None
+            if key:
+                self.outputs[doc.output] = key
+
+        if entry is None or not obj.is_file():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.cache_dir) as workdir:
+                rendered = os.path.join(workdir, f"thumbnail{self.extension}")
+                ok = self._render(doc, rendered, workdir)
+                width, height = image_size(rendered) if ok else (None, None)
+                entry = {
+                    "pages": page_count(pdf_path),
+                    "thumbnail": ok,
+                    "width": width,
+                    "height": height,
+                }
+                if ok and obj is not None:
+                    tmp_obj = obj.with_name(f"{obj.name}.{threading.get_ident()}.tmp")
+                    shutil.copy2(rendered, tmp_obj)
+                    os.replace(tmp_obj, obj)
+                elif ok:
+                    build_cache.remove_output(thumbnail_path)
+                    shutil.move(rendered, thumbnail_path)
+                else:
+                    build_cache.remove_output(thumbnail_path)
+            # A failed render may be temporary: retry it on the next build.
+            if key and ok:
+                with self._lock:
+                    self.entries[key] = entry
+
+        if entry["thumbnail"] and obj is not None:
+            # Replace the directory entry: the thumbnail is a hardlink into the cache.
+            build_cache.remove_output(thumbnail_path)
+            try:
+                os.link(obj, thumbnail_path)
+            except OSError:
+                shutil.copy2(obj, thumbnail_path)
+
+        return DocumentPreview(
+            size=os.path.getsize(pdf_path),
+            pages=entry["pages"],
+            thumbnail=self.thumbnail_name(doc).replace(os.path.sep, "/")
+            if entry["thumbnail"]
+            else None,
+            width=entry["width"],
+            height=entry["height"],
+        )
+
+
+def load_previews(output_dir: str) -> Dict[str, DocumentPreview]:
+    """Reads `previews.json` from a PDF output directory; empty if missing."""
+    try:
+        with open(os.path.join(output_dir, PREVIEWS_NAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        logging.warning(f"Ignoring corrupt '{PREVIEWS_NAME}': {e}")
+        return {}
+    return {output: DocumentPreview(**preview) for output, preview in data.items()}
+
+
+def write_previews(
+    output_dir: str,
+    previews: Dict[str, DocumentPreview],
+    outputs: Iterable[str],
+):
+    """
+    Merges `previews` into `previews.json`, keeping the entries of documents
+    that were not rebuilt and dropping those whose output is not in `outputs`.
+    """
+    merged = load_previews(output_dir)
+    merged.update(previews)
+    outputs = set(outputs)
+    data = {
+        output: asdict(preview)
+        for output, preview in sorted(merged.items())
+        if output in outputs
+    }
+    path = os.path.join(output_dir, PREVIEWS_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
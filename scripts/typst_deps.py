@@ -0,0 +1,192 @@
+import os
+import re
+import logging
+import posixpath
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+# `#import "x.typ"`, `#import "x.typ": a, b`, `#import "x.typ" as y`, `#include "x.typ"`
+IMPORT_REGEX = re.compile(r'#(?:import|include)\s+"([^"]+)"')
+# `image("a.png")`, `read("a.txt")`, `yaml("a.yaml")`, ... with a literal path
+LOADER_CALL_REGEX = re.compile(
+    r'\b(?:image|read|yaml|json|toml|csv|xml)\(\s*"([^"]+)"'
+)
+# `yaml(sys.inputs.meta-path)`, resolved per document from its `--input` values
+INPUT_CALL_REGEX = re.compile(
+    r'\b(?:image|read|yaml|json|toml|csv|xml)\(\s*sys\.inputs\.([A-Za-z0-9_-]+)\s*\)'
+)
+BLOCK_COMMENT_REGEX = re.compile(r"/\*.*?\*/", re.DOTALL)
+LINE_COMMENT_REGEX = re.compile(r"^\s*//.*$", re.MULTILINE)
+
+# A reference is either ("path", "<root-relative path>") or ("input", "<input name>")
+Reference = Tuple[str, str]
+
+
+def _normalize(path: str) -> str:
+    """Returns a '/'-separated, normalized path."""
+    return posixpath.normpath(path.replace(os.path.sep, "/"))
+
+
+class DependencyGraph:
+    """
+    Dependency graph of Typst sources, resolved the way `typst compile --root`
+    resolves them: absolute paths against the project root, everything else
+    against the directory of the referencing file.
+
+    Each file is parsed at most once per graph, so templates shared by every
+    document are scanned a single time per run.
+    """
+
+    def __init__(self, root: str = ".", font_dirs: Iterable[str] = ()):
+        self.root = _normalize(root)
+        self.font_dirs = [_normalize(d) for d in font_dirs]
+        self._references: Dict[str, List[Reference]] = {}
+        self._closures: Dict[Tuple[str, FrozenSet], FrozenSet[str]] = {}
+        self._fonts: Optional[FrozenSet[str]] = None
+        self._documents: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, referrer: str, target: str) -> Optional[str]:
+        """Resolves a path literal found in `referrer`, relative to the root."""
+        if target.startswith("@"):
+            # Package imports (`@preview/...`) live outside the project.
+            return None
+        if target.startswith("/"):
+            resolved = _normalize(posixpath.join(self.root, target.lstrip("/")))
+        else:
+            resolved = _normalize(posixpath.join(posixpath.dirname(referrer), target))
+
+        if resolved == ".." or resolved.startswith("../"):
+            logging.warning(
+                f"Ignoring dependency outside the project root: '{target}' in '{referrer}'"
+            )
+            return None
+        return resolved
+
+    def references(self, path: str) -> List[Reference]:
+        """Parses the direct references of a single file (memoized)."""
+        with self._lock:
+            cached = self._references.get(path)
+        if cached is not None:
+            return cached
+
+        references: List[Reference] = []
+        if path.endswith(".typ"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                logging.warning(f"Dependency not found: '{path}'")
+                content = ""
+            content = BLOCK_COMMENT_REGEX.sub("", content)
+            content = LINE_COMMENT_REGEX.sub("", content)
+
+            for match in IMPORT_REGEX.finditer(content):
+                resolved = self._resolve(path, match.group(1))
+                if resolved:
+                    references.append(("path", resolved))
+            for match in LOADER_CALL_REGEX.finditer(content):
+                resolved = self._resolve(path, match.group(1))
+                if resolved:
+                    references.append(("path", resolved))
+            for match in INPUT_CALL_REGEX.finditer(content):
+                references.append(("input", match.group(1)))
+            logging.debug(f"Parsed {len(references)} references from '{path}'")
+
+        with self._lock:
+            self._references[path] = references
+        return references
+
+    def dependencies(
+        self, source: str, inputs: Optional[Dict[str, str]] = None
+    ) -> Set[str]:
+        """
+        Returns every file `source` transitively depends on (excluding itself
+        and fonts). `inputs` are the `--input` values passed to typst.
+        """
+        source = _normalize(source)
+        inputs = inputs or {}
+        key = (source, frozenset(inputs.items()))
+        with self._lock:
+            cached = self._closures.get(key)
+        if cached is not None:
+            return set(cached)
+
+        seen = {source}
+        stack = [source]
+        while stack:
+            current = stack.pop()
+            for kind, value in self.references(current):
+                if kind == "input":
+                    if value not in inputs:
+                        logging.warning(
+                            f"'{current}' reads undefined input 'sys.inputs.{value}'"
+                        )
+                        continue
+                    target = self._resolve(current, inputs[value])
+                    if not target:
+                        continue
+                else:
+                    target = value
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+
+        seen.discard(source)
+        with self._lock:
+            self._closures[key] = frozenset(seen)
+        return seen
+
+    def fonts(self) -> Set[str]:
+        """Returns the font files made available through `--font-path`."""
+        if self._fonts is None:
+            fonts = set()
+            for font_dir in self.font_dirs:
+                for root, _, files in os.walk(font_dir):
+                    for name in files:
+                        if name.lower().endswith((".ttf", ".otf", ".ttc", ".otc")):
+                            fonts.add(_normalize(os.path.join(root, name)))
+            self._fonts = frozenset(fonts)
+        return set(self._fonts)
+
+    def invalidate(self, paths: Iterable[str]):
+        """Forgets the parsed references of changed files and every cached closure."""
+        with self._lock:
+            for path in paths:
+                self._references.pop(_normalize(path), None)
+            self._closures.clear()
+            self._fonts = None
+
+    def remove_document(self, source: str):
+        """Unregisters a document, e.g. after its directory was deleted."""
+        with self._lock:
+            self._documents.pop(_normalize(source), None)
+
+    def add_document(self, source: str, dependencies: Iterable[str]):
+        """Registers a document and its dependencies for reverse lookups."""
+        with self._lock:
+            self._documents[_normalize(source)] = set(dependencies)
+
+    def forward_index(self) -> Dict[str, Set[str]]:
+        """Maps every registered document source to the files it depends on."""
+        with self._lock:
+            return {source: set(deps) for source, deps in self._documents.items()}
+
+    def reverse_index(self, include_fonts: bool = True) -> Dict[str, Set[str]]:
+        """Maps every file to the registered document sources affected by it."""
+        index: Dict[str, Set[str]] = defaultdict(set)
+        fonts = self.fonts() if include_fonts else set()
+        for source, deps in self.forward_index().items():
+            index[source].add(source)
+            for dep in deps | fonts:
+                index[dep].add(source)
+        return dict(index)
+
+    def affected_documents(self, changed_files: Iterable[str]) -> Set[str]:
+        """Returns the registered document sources affected by any of `changed_files`."""
+        index = self.reverse_index()
+        affected = set()
+        for path in changed_files:
+            affected |= index.get(_normalize(path), set())
+        return affected
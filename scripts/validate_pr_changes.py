@@ -1,11 +1,33 @@
 import sys
+import re
 import logging
 import json
 import argparse
-from dataclasses import asdict, is_dataclass
-from typing import List, Dict, Set
+import yaml
+from typing import List, Dict, Optional, Set
 import os
-from docs_lib import discover_documents
+from docs_lib import (
+    discover_documents,
+    save_model,
+    TEMPLATES_DIR,
+    profiler,
+    add_profile_argument,
+    setup_profiling,
+    add_discovery_arguments,
+    load_document_model,
+    read_changed_files,
+    changed_files_since,
+    merge_base,
+    GitFileLoader,
+    YamlMetadataLoader,
+    Document,
+)
+from typst_deps import DependencyGraph
+
+# docs/<group>/<subgroup>/<name>/<name>.typ or .meta.yaml
+DOCUMENT_FILE_REGEX = re.compile(
+    r"^(docs/[^/]+/[^/]+/([^/]+))/\2\.(typ|meta\.yaml)$"
+)
 
 
 def setup_logging():
@@ -18,17 +40,7 @@ def setup_logging():
     )
 
 
-class DocumentEncoder(json.JSONEncoder):
-    """Custom JSON encoder to handle dataclasses and sets."""
-
-    def default(self, obj):
-        if is_dataclass(obj):
-            return asdict(obj)
-        if isinstance(obj, Set):
-            return sorted(list(obj))
-        return super().default(obj)
-
-
+@profiler.profiled("generate_model", "validate")
 def generate_model(output_path: str):
     """
     Discovers all documents from the local filesystem and saves the
@@ -39,8 +51,7 @@ def generate_model(output_path: str):
         documents = discover_documents("docs")
         logging.info(f"Found {len(documents)} documents.")
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(documents, f, cls=DocumentEncoder, indent=2)
+        save_model(documents, output_path)
 
         logging.info(f"Successfully generated document model at '{output_path}'")
 
@@ -49,6 +60,62 @@ def generate_model(output_path: str):
         sys.exit(1)
 
 
+def check_version_bump(
+    key: str,
+    doc_title: str,
+    content_has_changed: bool,
+    base_version: int,
+    pr_version: int,
+    validation_errors: List[str],
+):
+    """
+    Applies the versioning rule to one document present on both sides: a
+    content change needs a bump of exactly 1, no content change needs none.
+    """
+    version_has_changed = pr_version != base_version
+    if content_has_changed:
+        logging.info(f"[*] Content changed for: {doc_title}")
+        if not version_has_changed:
+            err = (
+                f"FAIL: '{doc_title}' ({key}) was modified, "
+                f"but its version was not bumped. (Is v{base_version})"
+            )
+            validation_errors.append(err)
+        elif pr_version != base_version + 1:
+            err = (
+                f"FAIL: '{doc_title}' ({key}) version must be incremented by "
+                f"exactly 1. (Base: v{base_version}, PR: v{pr_version})"
+            )
+            validation_errors.append(err)
+        else:
+            logging.info(
+                f"    OK: Version correctly bumped: v{base_version} -> v{pr_version}"
+            )
+
+    else:
+        logging.debug(f"[ ] No content change for: {doc_title}")
+        if version_has_changed:
+            err = (
+                f"FAIL: '{doc_title}' ({key}) had no content changes, "
+                f"but its version was bumped. (Base: v{base_version}, PR: v{pr_version})"
+            )
+            validation_errors.append(err)
+
+
+def report_validation(validation_errors: List[str]):
+    """Logs the outcome and exits with status 1 if any rule failed."""
+    if validation_errors:
+        logging.error("\n" + "=" * 30 + " VALIDATION FAILED " + "=" * 30)
+        for err in validation_errors:
+            logging.error(f"  - {err}")
+        logging.error("=" * 80)
+        sys.exit(1)
+    else:
+        logging.info("\n" + "=" * 30 + " VALIDATION SUCCESSFUL " + "=" * 30)
+        logging.info("All document versioning rules passed.")
+
+
+@profiler.profiled("compare_models", "validate")
 def compare_models(base_json_path: str, pr_json_path: str, changed_files_path: str):
     """
     Loads two document models and a list of changed files, then
@@ -81,67 +148,182 @@ def compare_models(base_json_path: str, pr_json_path: str, changed_files_path: s
     validation_errors = []
 
     for key in added_docs:
-        logging.info(f"[+] Document Added: {pr_map[key]['title']} ({key})")
+        logging.info(f"[+] Document Added: {pr_map[key]['metadata']['title']} ({key})")
 
     for key in removed_docs:
-        logging.warning(f"[!] Document Removed: {base_map[key]['title']} ({key})")
+        logging.warning(
+            f"[!] Document Removed: {base_map[key]['metadata']['title']} ({key})"
+        )
 
     logging.info("\nChecking common documents for modifications...")
     for key in common_docs:
         base_doc = base_map[key]
         pr_doc = pr_map[key]
 
-        all_doc_files = {pr_doc["source"]} | set(pr_doc["subfiles"])
+        # Shared templates are dependencies of many documents; editing them
+        # does not require bumping every document that imports them.
+        all_doc_files = {pr_doc["source"]} | {
+            f for f in pr_doc["subfiles"] if not f.startswith(TEMPLATES_DIR + "/")
+        }
 
         content_has_changed = any(f in changed_files for f in all_doc_files)
 
         base_version = base_doc["latest_version"]
         pr_version = pr_doc["latest_version"]
-        version_has_changed = pr_version != base_version
 
         doc_title = pr_doc["metadata"]["title"]
 
-        if content_has_changed:
-            logging.info(f"[*] Content changed for: {doc_title}")
-            if not version_has_changed:
-                err = (
-                    f"FAIL: '{doc_title}' ({key}) was modified, "
-                    f"but its version was not bumped. (Is v{base_version})"
-                )
-                validation_errors.append(err)
-            elif pr_version != base_version + 1:
-                err = (
-                    f"FAIL: '{doc_title}' ({key}) version must be incremented by "
-                    f"exactly 1. (Base: v{base_version}, PR: v{pr_version})"
-                )
-                validation_errors.append(err)
-            else:
-                logging.info(
-                    f"    OK: Version correctly bumped: v{base_version} -> v{pr_version}"
-                )
+        check_version_bump(
+            key, doc_title, content_has_changed, base_version, pr_version, validation_errors
+        )
+
+    report_validation(validation_errors)
+
+
+def _is_template(path: str) -> bool:
+    return path.startswith(TEMPLATES_DIR + "/")
+
+
+def _base_versions(
+    loader: GitFileLoader, meta_paths: List[str]
+) -> Dict[str, Optional[Dict]]:
+    """Reads the given metadata files from the base commit; None if absent there."""
+    yaml_loader = YamlMetadataLoader(file_loader=loader)
+    metadata = {}
+    for meta_path, content in loader.get_many(meta_paths).items():
+        if content is None:
+            metadata[meta_path] = None
+            continue
+        try:
+            parsed = yaml_loader.parse(content) or None
+        except yaml.YAMLError as e:
+            logging.warning(f"Could not parse '{meta_path}' at the base commit: {e}")
+            parsed = None
+        if parsed is not None and not isinstance(parsed, dict):
+            logging.warning(f"'{meta_path}' at the base commit is not a mapping.")
+            parsed = None
+        metadata[meta_path] = parsed
+    return metadata
+
+
+def _latest_version(metadata: Dict) -> Optional[int]:
+    """The version of the newest changelog entry; None if it is malformed."""
+    changelog = metadata.get("changelog")
+    if not isinstance(changelog, list) or not changelog:
+        return None
+    latest = changelog[0]
+    version = latest.get("version") if isinstance(latest, dict) else None
+    return version if isinstance(version, int) else None
+
+
+@profiler.profiled("validate_changes", "validate")
+def validate_changes(args: argparse.Namespace):
+    """
+    Validates versioning rules against `args.base` without a second checkout:
+    only the metadata of documents touched by the changed files is read from
+    the base commit's git objects.
+    """
+    graph = DependencyGraph()
+    documents = load_document_model(args, graph)
+    logging.info(f"Found {len(documents)} documents.")
+    if args.output:
+        save_model(documents, args.output)
+        logging.info(f"Saved the PR document model to '{args.output}'")
+
+    if args.changed_files:
+        changed_files = read_changed_files(args.changed_files)
+    else:
+        changed_files = changed_files_since(args.base)
+    report_validation(check_changes(documents, graph, changed_files, args.base))
 
-        else:
-            logging.debug(f"[ ] No content change for: {doc_title}")
-            if version_has_changed:
-                err = (
-                    f"FAIL: '{doc_title}' ({key}) had no content changes, "
-                    f"but its version was bumped. (Base: v{base_version}, PR: v{pr_version})"
-                )
-                validation_errors.append(err)
 
-    if validation_errors:
-        logging.error("\n" + "=" * 30 + " VALIDATION FAILED " + "=" * 30)
-        for err in validation_errors:
-            logging.error(f"  - {err}")
-        logging.error("=" * 80)
-        sys.exit(1)
-    else:
-        logging.info("\n" + "=" * 30 + " VALIDATION SUCCESSFUL " + "=" * 30)
-        logging.info("All document versioning rules passed.")
+def check_changes(
+    documents: List[Document],
+    graph: DependencyGraph,
+    changed_files: Set[str],
+    base: str,
+) -> List[str]:
+    """
+    Checks the versioning rules of the documents affected by `changed_files`
+    against the merge base with `base`; returns the validation errors.
+    `graph` must hold the dependencies of `documents`.
+    """
+    base_commit = merge_base(base)
+    logging.info(
+        f"Validating {len(changed_files)} changed files against {base_commit[:12]} "
+        f"('{base}')..."
+    )
+
+    pr_map = {doc.source: doc for doc in documents}
+    # file -> documents importing it, built once; attribution is then a lookup
+    # per changed file instead of a scan of every document.
+    reverse_index = graph.reverse_index(include_fonts=False)
+
+    own_changes: Set[str] = set()
+    template_changes: Dict[str, Set[str]] = {}
+    candidates: Dict[str, str] = {}  # source -> meta path
+    for path in changed_files:
+        for source in reverse_index.get(path, ()):
+            doc = pr_map[source]
+            candidates[source] = doc.meta_path
+            if path == doc.meta_path:
+                continue
+            if _is_template(path):
+                template_changes.setdefault(source, set()).add(path)
+            else:
+                own_changes.add(source)
+        # Documents deleted by the PR are no longer in the graph.
+        match = DOCUMENT_FILE_REGEX.match(path)
+        if match:
+            doc_dir, name = match.group(1), match.group(2)
+            candidates.setdefault(f"{doc_dir}/{name}.typ", f"{doc_dir}/{name}.meta.yaml")
+
+    loader = GitFileLoader(base_commit)
+    try:
+        base_metadata = _base_versions(loader, sorted(set(candidates.values())))
+    finally:
+        loader.close()
+
+    validation_errors = []
+    logging.info(f"\nChecking {len(candidates)} affected documents...")
+    for key in sorted(candidates):
+        base_meta = base_metadata[candidates[key]]
+        pr_doc = pr_map.get(key)
+        if pr_doc is None:
+            if base_meta is not None:
+                title = base_meta.get("title", key)
+                logging.warning(f"[!] Document Removed: {title} ({key})")
+            continue
+        if base_meta is None or not base_meta.get("changelog"):
+            logging.info(f"[+] Document Added: {pr_doc.title} ({key})")
+            continue
+
+        doc_title = pr_doc.title
+        base_version = _latest_version(base_meta)
+        if base_version is None:
+            validation_errors.append(
+                f"FAIL: '{doc_title}' ({key}) has no valid changelog version "
+                f"at the base commit."
+            )
+            continue
+        if key not in own_changes and key in template_changes:
+            templates = ", ".join(sorted(template_changes[key]))
+            logging.info(f"[~] Affected by shared template changes ({templates}): {doc_title}")
+        check_version_bump(
+            key,
+            doc_title,
+            key in own_changes,
+            base_version,
+            pr_doc.latest_version,
+            validation_errors,
+        )
+    return validation_errors
 
 
 def main():
+    setup_logging()
     parser = argparse.ArgumentParser(description="Generate or compare document models.")
+    add_profile_argument(parser)
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     gen_parser = subparsers.add_parser(
@@ -164,12 +346,34 @@ def main():
         "changed_files", help="A text file listing all changed files."
     )
 
+    val_parser = subparsers.add_parser(
+        "validate",
+        help="Validate the working tree against a base ref, reading the base "
+        "metadata from git objects.",
+    )
+    val_parser.add_argument(
+        "--base",
+        default="origin/main",
+        help="Base branch or commit; its merge base with HEAD is used. (default: origin/main)",
+    )
+    val_parser.add_argument(
+        "--changed-files",
+        help="A text file listing all changed files (default: diff against the merge base).",
+    )
+    val_parser.add_argument(
+        "--output", help="Also save the PR document model to this JSON file."
+    )
+    add_discovery_arguments(val_parser)
+
     args = parser.parse_args()
+    setup_profiling(args)
 
     if args.command == "generate":
         generate_model(args.output)
     elif args.command == "compare":
         compare_models(args.base_file, args.pr_file, args.changed_files)
+    elif args.command == "validate":
+        validate_changes(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,351 @@
+import os
+import re
+import time
+import queue
+import logging
+import threading
+import subprocess
+from pathlib import PurePosixPath
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import docs_lib
+import build_docs
+import generate_site
+from site_writer import SiteWriter
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency, fall back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+DEBOUNCE_SECONDS = 0.05
+ANSI_ESCAPE_REGEX = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]|\x1bc")
+
+
+def _normalize(path: str) -> str:
+    """Returns `path` relative to the working directory, '/'-separated."""
+    return os.path.relpath(path).replace(os.path.sep, "/")
+
+
+class PollingWatcher(threading.Thread):
+    """Detects changes by comparing (mtime, size) snapshots of the watched trees."""
+
+    def __init__(
+        self, roots: Iterable[str], changes: "queue.Queue[str]", interval: float
+    ):
+        super().__init__(daemon=True)
+        self.roots = list(roots)
+        self.changes = changes
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for root in self.roots:
+            for dirpath, _, files in os.walk(root):
+                for name in files:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[_normalize(path)] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def run(self):
+        previous = self._snapshot()
+        while not self._stop_event.wait(self.interval):
+            current = self._snapshot()
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self.changes.put(path)
+            previous = current
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class _QueueEventHandler(FileSystemEventHandler):
+    """Forwards watchdog (inotify on Linux) events into the change queue."""
+
+    def __init__(self, changes: "queue.Queue[str]"):
+        super().__init__()
+        self.changes = changes
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        self.changes.put(_normalize(event.src_path))
+        dest_path = getattr(event, "dest_path", "")
+        if dest_path:
+            self.changes.put(_normalize(dest_path))
+
+
+class TypstWatchPool:
+    """
+    Keeps one long-lived `typst watch` process per open document, so fonts
+    and templates stay loaded and each save only recompiles what changed.
+    """
+
+    def __init__(self, output_dir: str, max_processes: int):
+        self.output_dir = output_dir
+        self.max_processes = max_processes
+        self._processes: "OrderedDict[str, subprocess.Popen]" = OrderedDict()
+
+    def ensure(self, doc: docs_lib.Document):
+        """Starts watching `doc` unless it is already watched."""
+        proc = self._processes.get(doc.source)
+        if proc is not None and proc.poll() is None:
+            self._processes.move_to_end(doc.source)
+            return
+        if proc is not None:
+            logging.warning(f"typst watch for '{doc.source}' exited, restarting.")
+
+        while len(self._processes) >= self.max_processes:
+            oldest, _ = next(iter(self._processes.items()))
+            logging.info(f"Closing least recently edited document '{oldest}'")
+            self.stop(oldest)
+
+        output_path = os.path.join(self.output_dir, doc.output)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        command = build_docs.typst_command("watch", doc, output_path)
+        logging.info(f"Opening '{doc.title}': {doc.source} -> {output_path}")
+        logging.debug(f"Executing: {' '.join(command)}")
+        try:
+            proc = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+            )
+        except FileNotFoundError:
+            logging.critical("Typst command not found. Is it installed and in your PATH?")
+            raise SystemExit(1)
+        self._processes[doc.source] = proc
+        threading.Thread(
+            target=self._relay_output, args=(doc.source, proc), daemon=True
+        ).start()
+
+    @staticmethod
+    def _relay_output(source: str, proc: subprocess.Popen):
+        name = PurePosixPath(source).stem
+        for line in proc.stdout:
+            line = ANSI_ESCAPE_REGEX.sub("", line).strip()
+            if line:
+                logging.info(f"[{name}] {line}")
+
+    def stop(self, source: str):
+        proc = self._processes.pop(source, None)
+        if proc is None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def restart(self, doc: docs_lib.Document):
+        """Restarts the `typst watch` of `doc`, e.g. to reload its fonts."""
+        logging.info(f"Restarting '{doc.source}'")
+        self.stop(doc.source)
+        self.ensure(doc)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._processes
+
+    def __iter__(self):
+        return iter(list(self._processes))
+
+    def stop_all(self):
+        for source in list(self._processes):
+            self.stop(source)
+
+
+class DocsWatcher:
+    """In-memory document model that is updated incrementally from file changes."""
+
+    def __init__(
+        self, output_dir: str, site_dir: str, site_outdir: str, max_processes: int
+    ):
+        self.output_dir = output_dir
+        self.site_dir = site_dir
+        self.site_outdir = site_outdir
+        self.graph = docs_lib.new_dependency_graph()
+        self.documents: Dict[str, docs_lib.Document] = {}
+        self.pool = TypstWatchPool(output_dir, max_processes)
+        self.writer = SiteWriter(site_outdir, manifest_path=None)
+
+    def load(self):
+        for doc in docs_lib.discover_documents(graph=self.graph):
+            self.documents[doc.source] = doc
+        logging.info(f"Watching {len(self.documents)} documents.")
+
+    def _model(self) -> List[docs_lib.Document]:
+        return [self.documents[k] for k in sorted(self.documents)]
+
+    @staticmethod
+    def _document_dir(path: str) -> Optional[str]:
+        """Returns the document directory containing `path`, if any."""
+        parts = PurePosixPath(path).parts
+        if len(parts) < 4 or parts[0] != "docs" or parts[1] == "00-templates":
+            return None
+        return "/".join(parts[:4])
+
+    def _refresh_document_dirs(self, doc_dirs: Set[str]) -> Set[str]:
+        """Reloads changed document directories; returns the affected sources."""
+        refreshed = set()
+        for doc_dir in sorted(doc_dirs):
+            name = PurePosixPath(doc_dir).name
+            source = f"{doc_dir}/{name}.typ"
+            doc = None
+            if os.path.isdir(doc_dir):
+                doc = docs_lib.load_document(doc_dir, self.graph)
+            if doc is None:
+                if self.documents.pop(source, None) is not None:
+                    logging.warning(f"Document '{source}' is no longer valid, closing it.")
+                    self.graph.remove_document(source)
+                    self.pool.stop(source)
+                    refreshed.add(source)
+                continue
+            self.documents[doc.source] = doc
+            refreshed.add(doc.source)
+        return refreshed
+
+    def _regenerate_site(self, pages: Set[str], assets: Set[str]):
+        """Rewrites the given group pages (by group dir name, or "*" for all) and assets."""
+        for path in sorted(assets):
+            relative = os.path.relpath(path, self.site_dir)
+            dest = os.path.join(self.site_outdir, relative)
+            if os.path.isfile(path):
+                self.writer.copy_file(path, dest)
+                logging.info(f"Copied site asset '{path}'")
+            elif os.path.isfile(dest):
+                os.unlink(dest)
+
+        if not pages:
+            return
+        model = self._model()
+        index = generate_site.build_document_index(model)
+        all_groups = generate_site.site_groups(index)
+        generate_site.generate_group_cards(
+            model,
+            template_path=os.path.join(self.site_dir, "index.template.html"),
+            output_path=os.path.join(self.site_outdir, "index.html"),
+            writer=self.writer,
+            groups=all_groups,
+        )
+        groups = set(all_groups) if "*" in pages else pages
+        template = generate_site.PageTemplate.load(
+            os.path.join(self.site_dir, "template_document.html")
+        )
+        generate_site.render_group_pages(
+            index, sorted(groups), template, self.writer, "docs"
+        )
+
+    def render_site(self):
+        """Renders the whole site once, at startup."""
+        os.makedirs(self.site_outdir, exist_ok=True)
+        generate_site.copy_static_assets(self.site_dir, self.writer)
+        self._regenerate_site({"*"}, set())
+
+    def handle(self, changed: Set[str]):
+        """Reacts to one debounced batch of changed paths."""
+        start = time.perf_counter()
+        self.graph.invalidate(changed)
+
+        known = set(self.documents)
+        doc_dirs = {d for d in map(self._document_dir, changed) if d}
+        refreshed = self._refresh_document_dirs(doc_dirs)
+        affected = refreshed | self.graph.affected_documents(changed)
+
+        # Edited documents are (re)opened. A template change needs nothing
+        # more: `typst watch` follows its own dependencies, and opening every
+        # importer would churn the pool. Fonts are only loaded when `typst
+        # watch` starts, so a font change restarts every open document.
+        font_prefix = docs_lib.FONT_PATH.rstrip("/") + "/"
+        if any(path.startswith(font_prefix) for path in changed):
+            for source in self.pool:
+                doc = self.documents.get(source)
+                if doc is not None:
+                    self.pool.restart(doc)
+        for source in sorted(affected):
+            doc = self.documents.get(source)
+            if doc is not None and (source in refreshed or source in self.pool):
+                self.pool.ensure(doc)
+
+        # Group pages only show metadata, so they are re-rendered when a
+        # document appears, disappears or has its .meta.yaml edited.
+        pages: Set[str] = set()
+        for source in refreshed:
+            doc = self.documents.get(source)
+            if doc is None:
+                pages.add("*")
+            elif source not in known or doc.meta_path in changed:
+                pages.add(doc.group)
+
+        assets: Set[str] = set()
+        site_prefix = self.site_dir.rstrip("/") + "/"
+        for path in changed:
+            if not path.startswith(site_prefix):
+                continue
+            if path.endswith(".template.html") or path.endswith("template_document.html"):
+                pages.add("*")
+            else:
+                assets.add(path)
+        self._regenerate_site(pages, assets)
+
+        logging.debug(
+            f"Handled {len(changed)} changes in {time.perf_counter() - start:.3f}s"
+        )
+
+    def close(self):
+        self.pool.stop_all()
+
+
+def run(args):
+    """Entry point of `build_docs.py watch`."""
+    watcher = DocsWatcher(args.outdir, args.site_dir, args.site_outdir, args.max_open)
+    watcher.load()
+    watcher.render_site()
+
+    for path in args.open:
+        source = _normalize(path)
+        doc = watcher.documents.get(source)
+        if doc is None:
+            logging.error(f"Not a known document source: '{path}'")
+            continue
+        watcher.pool.ensure(doc)
+
+    changes: "queue.Queue[str]" = queue.Queue()
+    roots = ["docs", args.site_dir]
+    if Observer is not None and not args.poll:
+        observer = Observer()
+        handler = _QueueEventHandler(changes)
+        for root in roots:
+            observer.schedule(handler, root, recursive=True)
+        observer.start()
+        logging.info("Watching for changes with native file system events...")
+    else:
+        observer = PollingWatcher(roots, changes, args.poll_interval)
+        observer.start()
+        logging.info(f"Watching for changes by polling every {args.poll_interval}s...")
+
+    try:
+        while True:
+            batch = {changes.get()}
+            time.sleep(DEBOUNCE_SECONDS)
+            while not changes.empty():
+                batch.add(changes.get_nowait())
+            batch = {p for p in batch if not os.path.basename(p).startswith(".")}
+            if batch:
+                watcher.handle(batch)
+    except KeyboardInterrupt:
+        logging.info("Stopping watch mode...")
+    finally:
+        observer.stop()
+        watcher.close()
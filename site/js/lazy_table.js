@@ -0,0 +1,150 @@
+// Caricamento progressivo delle tabelle dei gruppi generate con --lazy-tables.
+// La pagina contiene solo le prime righe; le altre arrivano da un file JSON
+// e vengono aggiunte a blocchi durante lo scorrimento. Ricerca e ordinamento
+// lavorano sulle righe del DOM, quindi prima di usarli si aggiungono tutte.
+
+const CHUNK_SIZE = 100;
+
+// Stesso markup di title_cell_content() in scripts/generate_site.py.
+function titleCell(td, title, thumbnail, details, width, height) {
+  if (details === undefined) {
+    td.textContent = title;
+    return;
+  }
+  const wrapper = document.createElement("div");
+  wrapper.className = "doc-title";
+  if (thumbnail) {
+    const img = document.createElement("img");
+    img.className = "doc-thumb";
+    img.src = thumbnail;
+    img.alt = "";
+    img.loading = "lazy";
+    img.decoding = "async";
+    if (width && height) {
+      img.width = width;
+      img.height = height;
+    }
+    wrapper.appendChild(img);
+  }
+  const text = document.createElement("div");
+  const name = document.createElement("span");
+  name.textContent = title;
+  const info = document.createElement("span");
+  info.className = "doc-details";
+  info.textContent = details;
+  text.append(name, info);
+  wrapper.appendChild(text);
+  td.appendChild(wrapper);
+}
+
+// Stesso markup di compact_table_row() in scripts/generate_site.py.
+function rowElement([title, version, type, date, link, ...preview]) {
+  const tr = document.createElement("tr");
+  const titleTd = document.createElement("td");
+  titleCell(titleTd, title, ...preview);
+  tr.appendChild(titleTd);
+  for (const text of [`v${version}`, type, date]) {
+    const td = document.createElement("td");
+    td.textContent = text;
+    tr.appendChild(td);
+  }
+  const actions = document.createElement("td");
+  actions.id = "download-td";
+  actions.innerHTML =
+    '<a target="_blank" rel="noopener noreferrer" class="preview-link">' +
+    '<span class="icon" data-icon="visibility"></span><span>Preview</span></a>' +
+    '<a class="btn-download" download>' +
+    '<span class="icon" data-icon="download"></span>Download</a>';
+  for (const a of actions.querySelectorAll("a")) a.href = link;
+  tr.appendChild(actions);
+  return tr;
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  const marker = document.getElementById("lazyTable");
+  const table = document.getElementById("doc-table");
+  if (!marker || !table) return;
+  const tbody = table.querySelector("tbody");
+  const thead = table.querySelector("thead");
+  const searchInput = document.getElementById("searchInput");
+
+  let rows = null;
+  let next = 0;
+  let loading = null;
+
+  const load = () => {
+    if (loading === null) {
+      loading = fetch(marker.dataset.shard)
+        .then((response) => response.json())
+        .then((data) => {
+          rows = data;
+        })
+        .catch((error) => {
+          loading = null;
+          throw error;
+        });
+    }
+    return loading;
+  };
+
+  const append = (count) => {
+    const end = Math.min(rows.length, next + count);
+    const fragment = document.createDocumentFragment();
+    for (; next < end; next++) fragment.appendChild(rowElement(rows[next]));
+    tbody.appendChild(fragment);
+    if (next >= rows.length) observer.disconnect();
+  };
+  const complete = () => rows !== null && next >= rows.length;
+
+  // Aggiunge il blocco successivo quando la fine della tabella è visibile.
+  const observer = new IntersectionObserver(
+    async (entries) => {
+      if (!entries.some((entry) => entry.isIntersecting)) return;
+      await load();
+      append(CHUNK_SIZE);
+    },
+    { rootMargin: "800px 0px" }
+  );
+  marker.hidden = false;
+  observer.observe(marker);
+
+  // Ricerca: servono tutte le righe, poi il filtro originale viene rieseguito.
+  if (searchInput) {
+    document.addEventListener(
+      "keyup",
+      (event) => {
+        if (event.target !== searchInput || complete()) return;
+        if (rows !== null) {
+          append(rows.length);
+        } else {
+          load().then(() => {
+            append(rows.length);
+            searchInput.dispatchEvent(new Event("keyup"));
+          });
+        }
+      },
+      true
+    );
+    searchInput.addEventListener("focus", load, { once: true });
+  }
+
+  // Ordinamento: il click viene rimandato finché tutte le righe sono presenti.
+  if (thead) {
+    thead.addEventListener(
+      "click",
+      (event) => {
+        if (complete()) return;
+        if (rows !== null) {
+          append(rows.length);
+          return;
+        }
+        event.stopPropagation();
+        load().then(() => {
+          append(rows.length);
+          event.target.click();
+        });
+      },
+      true
+    );
+  }
+});
@@ -0,0 +1,123 @@
+// Ricerca lato client sull'indice generato da generate_site.py.
+// L'indice viene scaricato solo al primo utilizzo della barra di ricerca.
+
+const MIN_TOKEN_LENGTH = 2;
+const MAX_RESULTS = 20;
+
+// Deve corrispondere a search_index.tokenize() in scripts/search_index.py.
+export function tokenize(text) {
+  return text
+    .normalize("NFKD")
+    .replace(/[\u0300-\u036f]/g, "")
+    .toLowerCase()
+    .split(/[^\p{L}\p{N}]+/u)
+    .filter((token) => token.length >= MIN_TOKEN_LENGTH);
+}
+
+function lowerBound(terms, prefix) {
+  let lo = 0;
+  let hi = terms.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (terms[mid] < prefix) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Punteggi dei documenti i cui termini iniziano con `token`;
+// le corrispondenze esatte valgono il doppio.
+function tokenScores(index, token) {
+  const scores = new Map();
+  for (let i = lowerBound(index.terms, token); i < index.terms.length; i++) {
+    const term = index.terms[i];
+    if (!term.startsWith(token)) break;
+    const boost = term === token ? 2 : 1;
+    const postings = index.postings[i];
+    for (let j = 0; j < postings.length; j += 2) {
+      const score = postings[j + 1] * boost;
+      if ((scores.get(postings[j]) || 0) < score) scores.set(postings[j], score);
+    }
+  }
+  return scores;
+}
+
+// Restituisce i documenti migliori che contengono tutti i termini di `query`.
+export function search(index, query, limit = MAX_RESULTS) {
+  const tokens = [...new Set(tokenize(query))];
+  if (tokens.length === 0) return [];
+  let total = null;
+  for (const token of tokens) {
+    const scores = tokenScores(index, token);
+    if (total === null) {
+      total = scores;
+    } else {
+      for (const [doc, score] of total) {
+        if (scores.has(doc)) total.set(doc, score + scores.get(doc));
+        else total.delete(doc);
+      }
+    }
+    if (total.size === 0) return [];
+  }
+  return [...total]
+    .sort((a, b) => b[1] - a[1] || (index.docs[b[0]][5] > index.docs[a[0]][5] ? 1 : -1))
+    .slice(0, limit)
+    .map(([doc]) => index.docs[doc]);
+}
+
+function renderResults(container, results, query) {
+  container.replaceChildren();
+  if (query.trim() === "") {
+    container.hidden = true;
+    return;
+  }
+  container.hidden = false;
+  if (results.length === 0) {
+    const empty = document.createElement("p");
+    empty.className = "search-empty";
+    empty.textContent = "Nessun documento trovato.";
+    container.appendChild(empty);
+    return;
+  }
+  for (const [title, url, group, subgroup, version, date] of results) {
+    const link = document.createElement("a");
+    link.className = "search-result";
+    link.href = url;
+    link.target = "_blank";
+    link.rel = "noopener noreferrer";
+    const name = document.createElement("span");
+    name.className = "search-result-title";
+    name.textContent = title;
+    const details = document.createElement("span");
+    details.className = "search-result-details";
+    details.textContent = `${group} · ${subgroup} · v${version} · ${date}`;
+    link.append(name, details);
+    container.appendChild(link);
+  }
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  const input = document.getElementById("globalSearchInput");
+  const container = document.getElementById("globalSearchResults");
+  if (!input || !container) return;
+
+  let indexPromise = null;
+  const loadIndex = () => {
+    if (indexPromise === null) {
+      indexPromise = fetch(input.dataset.index)
+        .then((response) => response.json())
+        .catch((error) => {
+          indexPromise = null;
+          throw error;
+        });
+    }
+    return indexPromise;
+  };
+
+  input.addEventListener("focus", loadIndex, { once: true });
+  input.addEventListener("input", async () => {
+    const query = input.value;
+    const index = await loadIndex();
+    if (input.value === query) renderResults(container, search(index, query), query);
+  });
+});
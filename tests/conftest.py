@@ -0,0 +1,56 @@
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+from corpus import CorpusSpec, generate_corpus, install_stub_typst  # noqa: E402
+
+# One document per subgroup: base_verbale.typ for interno and esterno,
+# base_ddb.typ for slides.
+SMALL_CORPUS = CorpusSpec(groups=1, docs_per_subgroup=1, changelog_length=2)
+
+
+@pytest.fixture
+def corpus(tmp_path: Path, monkeypatch) -> Path:
+    """A small synthetic repository, made the working directory."""
+    root = generate_corpus(tmp_path / "repo", SMALL_CORPUS)
+    monkeypatch.chdir(root)
+    return root
+
+
+@pytest.fixture
+def stub_typst(tmp_path: Path, monkeypatch) -> Path:
+    """Puts the benchmark stub `typst` first on PATH."""
+    stub = install_stub_typst(tmp_path / "bin")
+    monkeypatch.setenv("PATH", f"{stub.parent}{os.pathsep}{os.environ['PATH']}")
+    return stub
+
+
+def git(*args: str):
+    subprocess.run(
+        [
+            "git",
+            "-c", "user.name=tests",
+            "-c", "user.email=tests@example.com",
+            "-c", "commit.gpgsign=false",
+            *args,
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def git_corpus(corpus: Path) -> Path:
+    """The small corpus committed on `main`, with HEAD on a `pr` branch."""
+    git("init", "-q", "-b", "main")
+    git("add", "-A")
+    git("commit", "-q", "-m", "base")
+    git("checkout", "-q", "-b", "pr")
+    return corpus
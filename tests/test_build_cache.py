@@ -0,0 +1,147 @@
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+import docs_lib
+from build_cache import BuildCache
+from typst_deps import DependencyGraph
+
+TEMPLATES = "docs/00-templates"
+
+
+def discover() -> Tuple[List[docs_lib.Document], DependencyGraph]:
+    graph = docs_lib.new_dependency_graph()
+    return docs_lib.discover_documents("docs", graph), graph
+
+
+def by_subgroup(documents: List[docs_lib.Document]) -> Dict[str, docs_lib.Document]:
+    return {doc.subgroup: doc for doc in documents}
+
+
+def keys(
+    cache_dir: Path, compiler: str = "typst 0.0.0", extra_inputs=()
+) -> Dict[str, str]:
+    """Keys of a fresh discovery; a new cache does not reuse memoized hashes."""
+    documents, graph = discover()
+    cache = BuildCache(str(cache_dir), compiler, extra_inputs, graph.fonts())
+    return {doc.subgroup: cache.key_for(doc) for doc in documents}
+
+
+def append(path: str, text: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path) -> Path:
+    return tmp_path / "cache"
+
+
+def test_key_is_stable_and_distinct_per_document(corpus, cache_dir):
+    first = keys(cache_dir)
+    assert first == keys(cache_dir)
+    assert len(set(first.values())) == len(first)
+
+
+def test_nested_subfile_changes_only_its_document(corpus, cache_dir):
+    before = keys(cache_dir)
+    doc = by_subgroup(discover()[0])["interno"]
+    nested = next(f for f in doc.subfiles if f.endswith("_detail.typ"))
+    append(nested, "Altro testo.\n")
+
+    after = keys(cache_dir)
+    assert after["interno"] != before["interno"]
+    assert after["esterno"] == before["esterno"]
+    assert after["slides"] == before["slides"]
+
+
+def test_template_changes_the_documents_importing_it(corpus, cache_dir):
+    before = keys(cache_dir)
+    append(f"{TEMPLATES}/base_verbale.typ", "// revised\n")
+
+    after = keys(cache_dir)
+    assert after["interno"] != before["interno"]
+    assert after["esterno"] != before["esterno"]
+    assert after["slides"] == before["slides"]
+
+
+def test_shared_inputs_change_every_key(corpus, cache_dir):
+    before = keys(cache_dir)
+    upgraded = keys(cache_dir, compiler="typst 0.0.1")
+    flagged = keys(cache_dir, extra_inputs=["--ignore-system-fonts"])
+    for subgroup, key in before.items():
+        assert upgraded[subgroup] != key
+        assert flagged[subgroup] != key
+
+
+def test_store_and_restore_by_key(corpus, cache_dir, tmp_path):
+    documents, graph = discover()
+    doc = documents[0]
+    cache = BuildCache(str(cache_dir), "typst 0.0.0", shared_files=graph.fonts())
+    cache.load()
+    key = cache.key_for(doc)
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"%PDF-1.7\n")
+    cache.store(doc, key, str(output))
+
+    output.unlink()
+    assert not cache.restore(doc, "other-key", str(output))
+    assert cache.restore(doc, key, str(output))
+    assert output.read_bytes() == b"%PDF-1.7\n"
+
+
+def test_reverse_index_maps_dependencies_to_documents(corpus):
+    documents, graph = discover()
+    docs = by_subgroup(documents)
+    index = graph.reverse_index(include_fonts=False)
+
+    for doc in documents:
+        assert index[doc.source] == {doc.source}
+        assert index[doc.meta_path] == {doc.source}
+    # base_verbale.typ -> base_document.typ -> base_configs.typ
+    verbali = {docs["interno"].source, docs["esterno"].source}
+    assert index[f"{TEMPLATES}/base_verbale.typ"] == verbali
+    assert index[f"{TEMPLATES}/base_document.typ"] == verbali
+    assert index[f"{TEMPLATES}/base_slides.typ"] == {docs["slides"].source}
+    assert index[f"{TEMPLATES}/base_configs.typ"] == {doc.source for doc in documents}
+    assert not graph.fonts() & index.keys()
+
+
+def test_reverse_index_includes_fonts(corpus):
+    documents, graph = discover()
+    fonts = graph.fonts()
+    assert fonts
+    index = graph.reverse_index()
+    for font in fonts:
+        assert index[font] == {doc.source for doc in documents}
+
+
+def test_affected_documents_closure(corpus):
+    documents, graph = discover()
+    docs = by_subgroup(documents)
+    interno = docs["interno"]
+    nested = next(f for f in interno.subfiles if f.endswith("_detail.typ"))
+
+    assert graph.affected_documents([nested]) == {interno.source}
+    assert graph.affected_documents([f"./{interno.meta_path}"]) == {interno.source}
+    assert graph.affected_documents([f"{TEMPLATES}/base_slides.typ"]) == {
+        docs["slides"].source
+    }
+    assert graph.affected_documents(
+        [nested, f"{TEMPLATES}/base_verbale.typ"]
+    ) == {interno.source, docs["esterno"].source}
+    assert graph.affected_documents(["README.md", "docs/unknown.typ"]) == set()
+
+
+def test_invalidate_picks_up_new_imports(corpus):
+    documents, graph = discover()
+    slides = by_subgroup(documents)["slides"]
+    template = f"{TEMPLATES}/base_verbale.typ"
+    assert slides.source not in graph.affected_documents([template])
+
+    append(slides.source, f'#import "/{template}" as extra\n')
+    graph.invalidate([slides.source])
+    inputs = docs_lib.typst_inputs(slides.source, slides.meta_path)
+    graph.add_document(slides.source, graph.dependencies(slides.source, inputs))
+    assert slides.source in graph.affected_documents([template])
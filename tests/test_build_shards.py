@@ -0,0 +1,207 @@
+import sys
+import json
+import random
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import docs_lib
+import build_shards
+from build_shards import TimingDatabase, check_shards, partition
+from conftest import REPO_ROOT
+
+
+def document(name: str) -> docs_lib.Document:
+    doc_dir = f"docs/11-candidatura/interno/{name}"
+    return docs_lib.Document(
+        source=f"{doc_dir}/{name}.typ",
+        output=f"11-candidatura/interno/{name}.pdf",
+        group="11-candidatura",
+        subgroup="interno",
+        meta_path=f"{doc_dir}/{name}.meta.yaml",
+        title=name,
+    )
+
+
+def timed(seconds: List[float], tmp_path: Path):
+    """Documents with known compile times, and the database that knows them."""
+    documents = [document(f"doc_{i:03d}") for i in range(len(seconds))]
+    timings = TimingDatabase(str(tmp_path / "timings.json"))
+    timings.entries = {
+        doc.source: {"seconds": s, "size": 1000, "builds": 1}
+        for doc, s in zip(documents, seconds)
+    }
+    return documents, timings
+
+
+def test_partition_assigns_every_document_once(tmp_path):
+    rng = random.Random(1)
+    documents, timings = timed([rng.uniform(0.1, 20) for _ in range(57)], tmp_path)
+    plan = partition(documents, 4, timings)
+
+    assigned = [doc.source for shard in plan.shards for doc in shard]
+    assert sorted(assigned) == sorted(doc.source for doc in documents)
+    for shard, load in zip(plan.shards, plan.loads):
+        assert load == pytest.approx(
+            sum(timings.entries[doc.source]["seconds"] for doc in shard)
+        )
+
+
+def test_partition_balances_like_lpt(tmp_path):
+    seconds = [7, 6, 5, 4, 3, 2, 1]
+    documents, timings = timed(seconds, tmp_path)
+    plan = partition(documents, 3, timings)
+    assert sorted(plan.loads) == [9, 9, 10]
+
+    rng = random.Random(2)
+    seconds = [rng.expovariate(0.2) for _ in range(200)]
+    documents, timings = timed(seconds, tmp_path)
+    plan = partition(documents, 4, timings)
+    # Greedy placement on the least loaded shard bounds the spread by the
+    # longest document.
+    assert max(plan.loads) - min(plan.loads) <= max(seconds)
+    # Longest first within each shard.
+    for shard in plan.shards:
+        times = [timings.entries[doc.source]["seconds"] for doc in shard]
+        assert times == sorted(times, reverse=True)
+
+
+def test_partition_is_deterministic(tmp_path):
+    # Ties everywhere: only the source and shard order can break them.
+    documents, timings = timed([1.0] * 10 + [2.0] * 5, tmp_path)
+    plan = partition(documents, 3, timings)
+    shuffled = list(documents)
+    random.Random(3).shuffle(shuffled)
+    again = partition(shuffled, 3, timings)
+
+    assert again.digest == plan.digest
+    assert [[d.source for d in s] for s in again.shards] == [
+        [d.source for d in s] for s in plan.shards
+    ]
+
+    timings.entries[documents[0].source]["seconds"] = 50.0
+    assert partition(documents, 3, timings).digest != plan.digest
+
+
+def test_estimates_fall_back_to_source_size(corpus):
+    documents = docs_lib.discover_documents("docs")
+    timings = TimingDatabase("timings.json")
+    estimates = timings.estimates(documents)
+    rate = build_shards.DEFAULT_SECONDS_PER_BYTE
+    sizes: Dict[str, int] = {}
+    for doc in documents:
+        expected = build_shards.source_size(doc, sizes) * rate
+        assert estimates[doc.source] == pytest.approx(expected)
+        assert estimates[doc.source] > 0
+
+    known = documents[0]
+    timings.record(known, 2.0, build_shards.source_size(known, {}))
+    assert timings.estimates(documents)[known.source] == 2.0
+
+
+def summary(shard: int, shards: int, documents: List[str], digest="p") -> Dict:
+    return {
+        "shard": shard,
+        "shards": shards,
+        "partition": digest,
+        "documents": documents,
+        "results": [{"source": source} for source in documents],
+    }
+
+
+def test_check_shards_accepts_a_complete_partition():
+    errors: List[str] = []
+    check_shards([summary(1, 2, ["a"]), summary(2, 2, ["b", "c"])], errors)
+    assert errors == []
+
+
+@pytest.mark.parametrize(
+    "summaries, message",
+    [
+        ([], "No shard summaries"),
+        ([summary(1, 2, ["a"])], "Expected shards [1, 2]"),
+        ([summary(1, 2, ["a"]), summary(2, 3, ["b"])], "different splits"),
+        ([summary(1, 2, ["a"]), summary(2, 2, ["b"], "q")], "different partitions"),
+        ([summary(1, 2, ["a"]), summary(2, 2, ["a"])], "built by shards 1 and 2"),
+        (
+            [summary(1, 2, ["a"]), {**summary(2, 2, ["b"]), "results": []}],
+            "has no result in shard 2",
+        ),
+    ],
+)
+def test_check_shards_reports_inconsistent_shards(summaries, message):
+    errors: List[str] = []
+    check_shards(summaries, errors)
+    assert any(message in error for error in errors), errors
+
+
+def build_shard(index: int, count: int, timings: Path) -> Path:
+    outdir = Path(f"shard-{index}")
+    subprocess.run(
+        [
+            sys.executable,
+            str(REPO_ROOT / "scripts" / "build_docs.py"),
+            "--shard", f"{index}/{count}",
+            "--outdir", str(outdir),
+            "--cache-dir", f".build-cache-{index}",
+            "--timings", str(timings),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return outdir
+
+
+def merge_args(*argv: str) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    build_shards.add_merge_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+def test_merge_combines_shards_and_prunes_timings(corpus, stub_typst, tmp_path):
+    documents = docs_lib.discover_documents("docs")
+    database = {
+        doc.source: {"seconds": 1.0 + i, "size": 1000, "builds": 1}
+        for i, doc in enumerate(documents)
+    }
+    database["docs/removed/removed.typ"] = {"seconds": 9.0, "size": 1, "builds": 1}
+    base_timings = tmp_path / "timings.json"
+    base_timings.write_text(
+        json.dumps({"version": build_shards.TIMINGS_VERSION, "documents": database})
+    )
+    shard_dirs = []
+    for index in (1, 2):
+        # Every job starts from the same database, as CI restores it.
+        copy = tmp_path / f"timings-{index}.json"
+        copy.write_text(base_timings.read_text())
+        shard_dirs.append(str(build_shard(index, 2, copy)))
+
+    args = merge_args(
+        *shard_dirs, "--outdir", "merged", "--timings", str(base_timings),
+        "--summary", "summary.json",
+    )
+    assert build_shards.merge(args) == 0
+
+    for doc in documents:
+        assert (Path("merged") / doc.output).is_file()
+    assert not (Path("merged") / build_shards.SHARD_SUMMARY_NAME).exists()
+    merged = json.loads(base_timings.read_text())["documents"]
+    assert set(merged) == {doc.source for doc in documents}
+    assert json.loads(Path("summary.json").read_text())["success"]
+
+
+def test_merge_keeps_timings_of_missing_shards(corpus, stub_typst, tmp_path):
+    timings = tmp_path / "timings.json"
+    database = {"docs/removed/removed.typ": {"seconds": 9.0, "size": 1, "builds": 1}}
+    timings.write_text(
+        json.dumps({"version": build_shards.TIMINGS_VERSION, "documents": database})
+    )
+    copy = tmp_path / "timings-1.json"
+    copy.write_text(timings.read_text())
+    shard = build_shard(1, 2, copy)
+
+    assert build_shards.merge(merge_args(str(shard), "--timings", str(timings))) == 1
+    assert "docs/removed/removed.typ" in json.loads(timings.read_text())["documents"]
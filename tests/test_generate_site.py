@@ -0,0 +1,28 @@
+import sys
+
+import docs_lib
+import generate_site
+
+
+def test_empty_group_gets_a_card_and_a_page(corpus, tmp_path, monkeypatch):
+    (corpus / "docs" / "12-rtb" / "interno").mkdir(parents=True)
+    documents = docs_lib.discover_documents("docs")
+    index = generate_site.build_document_index(documents)
+    assert "12-rtb" not in index
+    assert generate_site.site_groups(index) == ["11-candidatura", "12-rtb"]
+
+    summaries = generate_site.summarize_groups(documents, ["12-rtb"])
+    assert summaries["12-rtb"].count == 0
+    assert summaries["11-candidatura"].count == len(documents)
+
+    outdir = tmp_path / "site"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["generate_site.py", "--outdir", str(outdir), "--no-site-manifest",
+         "--no-search-index", "--no-discovery-cache"],
+    )
+    generate_site.main()
+    home = (outdir / "index.html").read_text(encoding="utf-8")
+    assert 'href="rtb.html"' in home and "0 Documenti" in home
+    assert "No documents found." in (outdir / "rtb.html").read_text(encoding="utf-8")
@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import docs_lib
+
+
+@pytest.fixture
+def loader(tmp_path: Path) -> docs_lib.JsonSidecarMetadataLoader:
+    return docs_lib.JsonSidecarMetadataLoader(
+        str(tmp_path / "sidecars"), docs_lib.YamlMetadataLoader()
+    )
+
+
+def write_meta(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("title: Doc\nchangelog:\n  - version: 1\n", encoding="utf-8")
+    return path
+
+
+def sidecars(tmp_path: Path):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), tmp_path)
+        for root, _, names in os.walk(tmp_path)
+        for name in names
+        if name.endswith(".json")
+    )
+
+
+def test_relative_path_is_mirrored(tmp_path, monkeypatch, loader):
+    monkeypatch.chdir(tmp_path)
+    write_meta(tmp_path / "docs" / "a" / "a.meta.yaml")
+    assert loader.load("docs/a/a.meta.yaml")["title"] == "Doc"
+    assert sidecars(tmp_path) == ["sidecars/docs/a/a.meta.yaml.json"]
+    # Served from the sidecar from now on.
+    assert loader.load("./docs/a/a.meta.yaml")["title"] == "Doc"
+
+
+def test_absolute_path_stays_under_the_sidecar_dir(tmp_path, loader):
+    meta = write_meta(tmp_path / "tree" / "a.meta.yaml")
+    assert loader.load(str(meta))["title"] == "Doc"
+
+    sidecar = loader.sidecar_path(str(meta))
+    assert os.path.isfile(sidecar)
+    assert Path(sidecar).resolve().is_relative_to((tmp_path / "sidecars").resolve())
+    assert not (tmp_path / "tree" / "a.meta.yaml.json").exists()
+
+
+def test_paths_leaving_the_working_directory_are_contained(
+    tmp_path, monkeypatch, loader
+):
+    work = tmp_path / "work"
+    work.mkdir()
+    monkeypatch.chdir(work)
+    write_meta(tmp_path / "outside.meta.yaml")
+    assert loader.load("../outside.meta.yaml")["title"] == "Doc"
+    assert all(path.startswith("sidecars/") for path in sidecars(tmp_path))
@@ -0,0 +1,139 @@
+import os
+from typing import Dict, List, Set, Tuple
+
+import pytest
+import yaml
+
+import docs_lib
+from conftest import git
+from typst_deps import DependencyGraph
+from validate_pr_changes import check_changes, check_version_bump
+
+TEMPLATE = "docs/00-templates/base_verbale.typ"
+MALFORMED = "no valid changelog version"
+
+
+def discover() -> Tuple[Dict[str, docs_lib.Document], DependencyGraph]:
+    graph = docs_lib.new_dependency_graph()
+    documents = docs_lib.discover_documents("docs", graph)
+    return {doc.subgroup: doc for doc in documents}, graph
+
+
+def validate(changed_files: Set[str]) -> List[str]:
+    docs, graph = discover()
+    return check_changes(list(docs.values()), graph, changed_files, "main")
+
+
+def edit(path: str, text: str = "Nuovo paragrafo.\n"):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def bump(meta_path: str, by: int = 1):
+    """Prepends changelog entries up to `by` versions above the latest one."""
+    with open(meta_path, "r", encoding="utf-8") as f:
+        metadata = yaml.safe_load(f)
+    latest = metadata["changelog"][0]
+    for version in range(latest["version"] + 1, latest["version"] + by + 1):
+        metadata["changelog"].insert(0, {**latest, "version": version})
+    with open(meta_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(metadata, f, sort_keys=False, allow_unicode=True)
+
+
+@pytest.mark.parametrize(
+    "changed, base, pr, error",
+    [
+        (True, 3, 4, None),
+        (True, 3, 3, "was not bumped"),
+        (True, 3, 5, "exactly 1"),
+        (False, 3, 3, None),
+        (False, 3, 4, "no content changes"),
+    ],
+)
+def test_check_version_bump(changed, base, pr, error):
+    errors: List[str] = []
+    check_version_bump("doc.typ", "Doc", changed, base, pr, errors)
+    if error is None:
+        assert errors == []
+    else:
+        assert len(errors) == 1 and error in errors[0]
+
+
+def test_unchanged_tree_passes(git_corpus):
+    assert validate(set()) == []
+
+
+def test_content_change_needs_a_bump(git_corpus):
+    doc = discover()[0]["interno"]
+    section = next(f for f in doc.subfiles if f.endswith("_detail.typ"))
+    edit(section)
+    errors = validate({section})
+    assert len(errors) == 1
+    assert doc.source in errors[0] and "was not bumped" in errors[0]
+
+    bump(doc.meta_path)
+    assert validate({section, doc.meta_path}) == []
+
+
+def test_bump_by_more_than_one_fails(git_corpus):
+    doc = discover()[0]["esterno"]
+    edit(doc.source)
+    bump(doc.meta_path, by=2)
+    errors = validate({doc.source, doc.meta_path})
+    assert len(errors) == 1 and "exactly 1" in errors[0]
+
+
+def test_bump_without_content_change_fails(git_corpus):
+    doc = discover()[0]["slides"]
+    bump(doc.meta_path)
+    errors = validate({doc.meta_path})
+    assert len(errors) == 1 and "no content changes" in errors[0]
+
+
+def test_shared_template_change_needs_no_bump(git_corpus):
+    edit(TEMPLATE, "// revised\n")
+    assert validate({TEMPLATE}) == []
+
+
+def test_added_document_needs_no_base(git_corpus):
+    doc = discover()[0]["interno"]
+    name = "verbint_99_00000"
+    doc_dir = f"docs/11-candidatura/interno/{name}"
+    source, meta_path = f"{doc_dir}/{name}.typ", f"{doc_dir}/{name}.meta.yaml"
+    git("mv", os.path.dirname(doc.source), doc_dir)
+    git("mv", f"{doc_dir}/{os.path.basename(doc.source)}", source)
+    git("mv", f"{doc_dir}/{os.path.basename(doc.meta_path)}", meta_path)
+    assert validate({doc.source, doc.meta_path, source, meta_path}) == []
+
+
+@pytest.mark.parametrize(
+    "base_content, error",
+    [
+        ("title: Doc\nchangelog: oops\n", MALFORMED),
+        ("title: Doc\nchangelog:\n  - date: '2025-01-01'\n", MALFORMED),
+        ("title: Doc\nchangelog:\n  - version: two\n", MALFORMED),
+        ("title: Doc\nchangelog: []\n", None),
+        ("- not a mapping\n", None),
+        ("", None),
+        ("title: [unclosed\n", None),
+    ],
+)
+def test_malformed_base_metadata_is_reported(git_corpus, base_content, error):
+    doc = discover()[0]["interno"]
+    with open(doc.meta_path, "r", encoding="utf-8") as f:
+        valid = f.read()
+    git("checkout", "-q", "main")
+    with open(doc.meta_path, "w", encoding="utf-8") as f:
+        f.write(base_content)
+    git("commit", "-q", "-am", "malformed metadata")
+    git("checkout", "-q", "-b", "fix")
+    with open(doc.meta_path, "w", encoding="utf-8") as f:
+        f.write(valid)
+
+    errors = validate({doc.meta_path})
+    if error is None:
+        # Without a usable base version the document counts as added.
+        assert errors == []
+    else:
+        assert len(errors) == 1
+        assert doc.source in errors[0] and error in errors[0]